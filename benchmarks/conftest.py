@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pathlib import Path
+
+from gammaspotter.synthetic import SpectrumGenerator
+
+EXAMPLE_DATA = Path(__file__).parents[1] / "example_data"
+EXAMPLE_FILES = sorted(EXAMPLE_DATA.glob("*.csv"))
+
+
+def synthetic_spectrum(channels: int, peaks: int, seed: int = 0) -> pd.DataFrame:
+    """Spectrum in the PicoScope layout with evenly spread peaks of about 500 counts per bin on a falling background."""
+    # the resolution is chosen so the peaks stay resolved when there are many of them
+    spacing = 2800 / max(peaks - 1, 1)
+    resolution = min(0.07, spacing / 4 / np.sqrt(661.7 * 2900))
+    bin_width = 3000 / channels
+    generator = SpectrumGenerator(
+        channels=channels,
+        resolution=resolution,
+        background=50 / bin_width,
+        compton_fraction=0.1,
+    )
+
+    energies = np.linspace(100, 2900, peaks)
+    sigmas = generator.fwhm(energies) / (2 * np.sqrt(2 * np.log(2)))
+    lines = pd.DataFrame(
+        {"energy": energies, "area": 500 * sigmas * np.sqrt(2 * np.pi) / bin_width}
+    )
+    return generator.generate(lines, seed=seed)[0]
+
+
+def synthetic_catalog(lines: int, seed: int = 0) -> pd.DataFrame:
+    """Catalog in the layout of the bundled catalogs with random gamma energies."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "Gamma Energy (KeV)": np.round(rng.uniform(5, 3000, lines), 2),
+            "Nuclide": [f"X-{number}" for number in range(lines)],
+        }
+    )
+
+
+@pytest.fixture(scope="session")
+def spectra():
+    """Synthetic spectra, generated once per session and keyed by (channels, peaks)."""
+    cache = {}
+
+    def get(channels: int, peaks: int) -> pd.DataFrame:
+        if (channels, peaks) not in cache:
+            cache[channels, peaks] = synthetic_spectrum(channels, peaks)
+        return cache[channels, peaks]
+
+    return get
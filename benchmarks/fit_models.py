@@ -0,0 +1,103 @@
+"""Compares the peak fits with finite difference derivatives and the old initial guess
+against the fits with the analytic jacobian and the moment based initial guess.
+
+Run from the repository root:
+
+    python benchmarks/fit_models.py
+"""
+
+import time
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from scipy.optimize import curve_fit
+
+from gammaspotter.fit_models import FitModels
+from gammaspotter.process_data import ProcessData
+
+EXAMPLE_DATA = Path(__file__).parents[1] / "example_data"
+
+# (peak detection threshold, fit domain width)
+SETTINGS = [(20, 5), (20, 20), (50, 40), (100, 60)]
+
+
+class CountingModel:
+    """Wraps a fit model and counts how often it is evaluated, including the evaluations for numerical derivatives."""
+
+    def __init__(self, model):
+        self.model = model
+        self.evaluations = 0
+
+    def __call__(self, x, *params):
+        self.evaluations += 1
+        return self.model(x, *params)
+
+
+def fit_all(domains: list[tuple], analytic: bool) -> dict:
+    """Fits all domains with either the old or the new approach and collects the statistics."""
+    fit_func = CountingModel(FitModels.gaussian)
+    iterations = 0
+    converged = 0
+
+    start = time.perf_counter()
+    for x, y, peak_x, peak_y, domain_width in domains:
+        if analytic:
+            initial_guess = FitModels.gaussian_guess(x, y)
+            options = {"jac": FitModels.gaussian_jacobian}
+        else:
+            initial_guess = [peak_y, peak_x, domain_width, y.min()]
+            options = {}
+        try:
+            _, _, infodict, _, _ = curve_fit(
+                fit_func,
+                x,
+                y,
+                p0=initial_guess,
+                bounds=([0, 0, 0, 0], np.inf),
+                full_output=True,
+                **options,
+            )
+        except (RuntimeError, ValueError):
+            continue
+        # the trust region solver evaluates the residuals once per iteration
+        iterations += infodict["nfev"]
+        converged += 1
+    duration = time.perf_counter() - start
+
+    return {
+        "Method": "analytic" if analytic else "finite differences",
+        "Domains": len(domains),
+        "Converged": converged,
+        "Iterations": iterations,
+        "Model evaluations": fit_func.evaluations,
+        "Time [s]": round(duration, 3),
+    }
+
+
+def main():
+    domains = []
+    for file_path in sorted(EXAMPLE_DATA.glob("*.csv")):
+        process_data = ProcessData(pd.read_csv(file_path))
+        for prominence, domain_width in SETTINGS:
+            peaks = process_data.find_gamma_peaks(prominence=prominence)
+            isolated = process_data.isolate_domains(
+                centers=peaks.iloc[:, 0], width=domain_width
+            )
+            for domain, (peak_x, peak_y) in zip(isolated, peaks.values):
+                domains.append(
+                    (
+                        domain.iloc[:, 0].to_numpy(),
+                        domain.iloc[:, 1].to_numpy(),
+                        peak_x,
+                        peak_y,
+                        domain_width,
+                    )
+                )
+
+    results = pd.DataFrame([fit_all(domains, analytic) for analytic in (False, True)])
+    print(results.to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main()
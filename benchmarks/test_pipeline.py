@@ -0,0 +1,183 @@
+"""Benchmarks of the detection, fit and match pipeline. Run from the repository root:
+
+    pip install pytest-benchmark
+    pytest benchmarks
+
+Compare two versions with '--benchmark-autosave' and 'pytest-benchmark compare', or only check
+that the benchmarks run with '--benchmark-disable'. The benchmarks are skipped without pytest-benchmark.
+The synthetic spectra have between 1k and 1M channels with 1 to 500 peaks,
+and the catalogs have between 30 and 100k lines.
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+
+pytest.importorskip("pytest_benchmark")
+
+from conftest import EXAMPLE_FILES, synthetic_catalog
+from gammaspotter.auto_calibration import AutoCalibration
+from gammaspotter.batch import analyze_spectrum, default_catalog_path
+from gammaspotter.catalog import Catalog
+from gammaspotter.match_features import MatchFeatures
+from gammaspotter.process_data import ProcessData
+from gammaspotter.spectrum_store import SpectrumStore
+
+CHANNELS = [1024, 16384, 131072, 1048576]
+PEAK_COUNTS = [1, 50, 500]
+CATALOG_LINES = [30, 1000, 100000]
+PROMINENCE = 200
+
+
+def domain_width(peak_count: int) -> float:
+    """Fit domain width which keeps the neighbouring peaks of the synthetic spectra out of the domain."""
+    return min(20, 2800 / peak_count / 2)
+
+
+def fresh(data: pd.DataFrame):
+    """Setup for 'benchmark.pedantic', every round gets a ProcessData without cached results."""
+    return (ProcessData(data),), {}
+
+
+@pytest.mark.parametrize("file_path", EXAMPLE_FILES, ids=lambda path: path.stem)
+def test_read_csv(benchmark, file_path):
+    benchmark(pd.read_csv, file_path)
+
+
+@pytest.mark.parametrize("file_path", EXAMPLE_FILES, ids=lambda path: path.stem)
+def test_spectrum_store(benchmark, file_path, tmp_path):
+    store = SpectrumStore(tmp_path)
+    store.load(file_path)
+    benchmark(store.load, file_path)
+
+
+def test_read_csv_large(benchmark, spectra, tmp_path):
+    file_path = tmp_path / "large.csv"
+    spectra(1048576, 500).to_csv(file_path, index=False)
+    benchmark(pd.read_csv, file_path)
+
+
+@pytest.mark.parametrize("channels", CHANNELS)
+def test_find_gamma_peaks(benchmark, spectra, channels):
+    data = spectra(channels, 50)
+    benchmark.pedantic(
+        lambda process_data: process_data.find_gamma_peaks(prominence=PROMINENCE),
+        setup=lambda: fresh(data),
+        rounds=10,
+    )
+
+
+def test_threshold_scrubbing(benchmark, spectra):
+    # the prominence profile is computed once, after which every threshold is a binary search
+    process_data = ProcessData(spectra(1048576, 500))
+    process_data.find_gamma_peaks(prominence=PROMINENCE)
+
+    def scrub():
+        for prominence in range(1, 1000, 15):
+            process_data.peak_cache.clear()
+            process_data.find_gamma_peaks(prominence=prominence)
+
+    benchmark(scrub)
+
+
+@pytest.mark.parametrize("peak_count", PEAK_COUNTS)
+def test_isolate_domains(benchmark, spectra, peak_count):
+    process_data = ProcessData(spectra(1048576, peak_count))
+    peaks = process_data.find_gamma_peaks(prominence=PROMINENCE)
+    benchmark(
+        process_data.isolate_domains,
+        centers=peaks.iloc[:, 0],
+        width=domain_width(peak_count),
+    )
+
+
+@pytest.mark.parametrize("peak_count", PEAK_COUNTS)
+@pytest.mark.parametrize("batched", [False, True], ids=["fit_peaks", "batched"])
+def test_fit_peaks(benchmark, spectra, peak_count, batched):
+    data = spectra(131072, peak_count)
+    peaks = ProcessData(data).find_gamma_peaks(prominence=PROMINENCE)
+
+    def fit(process_data):
+        if batched:
+            return process_data.fit_peaks_batched(
+                peaks=peaks, domain_width=domain_width(peak_count)
+            )
+        return process_data.fit_peaks(
+            peaks=peaks, domain_width=domain_width(peak_count)
+        )
+
+    benchmark.pedantic(fit, setup=lambda: fresh(data), rounds=3)
+
+
+@pytest.mark.parametrize("lines", CATALOG_LINES)
+def test_match_isotopes(benchmark, lines):
+    # 500 fitted peaks, only the energies and their uncertainties are used for matching
+    fitted_peaks = pd.DataFrame(
+        {
+            "peak": range(1, 501),
+            "energy": np.linspace(100, 2900, 500),
+            "stderr": np.linspace(1, 7, 500),
+        }
+    )
+    catalog = Catalog(synthetic_catalog(lines))
+
+    matcher = MatchFeatures(data_peaks=fitted_peaks, catalog_data=catalog)
+    benchmark(matcher.match_isotopes, max_results=5)
+
+
+@pytest.mark.parametrize("compiled", [False, True], ids=["csv", "compiled"])
+def test_load_catalog(benchmark, tmp_path, compiled):
+    csv_path = tmp_path / "catalog.csv"
+    synthetic_catalog(CATALOG_LINES[-1]).to_csv(csv_path, index=False)
+    if compiled:
+        # the first load compiles the catalog, the benchmark measures the loads after it
+        Catalog.from_csv(csv_path, cache_dir=tmp_path / "cache")
+        benchmark(Catalog.from_csv, csv_path, cache_dir=tmp_path / "cache")
+    else:
+        benchmark(lambda: Catalog(pd.read_csv(csv_path)))
+
+
+def test_calibrate(benchmark):
+    benchmark(
+        ProcessData.calibrate,
+        None,
+        known_energies=[511.0034, 1274.5],
+        found_energies=[170.2, 424.8],
+    )
+
+
+@pytest.mark.parametrize("reference_count", [5, 50])
+def test_auto_calibration(benchmark, reference_count):
+    # the 12 most prominent peaks, 5 of which lie on reference lines, under a gain of 3 keV/mV
+    rng = np.random.default_rng(0)
+    lines = np.sort(rng.uniform(50, 2800, reference_count))
+    positions = np.sort(np.concatenate([(lines[:5] + 12) / 3, rng.uniform(10, 900, 7)]))
+    auto_calibration = AutoCalibration(lines)
+    benchmark(auto_calibration.fit, positions=positions, widths=np.ones(12))
+
+
+@pytest.mark.parametrize("channels", CHANNELS)
+def test_apply_cal_to_data(benchmark, spectra, channels):
+    data = spectra(channels, 50)
+    benchmark.pedantic(
+        ProcessData.apply_cal_to_data,
+        setup=lambda: (
+            (),
+            {"data": data.copy(), "scaling_factor": 3, "horizontal_offset": 12},
+        ),
+        rounds=10,
+    )
+
+
+@pytest.mark.parametrize("file_path", EXAMPLE_FILES, ids=lambda path: path.stem)
+def test_analyze_example(benchmark, file_path):
+    data = pd.read_csv(file_path)
+    catalog = Catalog.from_csv(default_catalog_path())
+    benchmark(
+        analyze_spectrum,
+        data=data,
+        catalog=catalog,
+        prominence=40,
+        domain_width=20,
+        max_results=5,
+    )
@@ -0,0 +1,46 @@
+"""Benchmark of the cold start of the GUI, every round starts a new Python process. Run from the repository root:
+
+    pytest benchmarks/test_startup.py
+
+The window is created offscreen, so no display is needed.
+"""
+
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+STARTUP_SCRIPT = """
+import sys, json
+from PySide6 import QtWidgets
+app = QtWidgets.QApplication([])
+from gammaspotter.gui import UserInterface
+ui = UserInterface()
+app.processEvents()
+print(json.dumps(sorted(sys.modules)))
+ui.close()
+"""
+
+
+def start_gui() -> list[str]:
+    """Starts the GUI in a new process and returns the modules it imported."""
+    output = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT],
+        env=os.environ | {"QT_QPA_PLATFORM": "offscreen"},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def test_startup(benchmark):
+    modules = benchmark.pedantic(start_gui, rounds=3, iterations=1)
+
+    # these are only needed for an analysis or the help tab
+    assert "PySide6.QtWebEngineWidgets" not in modules
+    assert "scipy.signal" not in modules
+    assert "scipy.optimize" not in modules
@@ -0,0 +1,174 @@
+from typing import Callable
+from contextlib import nullcontext
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from gammaspotter.instrumentation import instrumentation
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when a newer job with the same name replaced it."""
+
+
+class JobSignals(QObject):
+    finished = Signal(object)
+    failed = Signal(str)
+    progress = Signal(int, int)
+    done = Signal()
+
+
+class AnalysisJob(QRunnable):
+    def __init__(
+        self,
+        function: Callable,
+        is_stale: Callable[[], bool],
+        args: tuple,
+        kwargs: dict,
+        profile: bool = False,
+    ) -> None:
+        """Runs a function on a thread of the pool and reports back through Qt signals.
+
+        Args:
+            function (Callable): the work, which receives a 'progress' keyword argument to report its progress with
+            is_stale (Callable[[], bool]): whether a newer job replaced this one
+            args (tuple): positional arguments of the function
+            kwargs (dict): keyword arguments of the function
+            profile (bool, optional): profile the function with cProfile. Defaults to False.
+        """
+        super().__init__()
+        # the worker keeps the job until it reported that it is done, so Qt must not delete it after running
+        self.setAutoDelete(False)
+        self.function = function
+        self.is_stale = is_stale
+        self.args = args
+        self.kwargs = kwargs
+        self.profile = profile
+        # created in the GUI thread, so the signals are delivered in the GUI thread
+        self.signals = JobSignals()
+
+    def report_progress(self, done: int, total: int) -> None:
+        """Reports the progress of the job, and stops the job if it became stale."""
+        if self.is_stale():
+            raise JobCancelled
+        self.signals.progress.emit(done, total)
+
+    def run(self) -> None:
+        try:
+            with instrumentation.profile() if self.profile else nullcontext():
+                result = self.function(
+                    *self.args, progress=self.report_progress, **self.kwargs
+                )
+        except JobCancelled:
+            pass
+        except Exception as error:
+            if not self.is_stale():
+                self.signals.failed.emit(str(error))
+        else:
+            if not self.is_stale():
+                self.signals.finished.emit(result)
+        finally:
+            self.signals.done.emit()
+
+
+class AnalysisWorker(QObject):
+    progress = Signal(str, int, int)
+    idle = Signal()
+
+    def __init__(self, parent: QObject | None = None) -> None:
+        """Runs the slow analysis steps of the GUI in the background, so the event loop keeps running.
+
+        Every job has a name. Submitting a job cancels the previous job with the same name:
+        it is removed from the queue if it did not start yet, stops at its next progress report
+        if it is running, and its result is never delivered.
+
+        Args:
+            parent (QObject | None, optional): parent of the worker. Defaults to None.
+        """
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.generations = {}
+        # the latest job of every name, and every job that did not finish yet
+        self.jobs = {}
+        self.active = set()
+        # whether new jobs are profiled with cProfile
+        self.profile = False
+
+    def submit(
+        self,
+        name: str,
+        function: Callable,
+        *args,
+        on_finished: Callable | None = None,
+        on_failed: Callable | None = None,
+        silent: bool = False,
+        **kwargs,
+    ) -> None:
+        """Starts a job in the background and replaces the previous job with the same name.
+
+        Args:
+            name (str): name of the job, also shown with its progress
+            function (Callable): the work, which receives a 'progress' keyword argument to report its progress with
+            on_finished (Callable | None, optional): called in the GUI thread with the result. Defaults to None.
+            on_failed (Callable | None, optional): called in the GUI thread with the error message. Defaults to None.
+            silent (bool, optional): do not report the progress of the job, for short jobs that run all the time. Defaults to False.
+        """
+        self.cancel(name)
+        generation = self.generations[name]
+        job = AnalysisJob(
+            function,
+            is_stale=lambda: self.generations[name] != generation,
+            args=args,
+            kwargs=kwargs,
+            profile=self.profile,
+        )
+        self.jobs[name] = job
+        self.active.add(job)
+
+        # a job can become stale after emitting, so the GUI thread checks again before delivering
+        if on_finished is not None:
+            job.signals.finished.connect(
+                lambda result: self.deliver(name, job, on_finished, result)
+            )
+        if on_failed is not None:
+            job.signals.failed.connect(
+                lambda message: self.deliver(name, job, on_failed, message)
+            )
+        if not silent:
+            job.signals.progress.connect(
+                lambda done, total: self.deliver(
+                    name, job, self.progress.emit, name, done, total
+                )
+            )
+            self.progress.emit(name, 0, 0)
+        job.signals.done.connect(lambda: self.job_done(name, job))
+
+        self.pool.start(job)
+
+    def deliver(self, name: str, job: AnalysisJob, callback: Callable, *args) -> None:
+        """Calls the callback only if the job was not replaced by a newer one."""
+        if self.jobs.get(name) is job:
+            callback(*args)
+
+    def cancel(self, name: str) -> None:
+        """Cancels the job with the given name, if there is one."""
+        self.generations[name] = self.generations.get(name, 0) + 1
+        job = self.jobs.pop(name, None)
+        if job is not None and self.pool.tryTake(job):
+            # the job never started, so it will not report that it is done
+            self.job_done(name, job)
+
+    def cancel_all(self) -> None:
+        """Cancels every job, and waits for the running jobs to stop."""
+        for name in list(self.jobs):
+            self.cancel(name)
+        self.pool.waitForDone()
+
+    def is_running(self, name: str) -> bool:
+        """Whether a job with the given name is queued or running."""
+        return name in self.jobs
+
+    def job_done(self, name: str, job: AnalysisJob) -> None:
+        if self.jobs.get(name) is job:
+            del self.jobs[name]
+        self.active.discard(job)
+        if not self.active:
+            self.idle.emit()
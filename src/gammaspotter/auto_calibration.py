@@ -0,0 +1,439 @@
+import json
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+
+from gammaspotter.catalog import Catalog
+from gammaspotter.process_data import ProcessData
+from gammaspotter.instrumentation import instrumentation
+
+
+def reference_energies(
+    catalog_data: pd.DataFrame | Catalog, nuclides: list[str]
+) -> np.ndarray:
+    """Collects the energies of every line of the given nuclides from an isotope catalog.
+
+    Args:
+        catalog_data (pd.DataFrame | Catalog): catalog with the energies in the first column and the isotopes in the second column, or an indexed Catalog
+        nuclides (list[str]): names of the nuclides in the calibration source, for example ["Na-22", "Cs-137"]
+
+    Raises:
+        ValueError: when a nuclide is not in the catalog
+
+    Returns:
+        np.ndarray: sorted energies of the lines in keV, without duplicates
+    """
+    if isinstance(catalog_data, Catalog):
+        isotopes, energies = catalog_data.isotopes, catalog_data.energies
+    else:
+        isotopes = catalog_data.iloc[:, 1].to_numpy()
+        energies = catalog_data.iloc[:, 0].to_numpy(dtype=float)
+    missing = sorted(set(nuclides) - set(isotopes))
+    if missing:
+        raise ValueError(f"{', '.join(missing)} not in the catalog.")
+
+    return np.unique(energies[np.isin(isotopes, nuclides)])
+
+
+class CalibrationResult:
+    def __init__(
+        self,
+        coefficients: np.ndarray,
+        covariance: np.ndarray,
+        matches: pd.DataFrame,
+        chi_squared: float,
+    ) -> None:
+        """A polynomial energy calibration, energy = c0 + c1 * pulseheight (+ c2 * pulseheight^2), with its uncertainties.
+
+        Args:
+            coefficients (np.ndarray): coefficients of the polynomial, starting with the constant
+            covariance (np.ndarray): covariance matrix of the coefficients
+            matches (pd.DataFrame): the peaks the calibration was fitted on, with their pulse height, width, literature energy and residual
+            chi_squared (float): weighted sum of the squared residuals
+        """
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.covariance = np.asarray(covariance, dtype=float)
+        self.matches = matches
+        self.chi_squared = chi_squared
+
+    @classmethod
+    def linear(
+        cls, scaling_factor: float, horizontal_offset: float
+    ) -> "CalibrationResult":
+        """A calibration from a conversion factor and energy offset, like those of 'ProcessData.calibrate', without uncertainties."""
+        return cls(
+            coefficients=[-horizontal_offset, scaling_factor],
+            covariance=np.zeros((2, 2)),
+            matches=pd.DataFrame(
+                columns=["pulseheight", "width", "energy", "residual"]
+            ),
+            chi_squared=0.0,
+        )
+
+    @property
+    def degree(self) -> int:
+        return len(self.coefficients) - 1
+
+    @property
+    def uncertainties(self) -> np.ndarray:
+        """Standard deviations of the coefficients."""
+        return np.sqrt(np.diag(self.covariance))
+
+    @property
+    def scaling_factor(self) -> float:
+        """Conversion factor of a linear calibration, as used by 'ProcessData.apply_cal_to_data'."""
+        if self.degree != 1:
+            raise ValueError(
+                "Only a linear calibration has a single conversion factor."
+            )
+        return float(self.coefficients[1])
+
+    @property
+    def horizontal_offset(self) -> float:
+        """Energy offset of a linear calibration, as used by 'ProcessData.apply_cal_to_data'."""
+        if self.degree != 1:
+            raise ValueError("Only a linear calibration has a single energy offset.")
+        return float(-self.coefficients[0])
+
+    def energy(self, pulseheight: np.ndarray) -> np.ndarray:
+        """Converts pulse heights to energies in keV."""
+        return np.polynomial.polynomial.polyval(
+            np.asarray(pulseheight, dtype=float), self.coefficients
+        )
+
+    def energy_uncertainty(self, pulseheight: np.ndarray) -> np.ndarray:
+        """Standard deviation of the calibrated energy of pulse heights, from the covariance of the coefficients."""
+        design = np.vander(
+            np.atleast_1d(np.asarray(pulseheight, dtype=float)),
+            self.degree + 1,
+            increasing=True,
+        )
+        variance = np.einsum("ij,jk,ik->i", design, self.covariance, design)
+        return np.sqrt(variance).reshape(np.shape(pulseheight))
+
+    def apply(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Replaces the pulse heights in the first column of the data by their energies, like 'ProcessData.apply_cal_to_data'."""
+        data[data.columns[0]] = self.energy(data.iloc[:, 0].to_numpy(dtype=float))
+        return data
+
+    def summary(self) -> str:
+        """The coefficients with their uncertainties and the matched peaks, for the logs."""
+        names = ["Energy at zero [keV]", "Gain [keV/mV]", "Quadratic term [keV/mV^2]"]
+        lines = [
+            f"{name}: {value:.4g} ± {uncertainty:.2g}"
+            for name, value, uncertainty in zip(
+                names, self.coefficients, self.uncertainties
+            )
+        ]
+        lines.append(
+            self.matches[["pulseheight", "energy", "residual"]].to_markdown(
+                index=False,
+                tablefmt="plain",
+                floatfmt=".2f",
+                headers=["Pulse height [mV]", "Energy [keV]", "Residual [keV]"],
+            )
+        )
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            "coefficients": self.coefficients.tolist(),
+            "covariance": self.covariance.tolist(),
+            "chi_squared": self.chi_squared,
+            "matches": self.matches.to_dict(orient="list"),
+        }
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "CalibrationResult":
+        return cls(
+            coefficients=values["coefficients"],
+            covariance=values["covariance"],
+            matches=pd.DataFrame(values["matches"]),
+            chi_squared=values["chi_squared"],
+        )
+
+    def to_json(self, path: str | Path) -> None:
+        """Writes the calibration to a JSON file."""
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2))
+
+
+class AutoCalibration:
+    def __init__(
+        self,
+        reference_energies: list[float],
+        degree: int = 1,
+        tolerance: float = 0.02,
+        max_peaks: int = 12,
+        min_matches: int | None = None,
+        scaling_range: tuple[float, float] | None = None,
+        max_offset: float | None = None,
+    ) -> None:
+        """Calibrates a spectrum without clicking, by finding which peaks belong to which reference lines.
+
+        Every pair of peaks together with every pair of reference lines defines a linear calibration.
+        All of these are tried at once and the one under which the most peaks land on a reference line wins,
+        ties are won by the calibration that explains the most prominent peaks. The matched peaks are then
+        fitted with a weighted least squares polynomial.
+
+        Args:
+            reference_energies (list[float]): energies in keV of the lines of the calibration source, see 'reference_energies'
+            degree (int, optional): degree of the calibration polynomial, 1 (linear) or 2 (quadratic). Defaults to 1.
+            tolerance (float, optional): largest distance between a calibrated peak and its line, as a fraction of the energy of the line. Defaults to 0.02.
+            max_peaks (int, optional): number of most prominent peaks taken into account. Defaults to 12.
+            min_matches (int | None, optional): fewest peaks that have to match a line. Defaults to None, one more than the degree.
+            scaling_range (tuple[float, float] | None, optional): smallest and largest plausible gain in keV/mV, which rules out assignments early. Defaults to None.
+            max_offset (float | None, optional): largest plausible distance in keV of the energy at zero pulse height from zero. Defaults to None, a quarter of the highest reference energy.
+        """
+        if degree not in (1, 2):
+            raise ValueError("The degree of the calibration must be 1 or 2.")
+        self.reference_energies = np.unique(np.asarray(reference_energies, dtype=float))
+        if len(self.reference_energies) < 2:
+            raise ValueError("At least two reference lines are needed.")
+        self.degree = degree
+        self.tolerance = tolerance
+        self.max_peaks = max_peaks
+        self.min_matches = max(min_matches or degree + 1, degree + 1, 2)
+        self.scaling_range = scaling_range
+        self.max_offset = (
+            self.reference_energies[-1] / 4 if max_offset is None else max_offset
+        )
+
+    @classmethod
+    def from_catalog(
+        cls, catalog_data: pd.DataFrame | Catalog, nuclides: list[str], **kwargs
+    ) -> "AutoCalibration":
+        """Uses every line of the given nuclides in an isotope catalog as reference lines."""
+        return cls(reference_energies(catalog_data, nuclides), **kwargs)
+
+    def nearest_lines(self, energies: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Finds the nearest reference line of every energy with a binary search.
+
+        Args:
+            energies (np.ndarray): calibrated energies of the peaks, of any shape
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: position of the nearest line and whether it lies within the tolerance
+        """
+        lines = self.reference_energies
+        right = np.searchsorted(lines, energies).clip(1, len(lines) - 1)
+        left = right - 1
+        nearest = np.where(
+            energies - lines[left] < lines[right] - energies, left, right
+        )
+        within = np.abs(energies - lines[nearest]) <= self.tolerance * lines[nearest]
+        return nearest, within
+
+    @instrumentation.timed("calibration assignment")
+    def assign(
+        self, positions: np.ndarray, weights: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Searches the assignment of peaks to reference lines with the most matches.
+
+        Args:
+            positions (np.ndarray): pulse heights of the peaks
+            weights (np.ndarray | None, optional): importance of every peak, for example its prominence. Defaults to None, all peaks are equally important.
+
+        Raises:
+            ValueError: when no assignment matches enough peaks
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: positions in the peak array and in the reference lines of the matched peaks
+        """
+        positions = np.asarray(positions, dtype=float)
+        weights = np.ones(len(positions)) if weights is None else np.asarray(weights)
+        # a weight fraction below one only decides between assignments with the same number of matches
+        weights = weights / (weights.sum() * (1 + 1e-9))
+        lines = self.reference_energies
+
+        peak_first, peak_second = np.triu_indices(len(positions), k=1)
+        line_first, line_second = np.triu_indices(len(lines), k=1)
+        distances = positions[peak_second] - positions[peak_first]
+        valid = distances > 0
+        peak_first, peak_second = peak_first[valid], peak_second[valid]
+
+        # the gain and energy at zero of every pair of peaks with every pair of lines
+        gains = (lines[line_second] - lines[line_first]) / distances[valid, None]
+        intercepts = lines[line_first] - gains * positions[peak_first, None]
+        gains, intercepts = gains.ravel(), intercepts.ravel()
+        plausible = np.abs(intercepts) <= self.max_offset
+        if self.scaling_range is not None:
+            plausible &= (gains >= self.scaling_range[0]) & (
+                gains <= self.scaling_range[1]
+            )
+        gains, intercepts = gains[plausible], intercepts[plausible]
+        instrumentation.count("calibration hypotheses", len(gains))
+
+        best_score, best = -1.0, None
+        # the hypotheses are scored in blocks, which bounds the memory use for long lists of lines
+        block_size = max(1, 2**20 // max(len(positions), len(lines)))
+        for block_start in range(0, len(gains), block_size):
+            block = slice(block_start, block_start + block_size)
+            energies = intercepts[block, None] + gains[block, None] * positions
+            nearest, within = self.nearest_lines(energies)
+            # a line counts once, however many peaks land on it
+            matched = np.zeros((len(energies), len(lines)), dtype=bool)
+            rows, columns = np.nonzero(within)
+            matched[rows, nearest[rows, columns]] = True
+            scores = matched.sum(axis=1) + within @ weights
+            index = int(np.argmax(scores))
+            if scores[index] > best_score:
+                best_score = scores[index]
+                best = (gains[block][index], intercepts[block][index])
+
+        if best is None or best_score < self.min_matches:
+            raise ValueError(
+                f"No assignment of the peaks matches {self.min_matches} reference lines."
+            )
+        return self.matches(np.array([best[1], best[0]]), positions)
+
+    def matches(
+        self, coefficients: np.ndarray, positions: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Matches the peaks to the nearest reference line under a calibration, every line is matched to at most one peak.
+
+        Args:
+            coefficients (np.ndarray): coefficients of the calibration polynomial, starting with the constant
+            positions (np.ndarray): pulse heights of the peaks
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: positions in the peak array and in the reference lines of the matched peaks
+        """
+        energies = np.polynomial.polynomial.polyval(positions, coefficients)
+        nearest, within = self.nearest_lines(energies)
+        residuals = np.abs(energies - self.reference_energies[nearest])
+
+        # of the peaks on the same line, the closest one is kept
+        peaks = np.flatnonzero(within)
+        peaks = peaks[np.lexsort((residuals[peaks], nearest[peaks]))]
+        _, first = np.unique(nearest[peaks], return_index=True)
+        peaks = np.sort(peaks[first])
+        return peaks, nearest[peaks]
+
+    def fit(
+        self,
+        positions: np.ndarray,
+        widths: np.ndarray,
+        weights: np.ndarray | None = None,
+        iterations: int = 3,
+    ) -> CalibrationResult:
+        """Assigns the peaks to reference lines and fits the calibration on the matched peaks.
+
+        The fit is weighted with the widths of the peaks. When more peaks match than there are coefficients,
+        the covariance is scaled with the scatter of the residuals, so only the relative widths matter.
+        With exactly as many peaks as coefficients the fit has no residuals, the uncertainties then
+        come from the peak widths alone, see 'least_squares'. After every fit the peaks are matched again,
+        which can add peaks that only land on their line with the quadratic term.
+
+        Args:
+            positions (np.ndarray): pulse heights of the fitted peaks
+            widths (np.ndarray): widths of the fitted peaks, in the same unit
+            weights (np.ndarray | None, optional): importance of every peak in the assignment search. Defaults to None.
+            iterations (int, optional): largest number of times the peaks are matched and fitted. Defaults to 3.
+
+        Raises:
+            ValueError: when too few peaks match a reference line
+
+        Returns:
+            CalibrationResult: the calibration with its uncertainties
+        """
+        positions = np.asarray(positions, dtype=float)
+        widths = np.asarray(widths, dtype=float)
+        peaks, lines = self.assign(positions, weights)
+
+        for _ in range(iterations):
+            if len(peaks) < self.min_matches:
+                raise ValueError(
+                    f"Only {len(peaks)} peaks match a reference line, {self.min_matches} are needed."
+                )
+            result = self.least_squares(
+                positions[peaks], widths[peaks], self.reference_energies[lines]
+            )
+            new_peaks, new_lines = self.matches(result.coefficients, positions)
+            if np.array_equal(new_peaks, peaks) and np.array_equal(new_lines, lines):
+                break
+            peaks, lines = new_peaks, new_lines
+
+        return result
+
+    def least_squares(
+        self, positions: np.ndarray, widths: np.ndarray, energies: np.ndarray
+    ) -> CalibrationResult:
+        """Weighted least squares fit of the calibration polynomial on matched peaks.
+
+        The widths of the peaks, converted to keV, are the uncertainties of the energies. The covariance is scaled
+        with the reduced chi squared when there are degrees of freedom. Without degrees of freedom it is not scaled,
+        so the uncertainties are those of the peak widths alone, which overestimates the error of well fitted peaks.
+
+        Args:
+            positions (np.ndarray): pulse heights of the matched peaks
+            widths (np.ndarray): widths of the matched peaks
+            energies (np.ndarray): literature energies of the matched lines
+
+        Returns:
+            CalibrationResult: the calibration with its uncertainties
+        """
+        design = np.vander(positions, self.degree + 1, increasing=True)
+        # the widths in keV, with the average gain
+        gain = np.ptp(energies) / np.ptp(positions)
+        sigmas = np.where(widths > 0, widths, np.nanmedian(widths)) * gain
+        sigmas = np.nan_to_num(sigmas, nan=1.0)
+
+        weighted_design = design / sigmas[:, None]
+        coefficients, *_ = np.linalg.lstsq(
+            weighted_design, energies / sigmas, rcond=None
+        )
+        covariance = np.linalg.inv(weighted_design.T @ weighted_design)
+        residuals = design @ coefficients - energies
+        chi_squared = float(np.sum((residuals / sigmas) ** 2))
+        degrees_of_freedom = len(positions) - len(coefficients)
+        # without degrees of freedom the residuals are zero and say nothing about the scatter
+        if degrees_of_freedom > 0:
+            covariance *= chi_squared / degrees_of_freedom
+
+        matches = pd.DataFrame(
+            {
+                "pulseheight": positions,
+                "width": widths,
+                "energy": energies,
+                "residual": residuals,
+            }
+        )
+        return CalibrationResult(coefficients, covariance, matches, chi_squared)
+
+    @instrumentation.timed("auto calibration")
+    def calibrate(
+        self, process_data: ProcessData, domain_width: float, channel: int | str = 0
+    ) -> CalibrationResult:
+        """Fits the most prominent peaks of a spectrum and calibrates it on the reference lines.
+
+        No prominence threshold is needed, the peaks are taken from the prominence profile of the spectrum.
+
+        Args:
+            process_data (ProcessData): the uncalibrated spectrum
+            domain_width (float): width of the domains used for fitting the peaks, in pulse height
+            channel (int | str, optional): number or column name of the channel. Defaults to 0, the first channel.
+
+        Returns:
+            CalibrationResult: the calibration with its uncertainties
+        """
+        position = process_data.channel_positions(channel)
+        maxima, prominences = process_data.prominence_profile(position)
+        maxima = maxima[-self.max_peaks :]
+        prominences = prominences[-self.max_peaks :]
+        order = np.argsort(maxima)
+
+        peaks = pd.DataFrame({"x_peaks": process_data.x[maxima[order]]})
+        fitted_peaks = process_data.fit_peaks(
+            peaks=peaks, domain_width=domain_width, channel=channel
+        )
+        success = fitted_peaks["success"].to_numpy()
+        fitted_energies = fitted_peaks["energy"].to_numpy()[success]
+        # the fitted positions are sorted again, a fit can move a peak past its neighbour
+        fitted_order = np.argsort(fitted_energies)
+
+        return self.fit(
+            positions=fitted_energies[fitted_order],
+            widths=np.abs(fitted_peaks["stderr"].to_numpy()[success][fitted_order]),
+            weights=prominences[order][success][fitted_order],
+        )
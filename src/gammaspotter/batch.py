@@ -0,0 +1,438 @@
+import argparse
+import os
+import sys
+import pandas as pd
+
+from glob import glob
+from contextlib import nullcontext
+from pathlib import Path
+from importlib import resources as impresources
+from concurrent.futures import ProcessPoolExecutor
+
+from gammaspotter.process_data import ProcessData
+from gammaspotter.match_features import MatchFeatures
+from gammaspotter.catalog import Catalog
+from gammaspotter.spectrum_store import SpectrumStore
+from gammaspotter.instrumentation import instrumentation
+from gammaspotter.auto_calibration import CalibrationResult
+from gammaspotter.calibration_store import CalibrationStore
+
+RESULT_COLUMNS = [
+    "File",
+    "Peak Number",
+    "Energy",
+    "Energy Std",
+    "Fit Success",
+    "Isotope",
+    "Percentage",
+    "Literature Energy",
+]
+
+# catalog, spectrum store and calibration of the current worker process, set by init_worker
+_catalog = None
+_spectrum_store = None
+_calibration = None
+# calibration profiles and detector the calibration of every file is looked up in
+_calibration_store = None
+_detector = None
+
+
+def default_catalog_path() -> Path:
+    """Path of the isotope catalog which is also loaded by default in the GUI."""
+    return impresources.files("gammaspotter.catalogs") / "gamma-energies-common.csv"
+
+
+def collect_files(patterns: list[str]) -> list[Path]:
+    """Expands directories and glob patterns to a sorted list of CSV files.
+
+    Args:
+        patterns (list[str]): files, directories or glob patterns.
+
+    Returns:
+        list[Path]: the CSV files to analyze, without duplicates.
+    """
+    files = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            files.extend(sorted(path.glob("*.csv")))
+        elif path.is_file():
+            files.append(path)
+        else:
+            files.extend(sorted(Path(match) for match in glob(pattern)))
+
+    return list(dict.fromkeys(files))
+
+
+def analyze_spectrum(
+    data: pd.DataFrame,
+    catalog: Catalog,
+    prominence: float,
+    domain_width: float,
+    max_results: int,
+    batched_fit: bool = False,
+    all_channels: bool = False,
+) -> pd.DataFrame:
+    """Runs peak detection, peak fitting and isotope matching on a single spectrum.
+
+    Args:
+        data (pd.DataFrame): calibrated spectrum as read from a PicoScope CSV file.
+        catalog (Catalog): isotope catalog to match the peaks with.
+        prominence (float): peak detection threshold.
+        domain_width (float): width of the domains used for fitting the peaks.
+        max_results (int): maximum number of matches per peak.
+        batched_fit (bool, optional): fit all peaks together with 'fit_peaks_batched'. Defaults to False.
+        all_channels (bool, optional): analyze every count column instead of only the first, the results get a 'Channel' column. Defaults to False.
+
+    Returns:
+        pd.DataFrame: one row per match, peaks without matches or with a failed fit get a single row without isotope.
+    """
+    process_data = ProcessData(data)
+    if all_channels:
+        peaks = process_data.find_gamma_peaks_all_channels(prominence=prominence)
+        channel = peaks["channel"].tolist()
+    else:
+        peaks = process_data.find_gamma_peaks(prominence=prominence)
+        channel = 0
+    # the peaks of every channel are fitted in one pass
+    if batched_fit:
+        fitted_peaks = process_data.fit_peaks_batched(
+            peaks=peaks, domain_width=domain_width, channel=channel
+        )
+    else:
+        fitted_peaks = process_data.fit_peaks(
+            peaks=peaks, domain_width=domain_width, channel=channel
+        )
+
+    if all_channels:
+        # the peaks are numbered per channel
+        fitted_peaks.insert(
+            0, "peak", peaks.groupby("channel").cumcount().to_numpy() + 1
+        )
+        fitted_peaks["channel"] = channel
+    else:
+        fitted_peaks.insert(0, "peak", range(1, len(fitted_peaks) + 1))
+
+    matches = MatchFeatures(
+        data_peaks=fitted_peaks, catalog_data=catalog
+    ).match_isotopes(max_results=max_results)
+
+    fitted_peaks = fitted_peaks.rename(
+        columns={
+            "peak": "Peak Number",
+            "energy": "Energy",
+            "stderr": "Energy Std",
+            "success": "Fit Success",
+            "channel": "Channel",
+        }
+    )
+    matches = matches.rename(columns={"Energy": "Literature Energy"})
+
+    if all_channels:
+        fitted_peaks.insert(0, "Channel", fitted_peaks.pop("Channel"))
+        return fitted_peaks.merge(matches, on=["Channel", "Peak Number"], how="left")
+    return fitted_peaks.merge(matches, on="Peak Number", how="left")
+
+
+def init_worker(
+    catalog_path: str,
+    cache_dir: str | None = None,
+    calibration: CalibrationResult | None = None,
+    detector: str | None = None,
+    calibration_dir: str | None = None,
+) -> None:
+    """Loads the catalog once in every worker process and opens the spectrum store, if a cache directory is given.
+    The calibration, if given, is applied to every spectrum when it is read. With a detector, every spectrum is
+    calibrated with the profile of the detector that was valid when its file was written instead.
+    """
+    global _catalog, _spectrum_store, _calibration, _calibration_store, _detector
+    _catalog = Catalog.from_csv(catalog_path)
+    _spectrum_store = SpectrumStore(cache_dir) if cache_dir else None
+    _calibration = calibration
+    _calibration_store = CalibrationStore(calibration_dir) if detector else None
+    _detector = detector
+
+
+def analyze_file(
+    file_path: Path,
+    prominence: float,
+    domain_width: float,
+    max_results: int,
+    batched_fit: bool = False,
+    all_channels: bool = False,
+) -> pd.DataFrame:
+    """Reads and analyzes a single spectrum file with the catalog of the current worker.
+
+    Args:
+        file_path (Path): path of the spectrum file.
+        prominence (float): peak detection threshold.
+        domain_width (float): width of the domains used for fitting the peaks.
+        max_results (int): maximum number of matches per peak.
+        batched_fit (bool, optional): fit all peaks together with 'fit_peaks_batched'. Defaults to False.
+        all_channels (bool, optional): analyze every count column instead of only the first. Defaults to False.
+
+    Returns:
+        pd.DataFrame: the matches of the spectrum, labeled with the file name.
+    """
+    with instrumentation.stage("read spectrum"):
+        if _spectrum_store is not None:
+            data = _spectrum_store.load(file_path)
+        else:
+            data = pd.read_csv(file_path)
+        calibration = _calibration
+        if _detector is not None:
+            calibration = _calibration_store.load_for_file(_detector, file_path)
+        # only the energies are computed, the counts are used as they were read
+        if calibration is not None:
+            data = calibration.apply(data)
+
+    results = analyze_spectrum(
+        data=data,
+        catalog=_catalog,
+        prominence=prominence,
+        domain_width=domain_width,
+        max_results=max_results,
+        batched_fit=batched_fit,
+        all_channels=all_channels,
+    )
+    results.insert(0, "File", str(file_path))
+
+    return results
+
+
+def measure_file(*args) -> tuple[pd.DataFrame, dict]:
+    """Analyzes a file in a worker process with 'analyze_file' and returns the instrumentation report of the file with the results."""
+    instrumentation.reset()
+    return analyze_file(*args), instrumentation.report()
+
+
+def run_batch(
+    files: list[Path],
+    catalog_path: str | Path,
+    prominence: float = 100,
+    domain_width: float = 60,
+    max_results: int = 5,
+    workers: int | None = None,
+    batched_fit: bool = False,
+    cache_dir: str | Path | None = None,
+    all_channels: bool = False,
+    profile: bool = False,
+    calibration: CalibrationResult | None = None,
+    detector: str | None = None,
+    calibration_dir: str | Path | None = None,
+) -> tuple[pd.DataFrame, dict[Path, str]]:
+    """Analyzes many spectrum files, spread over a pool of worker processes.
+
+    The time spent in every stage of the analysis of all files is added to the instrumentation of this process.
+
+    Args:
+        files (list[Path]): spectrum files to analyze.
+        catalog_path (str | Path): path of the isotope catalog.
+        prominence (float, optional): peak detection threshold. Defaults to 100.
+        domain_width (float, optional): width of the domains used for fitting the peaks. Defaults to 60.
+        max_results (int, optional): maximum number of matches per peak. Defaults to 5.
+        workers (int | None, optional): number of worker processes. Defaults to None, which uses every CPU.
+        batched_fit (bool, optional): fit all peaks of a spectrum together with 'fit_peaks_batched'. Defaults to False.
+        cache_dir (str | Path | None, optional): directory of the binary spectrum cache. Defaults to None, which parses every CSV file.
+        all_channels (bool, optional): analyze every count column instead of only the first. Defaults to False.
+        profile (bool, optional): profile the analysis with cProfile, the files are then analyzed one by one in this process. Defaults to False.
+        calibration (CalibrationResult | None, optional): calibration applied to the uncalibrated spectra when they are read. Defaults to None, the spectra are already calibrated.
+        detector (str | None, optional): calibrate every spectrum with the profile of this detector that was valid when its file was written, see 'CalibrationStore.load_for_file'. Defaults to None.
+        calibration_dir (str | Path | None, optional): directory of the calibration profiles. Defaults to None, the data directory of the user.
+
+    Returns:
+        tuple[pd.DataFrame, dict[Path, str]]: consolidated results of all files and the error message of every failed file.
+    """
+    catalog_path = str(catalog_path)
+    cache_dir = str(cache_dir) if cache_dir else None
+    calibration_dir = str(calibration_dir) if calibration_dir else None
+    workers = 1 if profile else workers or os.cpu_count() or 1
+
+    results = []
+    failures = {}
+    if workers == 1:
+        init_worker(catalog_path, cache_dir, calibration, detector, calibration_dir)
+        with instrumentation.profile() if profile else nullcontext():
+            for file_path in files:
+                try:
+                    results.append(
+                        analyze_file(
+                            file_path,
+                            prominence,
+                            domain_width,
+                            max_results,
+                            batched_fit,
+                            all_channels,
+                        )
+                    )
+                except Exception as error:
+                    failures[file_path] = str(error)
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(catalog_path, cache_dir, calibration, detector, calibration_dir),
+        ) as executor:
+            futures = {
+                file_path: executor.submit(
+                    measure_file,
+                    file_path,
+                    prominence,
+                    domain_width,
+                    max_results,
+                    batched_fit,
+                    all_channels,
+                )
+                for file_path in files
+            }
+            for file_path, future in futures.items():
+                try:
+                    file_results, report = future.result()
+                    results.append(file_results)
+                    instrumentation.merge(report)
+                except Exception as error:
+                    failures[file_path] = str(error)
+
+    if results:
+        batch_results = pd.concat(results, ignore_index=True)
+    elif all_channels:
+        batch_results = pd.DataFrame(
+            columns=RESULT_COLUMNS[:1] + ["Channel"] + RESULT_COLUMNS[1:]
+        )
+    else:
+        batch_results = pd.DataFrame(columns=RESULT_COLUMNS)
+
+    return batch_results, failures
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="gammaspotter-batch",
+        description="Detect, fit and match the gamma peaks of many spectra without the GUI.",
+    )
+    parser.add_argument(
+        "paths", nargs="+", help="spectrum CSV files, directories or glob patterns"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="CSV file to write the consolidated results to, defaults to stdout",
+    )
+    parser.add_argument(
+        "-c",
+        "--catalog",
+        default=None,
+        help="isotope catalog CSV, defaults to gamma-energies-common.csv",
+    )
+    parser.add_argument(
+        "-p",
+        "--prominence",
+        type=float,
+        default=100,
+        help="peak detection threshold (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-w",
+        "--domain-width",
+        type=float,
+        default=60,
+        help="fit domain width (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-n",
+        "--max-results",
+        type=int,
+        default=5,
+        help="max. results per peak (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes, defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="directory for binary copies of the spectra, so repeated runs skip CSV parsing",
+    )
+    parser.add_argument(
+        "--batched-fit",
+        action="store_true",
+        help="fit all peaks of a spectrum together in one stacked least squares problem",
+    )
+    parser.add_argument(
+        "--all-channels",
+        action="store_true",
+        help="analyze every count column (counts_ch_A, counts_ch_B, ...) instead of only the first",
+    )
+    parser.add_argument(
+        "--detector",
+        default=None,
+        help="analyze uncalibrated spectra with the calibration profile of this detector that was valid when each file was written, see gammaspotter-calibrate",
+    )
+    parser.add_argument(
+        "--calibration-dir",
+        default=None,
+        help="directory of the calibration profiles, defaults to the data directory of the user",
+    )
+    parser.add_argument(
+        "--stats",
+        default=None,
+        help="JSON file to write the time spent in every stage and the counters of the analysis to",
+    )
+    parser.add_argument(
+        "--profile",
+        default=None,
+        help="file to write a cProfile profile of the analysis to, the files are then analyzed one by one",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+
+    files = collect_files(args.paths)
+    if not files:
+        sys.exit("No CSV files found.")
+
+    if args.detector is not None:
+        try:
+            CalibrationStore(args.calibration_dir).load(args.detector)
+        except ValueError as error:
+            sys.exit(str(error))
+
+    batch_results, failures = run_batch(
+        files=files,
+        catalog_path=args.catalog or default_catalog_path(),
+        prominence=args.prominence,
+        domain_width=args.domain_width,
+        max_results=args.max_results,
+        workers=args.workers,
+        batched_fit=args.batched_fit,
+        cache_dir=args.cache_dir,
+        all_channels=args.all_channels,
+        profile=args.profile is not None,
+        detector=args.detector,
+        calibration_dir=args.calibration_dir,
+    )
+    if args.stats:
+        instrumentation.to_json(args.stats)
+    if args.profile:
+        instrumentation.dump_profile(args.profile)
+
+    batch_results.to_csv(args.output or sys.stdout, index=False)
+
+    for file_path, message in failures.items():
+        print(f"Could not analyze {file_path}: {message}", file=sys.stderr)
+    print(
+        f"Analyzed {len(files) - len(failures)} of {len(files)} files.",
+        file=sys.stderr,
+    )
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
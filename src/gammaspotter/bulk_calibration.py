@@ -0,0 +1,411 @@
+import argparse
+import functools
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from typing import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+
+from gammaspotter.process_data import ProcessData
+from gammaspotter.batch import collect_files, default_catalog_path
+from gammaspotter.auto_calibration import AutoCalibration, CalibrationResult
+from gammaspotter.calibration_store import CalibrationStore, measurement_time
+
+
+def calibrated_path(file_path: Path, output_dir: str | Path | None = None) -> Path:
+    """Path of the calibrated copy of a file, next to the original file unless an output directory is given."""
+    file_path = Path(file_path)
+    filename_extended = file_path.stem + "_calibrated" + file_path.suffix
+    return Path(output_dir or file_path.parent) / filename_extended
+
+
+def stream_calibration(
+    source: Path,
+    destination: Path,
+    scaling_factor: float,
+    horizontal_offset: float,
+    chunk_size: int,
+    dtypes: dict | None = None,
+) -> dict | None:
+    """Calibrates a CSV file chunk by chunk, appending every calibrated chunk to the destination.
+
+    The column types of the chunks have to match, otherwise a value would be written differently
+    than when the whole file is read at once (an integer column with an empty cell becomes a float column).
+
+    Args:
+        source (Path): path of the measurement file
+        destination (Path): path to write the calibrated file to
+        scaling_factor (float): conversion factor of the calibration
+        horizontal_offset (float): energy offset of the calibration
+        chunk_size (int): number of rows read at once
+        dtypes (dict | None, optional): column types to read the chunks with. Defaults to None, which takes the types of the first chunk.
+
+    Returns:
+        dict | None: None when the file was written, or the column types that fit every chunk read so far, to retry with
+    """
+    with pd.read_csv(source, chunksize=chunk_size, dtype=dtypes) as reader, open(
+        destination, "w", newline=""
+    ) as file:
+        for chunk_number, chunk in enumerate(reader):
+            if dtypes is None:
+                dtypes = chunk.dtypes.to_dict()
+            elif chunk.dtypes.to_dict() != dtypes:
+                return {
+                    column: np.result_type(dtype, chunk.dtypes[column])
+                    for column, dtype in dtypes.items()
+                }
+
+            calibrated_chunk = ProcessData.apply_cal_to_data(
+                data=chunk,
+                scaling_factor=scaling_factor,
+                horizontal_offset=horizontal_offset,
+            )
+            calibrated_chunk.to_csv(file, index=False, header=chunk_number == 0)
+
+    return None
+
+
+def calibrate_file(
+    file_path: Path,
+    scaling_factor: float,
+    horizontal_offset: float,
+    output_dir: str | Path | None = None,
+    chunk_size: int = 100000,
+) -> Path:
+    """Calibrates a single measurement file and writes the calibrated copy.
+
+    The file is read in chunks, so the memory use does not grow with the size of the file.
+    The calibrated file is the same, byte for byte, as when the whole file is calibrated at once.
+    It is written to a temporary file first, so an interrupted write never leaves a partial file behind.
+
+    Args:
+        file_path (Path): path of the measurement file
+        scaling_factor (float): conversion factor of the calibration
+        horizontal_offset (float): energy offset of the calibration
+        output_dir (str | Path | None, optional): directory of the calibrated file. Defaults to None, which writes it next to the original file.
+        chunk_size (int, optional): number of rows read at once. Defaults to 100000.
+
+    Returns:
+        Path: path of the calibrated file
+    """
+    new_filename = calibrated_path(file_path, output_dir)
+    temporary_path = new_filename.with_name(f".{new_filename.name}.tmp")
+    try:
+        dtypes = None
+        while True:
+            # a chunk with other column types restarts the file with types that fit both
+            dtypes = stream_calibration(
+                file_path,
+                temporary_path,
+                scaling_factor,
+                horizontal_offset,
+                chunk_size,
+                dtypes,
+            )
+            if dtypes is None:
+                break
+        os.replace(temporary_path, new_filename)
+    finally:
+        temporary_path.unlink(missing_ok=True)
+
+    return new_filename
+
+
+def fit_file_calibration(
+    file_path: Path, auto_calibration: AutoCalibration, domain_width: float
+) -> CalibrationResult:
+    """Calibrates a single measurement file on its own peaks, without writing a calibrated copy.
+
+    Args:
+        file_path (Path): path of the measurement file
+        auto_calibration (AutoCalibration): the reference lines and settings of the calibration
+        domain_width (float): width of the domains used for fitting the peaks, in pulse height
+
+    Returns:
+        CalibrationResult: the calibration of the file
+    """
+    return auto_calibration.calibrate(ProcessData(pd.read_csv(file_path)), domain_width)
+
+
+def auto_calibrate_file(
+    file_path: Path,
+    auto_calibration: AutoCalibration,
+    domain_width: float,
+    output_dir: str | Path | None = None,
+) -> Path:
+    """Calibrates a single measurement file on its own peaks and writes the calibrated copy.
+
+    The calibration, with its uncertainties and matched peaks, is written next to the calibrated file
+    as a JSON file with the same name. The whole file is read at once, the peaks are needed for the calibration.
+
+    Args:
+        file_path (Path): path of the measurement file
+        auto_calibration (AutoCalibration): the reference lines and settings of the calibration
+        domain_width (float): width of the domains used for fitting the peaks, in pulse height
+        output_dir (str | Path | None, optional): directory of the calibrated file. Defaults to None, which writes it next to the original file.
+
+    Returns:
+        Path: path of the calibrated file
+    """
+    data = pd.read_csv(file_path)
+    calibration = auto_calibration.calibrate(ProcessData(data), domain_width)
+
+    new_filename = calibrated_path(file_path, output_dir)
+    temporary_path = new_filename.with_name(f".{new_filename.name}.tmp")
+    try:
+        calibration.apply(data).to_csv(temporary_path, index=False)
+        os.replace(temporary_path, new_filename)
+    finally:
+        temporary_path.unlink(missing_ok=True)
+    calibration.to_json(new_filename.with_suffix(".json"))
+
+    return new_filename
+
+
+def run_calibration(
+    files: list[Path],
+    scaling_factor: float,
+    horizontal_offset: float,
+    output_dir: str | Path | None = None,
+    workers: int | None = None,
+    executor: Executor | None = None,
+    progress: Callable[[int, int], None] | None = None,
+    chunk_size: int = 100000,
+    auto_calibration: AutoCalibration | None = None,
+    domain_width: float = 5,
+    write_copies: bool = True,
+) -> tuple[dict[Path, Path | CalibrationResult], dict[Path, str]]:
+    """Calibrates many measurement files, spread over a pool of worker processes.
+
+    Args:
+        files (list[Path]): measurement files to calibrate
+        scaling_factor (float): conversion factor of the calibration, not used with an automatic calibration
+        horizontal_offset (float): energy offset of the calibration, not used with an automatic calibration
+        output_dir (str | Path | None, optional): directory of the calibrated files. Defaults to None, which writes them next to the original files.
+        workers (int | None, optional): number of worker processes. Defaults to None, which uses every CPU.
+        executor (Executor | None, optional): an existing pool to use instead of starting worker processes. Defaults to None.
+        progress (Callable[[int, int], None] | None, optional): called with the number of finished files and the number of files after every file. Defaults to None.
+        chunk_size (int, optional): number of rows read at once from every file. Defaults to 100000.
+        auto_calibration (AutoCalibration | None, optional): calibrate every file on its own peaks instead, see 'auto_calibrate_file'. Defaults to None.
+        domain_width (float, optional): width of the domains used for fitting the peaks of an automatic calibration. Defaults to 5.
+        write_copies (bool, optional): write calibrated copies of the files with an automatic calibration, otherwise only the calibrations are returned. Defaults to True.
+
+    Returns:
+        tuple[dict[Path, Path | CalibrationResult], dict[Path, str]]: the calibrated file, or the calibration, of every successful file and the error message of every failed file.
+    """
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    written = {}
+    failures = {}
+    if auto_calibration is None:
+        calibrate = functools.partial(
+            calibrate_file,
+            scaling_factor=scaling_factor,
+            horizontal_offset=horizontal_offset,
+            output_dir=output_dir,
+            chunk_size=chunk_size,
+        )
+    elif not write_copies:
+        calibrate = functools.partial(
+            fit_file_calibration,
+            auto_calibration=auto_calibration,
+            domain_width=domain_width,
+        )
+    else:
+        calibrate = functools.partial(
+            auto_calibrate_file,
+            auto_calibration=auto_calibration,
+            domain_width=domain_width,
+            output_dir=output_dir,
+        )
+
+    def report(file_path: Path, calibrate: Callable[[], Path]):
+        try:
+            written[file_path] = calibrate()
+        except Exception as error:
+            failures[file_path] = str(error)
+        if progress is not None:
+            progress(len(written) + len(failures), len(files))
+
+    if executor is None and workers == 1:
+        for file_path in files:
+            report(file_path, lambda: calibrate(file_path))
+        return written, failures
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    futures = {executor.submit(calibrate, file_path): file_path for file_path in files}
+    try:
+        for future in as_completed(futures):
+            report(futures[future], future.result)
+    finally:
+        # an interrupted run does not start the remaining files
+        for future in futures:
+            future.cancel()
+        if own_executor:
+            executor.shutdown()
+
+    return written, failures
+
+
+def summarize(
+    written: dict[Path, Path], failures: dict[Path, str], elapsed: float
+) -> str:
+    """Summary of a calibration run, with the throughput and the failed files."""
+    file_count = len(written) + len(failures)
+    lines = [
+        f"Calibrated {len(written)} of {file_count} files in {elapsed:.2f} s ({file_count / max(elapsed, 1e-9):.1f} files/s)."
+    ]
+    for file_path, message in failures.items():
+        lines.append(f"Could not calibrate {file_path}: {message}")
+    return "\n".join(lines)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="gammaspotter-calibrate",
+        description="Apply a calibration to many measurement files, or save it as a profile of the detector, without the GUI.",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="measurement CSV files, directories or glob patterns",
+    )
+    parser.add_argument(
+        "-s",
+        "--scaling-factor",
+        type=float,
+        default=None,
+        help="conversion factor of the calibration in keV/mV",
+    )
+    parser.add_argument(
+        "-e",
+        "--energy-offset",
+        type=float,
+        default=None,
+        help="energy offset of the calibration in keV",
+    )
+    parser.add_argument(
+        "--auto",
+        nargs="+",
+        metavar="NUCLIDE",
+        default=None,
+        help="calibrate every file on its own peaks, using the lines of these nuclides in the calibration source",
+    )
+    parser.add_argument(
+        "--catalog",
+        default=str(default_catalog_path()),
+        help="isotope catalog with the lines of the nuclides (default: the bundled common catalog)",
+    )
+    parser.add_argument(
+        "--degree",
+        type=int,
+        choices=[1, 2],
+        default=1,
+        help="degree of the automatic calibration, 1 for linear and 2 for quadratic (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-w",
+        "--domain-width",
+        type=float,
+        default=5,
+        help="width of the domains used for fitting the peaks of the automatic calibration, in mV (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--detector",
+        default=None,
+        help="save the calibration as a profile of this detector instead of writing calibrated copies, with --auto every file adds a profile timestamped with its modification time",
+    )
+    parser.add_argument(
+        "--calibration-dir",
+        default=None,
+        help="directory of the calibration profiles, defaults to the data directory of the user",
+    )
+    parser.add_argument(
+        "-d",
+        "--output-dir",
+        default=None,
+        help="directory to write the calibrated files to, defaults to the directory of every file",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes, defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=100000,
+        help="number of rows read at once, limits the memory use for very large files (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+    if args.auto is None and (
+        args.scaling_factor is None or args.energy_offset is None
+    ):
+        parser.error("the scaling factor and energy offset are required without --auto")
+    if not args.paths and (args.auto is not None or args.detector is None):
+        parser.error("no measurement files given")
+    return args
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+
+    if args.detector is not None and args.auto is None:
+        CalibrationStore(args.calibration_dir).save(
+            args.detector,
+            CalibrationResult.linear(args.scaling_factor, args.energy_offset),
+        )
+        print(f"Saved the calibration of {args.detector}.", file=sys.stderr)
+        return
+
+    files = collect_files(args.paths)
+    if not files:
+        sys.exit("No CSV files found.")
+
+    auto_calibration = None
+    if args.auto is not None:
+        try:
+            auto_calibration = AutoCalibration.from_catalog(
+                pd.read_csv(args.catalog), args.auto, degree=args.degree
+            )
+        except ValueError as error:
+            sys.exit(str(error))
+
+    start = time.perf_counter()
+    written, failures = run_calibration(
+        files=files,
+        scaling_factor=args.scaling_factor,
+        horizontal_offset=args.energy_offset,
+        output_dir=args.output_dir,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        auto_calibration=auto_calibration,
+        domain_width=args.domain_width,
+        write_copies=args.detector is None,
+    )
+    if args.detector is not None:
+        store = CalibrationStore(args.calibration_dir)
+        for file_path, calibration in written.items():
+            store.save(
+                args.detector,
+                calibration,
+                timestamp=measurement_time(file_path),
+                source=file_path,
+            )
+    print(summarize(written, failures, time.perf_counter() - start), file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
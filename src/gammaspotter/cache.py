@@ -0,0 +1,49 @@
+import threading
+
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 128) -> None:
+        """Mapping with a bounded size, which evicts the least recently used entry when it is full.
+
+        The cache can be shared between threads, for example the GUI thread and the analysis worker.
+
+        Args:
+            maxsize (int, optional): maximum number of entries. Defaults to 128.
+        """
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Returns the value of a key and marks it as recently used, or the default when the key is missing."""
+        with self.lock:
+            try:
+                value = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        """Stores a value, evicting the least recently used entry if the cache is full."""
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,162 @@
+import os
+import re
+import json
+
+from pathlib import Path
+from urllib.parse import quote
+from datetime import datetime
+
+from gammaspotter.auto_calibration import CalibrationResult
+
+
+def measurement_time(path: str | Path) -> datetime:
+    """Time a measurement was made, the time its file was last written."""
+    return datetime.fromtimestamp(Path(path).stat().st_mtime)
+
+
+def default_profile_dir() -> Path:
+    """Directory of the calibration profiles, inside the data directory of the user."""
+    data_home = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(data_home) / "gammaspotter" / "calibrations"
+
+
+class CalibrationStore:
+    def __init__(self, profile_dir: str | Path | None = None) -> None:
+        """Calibration profiles of every detector, kept between sessions so spectra can be calibrated when they are read.
+
+        Every detector has a JSON file with the history of its calibrations, each with the time it was made,
+        so a measurement can be calibrated with the calibration that was valid at the time it was made.
+
+        Args:
+            profile_dir (str | Path | None, optional): directory of the profiles. Defaults to the data directory of the user.
+        """
+        self.profile_dir = Path(profile_dir) if profile_dir else default_profile_dir()
+
+    def path(self, detector: str) -> Path:
+        """Path of the profile file of a detector, the name is percent-encoded so every detector has its own file.
+
+        Raises:
+            ValueError: when the name is empty
+        """
+        if not detector.strip():
+            raise ValueError("The name of the detector is empty.")
+        return self.profile_dir / f"{quote(detector, safe='')}.json"
+
+    def legacy_path(self, detector: str) -> Path | None:
+        """Profile file of a detector saved under the name of older versions, which replaced unsafe characters by '_'."""
+        file_name = re.sub(r"[^\w.-]", "_", detector)
+        path = self.profile_dir / f"{file_name}.json"
+        if path.exists() and json.loads(path.read_text())["detector"] == detector:
+            return path
+        return None
+
+    def detectors(self) -> list[str]:
+        """Names of the detectors that have a calibration, sorted."""
+        if not self.profile_dir.is_dir():
+            return []
+        return sorted(
+            json.loads(path.read_text())["detector"]
+            for path in self.profile_dir.glob("*.json")
+        )
+
+    def history(self, detector: str) -> list[dict]:
+        """Every calibration of a detector, oldest first.
+
+        Args:
+            detector (str): name of the detector
+
+        Returns:
+            list[dict]: the calibrations, with their 'timestamp', 'source' and 'calibration'
+        """
+        path = self.path(detector)
+        if not path.exists():
+            path = self.legacy_path(detector)
+            if path is None:
+                return []
+        return json.loads(path.read_text())["profiles"]
+
+    def save(
+        self,
+        detector: str,
+        calibration: CalibrationResult,
+        timestamp: datetime | None = None,
+        source: str = "",
+    ) -> None:
+        """Adds a calibration to the history of a detector.
+
+        Args:
+            detector (str): name of the detector
+            calibration (CalibrationResult): the calibration
+            timestamp (datetime | None, optional): time from which the calibration is valid. Defaults to None, now.
+            source (str, optional): measurement the calibration was made with, for reference. Defaults to "".
+        """
+        timestamp = (timestamp or datetime.now()).isoformat(timespec="seconds")
+        profiles = [
+            profile
+            for profile in self.history(detector)
+            if profile["timestamp"] != timestamp
+        ]
+        profiles.append(
+            {
+                "timestamp": timestamp,
+                "source": str(source),
+                "calibration": calibration.to_dict(),
+            }
+        )
+        profiles.sort(key=lambda profile: profile["timestamp"])
+
+        # write to a temporary file first, so an interrupted write never loses the history
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        path = self.path(detector)
+        temporary_path = path.with_name(f".{path.name}.tmp")
+        temporary_path.write_text(
+            json.dumps({"detector": detector, "profiles": profiles}, indent=2)
+        )
+        os.replace(temporary_path, path)
+
+        # the history now lives in the file of the encoded name
+        legacy_path = self.legacy_path(detector)
+        if legacy_path is not None and legacy_path != path:
+            legacy_path.unlink()
+
+    def load(self, detector: str, at: datetime | None = None) -> CalibrationResult:
+        """The calibration of a detector that was valid at a time.
+
+        Args:
+            detector (str): name of the detector
+            at (datetime | None, optional): time of the measurement. Defaults to None, the latest calibration.
+
+        Raises:
+            ValueError: when the detector has no calibration from before that time
+
+        Returns:
+            CalibrationResult: the calibration
+        """
+        profiles = self.history(detector)
+        if at is not None:
+            at = at.isoformat(timespec="seconds")
+            profiles = [profile for profile in profiles if profile["timestamp"] <= at]
+        if not profiles:
+            raise ValueError(f"No calibration of detector {detector}.")
+        return CalibrationResult.from_dict(profiles[-1]["calibration"])
+
+    def load_for_file(self, detector: str, path: str | Path) -> CalibrationResult:
+        """The calibration of a detector that was valid when a measurement file was written.
+
+        Measurements from before the first calibration of the detector are calibrated with the first calibration.
+
+        Args:
+            detector (str): name of the detector
+            path (str | Path): path of the measurement
+
+        Raises:
+            ValueError: when the detector has no calibration
+
+        Returns:
+            CalibrationResult: the calibration
+        """
+        profiles = self.history(detector)
+        at = measurement_time(path)
+        if profiles and at.isoformat(timespec="seconds") < profiles[0]["timestamp"]:
+            return CalibrationResult.from_dict(profiles[0]["calibration"])
+        return self.load(detector, at=at)
@@ -0,0 +1,281 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+
+# version of the compiled format, part of the checksum so an older cache entry is never read
+FORMAT_VERSION = 2
+COLUMNS = ["energies", "codes", "half_lives", "yields", "positions", "nuclides"]
+HALF_LIFE_UNITS = {
+    "seconds": 1.0,
+    "minutes": 60.0,
+    "hours": 3600.0,
+    "days": 86400.0,
+    "years": 365.25 * 86400.0,
+}
+
+
+def default_catalog_cache_dir() -> Path:
+    """Directory of the compiled catalogs, inside the cache directory of the user."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "gammaspotter" / "catalogs"
+
+
+def checksum(path: str | Path) -> str:
+    """SHA-256 checksum of the contents of a catalog file and the compiled format."""
+    digest = hashlib.sha256(f"gammaspotter-catalog-{FORMAT_VERSION}".encode())
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compile_columns(catalog_data: pd.DataFrame) -> tuple[dict[str, np.ndarray], int]:
+    """Turns a catalog into sorted, compact columns, without duplicate lines.
+
+    The nuclides are stored once, every line refers to its nuclide by a code. The half-lives are
+    converted to seconds. Catalogs without half-lives or yields get NaN in those columns.
+    Lines without a nuclide are left out.
+
+    Args:
+        catalog_data (pd.DataFrame): catalog with the energies in the first column and the isotopes in the second column,
+            optionally with 'Half-Life', 'Half-Life Unit' and 'Percent Yield per decay' columns.
+
+    Returns:
+        tuple[dict[str, np.ndarray], int]: the columns, and the number of duplicate lines that were left out
+    """
+    # a line without a nuclide can not be matched to one, the other lines keep their row in the file
+    named = catalog_data.iloc[:, 1].notna().to_numpy()
+    rows = np.flatnonzero(named)
+    catalog_data = catalog_data[named]
+    energies = catalog_data.iloc[:, 0].to_numpy(dtype=float)
+    codes, nuclides = pd.factorize(catalog_data.iloc[:, 1], sort=True)
+
+    if "Half-Life" in catalog_data.columns and "Half-Life Unit" in catalog_data.columns:
+        seconds = catalog_data["Half-Life Unit"].map(HALF_LIFE_UNITS).to_numpy(float)
+        half_lives = catalog_data["Half-Life"].to_numpy(dtype=float) * seconds
+    else:
+        half_lives = np.full(len(catalog_data), np.nan)
+    if "Percent Yield per decay" in catalog_data.columns:
+        yields = catalog_data["Percent Yield per decay"].to_numpy(dtype=float)
+    else:
+        yields = np.full(len(catalog_data), np.nan)
+
+    # a line listed twice would be matched twice, the first listing is kept
+    _, first = np.unique(
+        np.stack([energies, codes.astype(float)], axis=1), axis=0, return_index=True
+    )
+    positions = np.sort(first)
+    # a stable sort keeps the file order for lines with the same energy
+    positions = positions[np.argsort(energies[positions], kind="stable")]
+
+    columns = {
+        "energies": energies[positions],
+        "codes": codes[positions].astype(np.min_scalar_type(max(len(nuclides), 1))),
+        "half_lives": half_lives[positions],
+        "yields": yields[positions],
+        "positions": rows[positions].astype(np.int64),
+        "nuclides": np.asarray(nuclides, dtype=str),
+    }
+    return columns, len(catalog_data) - len(positions)
+
+
+class Catalog:
+    def __init__(self, catalog_data: pd.DataFrame, name: str = "") -> None:
+        """Index of an isotope catalog which keeps the literature energies sorted,
+        so the entries near a measured energy can be found with a binary search.
+
+        The catalog is held as compact columns, which can be compiled to a binary format and memory-mapped,
+        see 'from_csv'. Lines that are listed twice are only kept once.
+
+        Args:
+            catalog_data (pd.DataFrame): catalog with the energies in the first column and the isotopes in the second column.
+            name (str, optional): name of the catalog, used for logging. Defaults to "".
+        """
+        columns, self.duplicates = compile_columns(catalog_data)
+        self.set_columns(columns, name)
+
+    def set_columns(self, columns: dict[str, np.ndarray], name: str) -> None:
+        self.name = name
+        self.columns = columns
+        self.energies = columns["energies"]
+        self.codes = columns["codes"]
+        self.half_lives = columns["half_lives"]
+        self.yields = columns["yields"]
+        # row of every line in the catalog file, for keeping the order of the file
+        self.positions = columns["positions"]
+        self.nuclides = columns["nuclides"]
+
+    @property
+    def isotopes(self) -> np.ndarray:
+        """Name of the nuclide of every line."""
+        return self.nuclides[self.codes]
+
+    @classmethod
+    def from_csv(
+        cls, path: str | Path, cache_dir: str | Path | None = None
+    ) -> "Catalog":
+        """Loads a catalog CSV file, which is compiled on the first load and memory-mapped afterwards.
+
+        The compiled catalog is found by the checksum of the file, so a catalog is only parsed again when
+        its contents change, wherever it is stored. The memory-mapped columns are shared by every process that loads the catalog.
+
+        Args:
+            path (str | Path): path to the catalog file.
+            cache_dir (str | Path | None, optional): directory of the compiled catalogs. Defaults to the cache directory of the user.
+
+        Returns:
+            Catalog: the indexed catalog.
+        """
+        path = Path(path)
+        cache_dir = Path(cache_dir) if cache_dir else default_catalog_cache_dir()
+        compiled_dir = cache_dir / checksum(path)
+
+        if not (compiled_dir / "header.json").exists():
+            catalog = cls(pd.read_csv(path), name=path.name)
+            try:
+                catalog.save(compiled_dir)
+            except OSError:
+                # the cache is optional, a read-only cache directory should not prevent loading
+                return catalog
+
+        return cls.load(compiled_dir, name=path.name)
+
+    def save(self, directory: str | Path) -> None:
+        """Writes the compiled catalog, one .npy file per column.
+
+        Args:
+            directory (str | Path): directory of the compiled catalog, it is replaced as a whole
+        """
+        directory = Path(directory)
+        directory.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temporary directory first, so an interrupted write never leaves a broken catalog
+        temporary_dir = directory.with_name(f".{directory.name}.{os.getpid()}.tmp")
+        shutil.rmtree(temporary_dir, ignore_errors=True)
+        temporary_dir.mkdir()
+        try:
+            for column in COLUMNS:
+                np.save(temporary_dir / f"{column}.npy", self.columns[column])
+            header = {
+                "name": self.name,
+                "format": FORMAT_VERSION,
+                "lines": len(self),
+                "duplicates": self.duplicates,
+            }
+            (temporary_dir / "header.json").write_text(json.dumps(header))
+            try:
+                os.replace(temporary_dir, directory)
+            except OSError:
+                # another process compiled the same catalog first
+                if not (directory / "header.json").exists():
+                    raise
+        finally:
+            shutil.rmtree(temporary_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str | Path, name: str | None = None) -> "Catalog":
+        """Memory-maps a compiled catalog.
+
+        Args:
+            directory (str | Path): directory of the compiled catalog
+            name (str | None, optional): name of the catalog. Defaults to None, the name it was compiled with.
+
+        Returns:
+            Catalog: the indexed catalog, on top of the read-only files
+        """
+        directory = Path(directory)
+        header = json.loads((directory / "header.json").read_text())
+        columns = {
+            column: np.load(directory / f"{column}.npy", mmap_mode="r")
+            for column in COLUMNS
+        }
+        catalog = cls.__new__(cls)
+        catalog.duplicates = header["duplicates"]
+        catalog.set_columns(columns, header["name"] if name is None else name)
+        return catalog
+
+    def __len__(self) -> int:
+        return len(self.energies)
+
+    def window(
+        self, energies: np.ndarray, sigmas: np.ndarray, n_sigma: float | None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Finds the range of sorted catalog entries within n_sigma standard deviations of every energy.
+
+        Args:
+            energies (np.ndarray): measured energies.
+            sigmas (np.ndarray): standard deviations of the measured energies.
+            n_sigma (float | None): half width of the window in standard deviations. None returns the whole catalog.
+
+        Returns:
+            tuple[np.ndarray]: start and stop positions in the sorted catalog for every energy.
+        """
+        energies = np.asarray(energies, dtype=float)
+        if n_sigma is None:
+            starts = np.zeros(len(energies), dtype=np.intp)
+            stops = np.full(len(energies), len(self), dtype=np.intp)
+            return starts, stops
+
+        half_width = n_sigma * np.asarray(sigmas, dtype=float)
+        starts = np.searchsorted(self.energies, energies - half_width, side="left")
+        stops = np.searchsorted(self.energies, energies + half_width, side="right")
+        return starts, stops
+
+    def candidates(
+        self, energies: np.ndarray, sigmas: np.ndarray, n_sigma: float | None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Lists every catalog entry within n_sigma standard deviations of every energy.
+
+        Args:
+            energies (np.ndarray): measured energies.
+            sigmas (np.ndarray): standard deviations of the measured energies.
+            n_sigma (float | None): half width of the window in standard deviations. None returns the whole catalog.
+
+        Returns:
+            tuple[np.ndarray]: for every candidate the number of the energy it belongs to and its position in the sorted catalog.
+        """
+        starts, stops = self.window(energies, sigmas, n_sigma)
+        lengths = stops - starts
+
+        rows = np.repeat(np.arange(len(starts)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+        return rows, np.repeat(starts, lengths) + offsets
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="gammaspotter-catalog",
+        description="Compile isotope catalogs to the binary format that is memory-mapped by the GUI and the batch tools.",
+    )
+    parser.add_argument("paths", nargs="+", help="catalog CSV files")
+    parser.add_argument(
+        "-o",
+        "--cache-dir",
+        default=None,
+        help="directory of the compiled catalogs, defaults to the cache directory of the user which the GUI and the batch tools read",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+
+    for path in map(Path, args.paths):
+        # compiled in the layout of the cache, so later loads of the file memory-map it
+        catalog = Catalog.from_csv(path, cache_dir=args.cache_dir)
+        print(
+            f"{path.name}: {len(catalog)} lines of {len(catalog.nuclides)} nuclides, {catalog.duplicates} duplicate lines left out.",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,80 @@
-from numpy import exp, pi
+import numpy as np
+
+from numpy import exp, pi, sqrt, log
 
 
 class FitModels:
     def gaussian(x, amp, cen, wid, startheight):
         return amp * exp(-((x - cen) ** 2) / (2 * wid**2)) + startheight
 
+    def gaussian_jacobian(x, amp, cen, wid, startheight):
+        """Partial derivatives of the gaussian model to its parameters, one column per parameter."""
+        gauss = exp(-((x - cen) ** 2) / (2 * wid**2))
+        d_amp = gauss
+        d_cen = amp * gauss * (x - cen) / wid**2
+        d_wid = amp * gauss * (x - cen) ** 2 / wid**3
+        d_startheight = np.ones_like(gauss)
+        return np.stack([d_amp, d_cen, d_wid, d_startheight], axis=-1)
+
+    def gaussian_guess(x, y):
+        """Initial amplitude, center, width and start height of a gaussian peak from the moments of the domain.
+
+        Several domains can be estimated at once by stacking them in 2-D arrays, padded with NaN.
+
+        Args:
+            x (np.ndarray): x-values of the domain, the last axis runs along the domain
+            y (np.ndarray): y-values of the domain, the last axis runs along the domain
+
+        Returns:
+            list: the estimated parameters, ordered like the arguments of FitModels.gaussian
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+
+        startheight = np.nanmin(y, axis=-1)
+        net_counts = y - startheight[..., np.newaxis]
+        total = np.nansum(net_counts, axis=-1)
+        # flat domains fall back to the middle of the domain
+        flat = total <= 0
+        total = np.where(flat, 1, total)
+
+        span = np.nanmax(x, axis=-1) - np.nanmin(x, axis=-1)
+        cen = np.nansum(x * net_counts, axis=-1) / total
+        cen = np.where(flat, np.nanmean(x, axis=-1), cen)
+        wid = np.sqrt(
+            np.nansum(net_counts * (x - cen[..., np.newaxis]) ** 2, axis=-1) / total
+        )
+        # at least the width of a single bin
+        wid = np.maximum(wid, span / np.sum(~np.isnan(y), axis=-1))
+        wid = np.where(flat, span / 2, wid)
+        amp = np.nanmax(net_counts, axis=-1)
+        return [amp, cen, wid, startheight]
+
     def lorenzian(x, amp, cen, wid, startheight):
         return (amp / pi) * (wid / ((x - cen) ** 2 + wid**2)) + startheight
+
+    def lorenzian_jacobian(x, amp, cen, wid, startheight):
+        """Partial derivatives of the lorenzian model to its parameters, one column per parameter."""
+        denominator = (x - cen) ** 2 + wid**2
+        d_amp = wid / (pi * denominator)
+        d_cen = (amp / pi) * 2 * wid * (x - cen) / denominator**2
+        d_wid = (amp / pi) * ((x - cen) ** 2 - wid**2) / denominator**2
+        d_startheight = np.ones_like(denominator)
+        return np.stack([d_amp, d_cen, d_wid, d_startheight], axis=-1)
+
+    def lorenzian_guess(x, y):
+        """Initial amplitude, center, width and start height of a lorenzian peak from the moments of the domain.
+
+        The second moment of a lorenzian does not exist, so the half width is taken from the
+        gaussian estimate with the same full width at half maximum.
+
+        Args:
+            x (np.ndarray): x-values of the domain
+            y (np.ndarray): y-values of the domain
+
+        Returns:
+            list[float]: the estimated parameters, ordered like the arguments of FitModels.lorenzian
+        """
+        height, cen, wid, startheight = FitModels.gaussian_guess(x, y)
+        half_width = wid * sqrt(2 * log(2))
+        return [height * pi * half_width, cen, half_width, startheight]
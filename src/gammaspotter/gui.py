@@ -1,16 +1,31 @@
 import sys
+import time
 
 from PySide6 import QtWidgets
 from importlib import resources as impresources
-from PySide6.QtWebEngineWidgets import QWebEngineView
 import pyqtgraph as pg
 import pandas as pd
 from collections import deque
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
-from PySide6.QtCore import Slot, QUrl, Qt
+from PySide6.QtCore import Slot, QUrl, Qt, QTimer
 from gammaspotter.process_data import ProcessData
 from gammaspotter.match_features import MatchFeatures
+from gammaspotter.catalog import Catalog
+from gammaspotter.live import FileFollower, LiveSpectrum
+from gammaspotter.spectrum_store import SpectrumStore
+from gammaspotter.analysis_worker import AnalysisWorker
+from gammaspotter.bulk_calibration import run_calibration, summarize
+from gammaspotter.auto_calibration import AutoCalibration, CalibrationResult
+from gammaspotter.calibration_store import CalibrationStore
+from gammaspotter.instrumentation import instrumentation
+from gammaspotter.plotting import PeakLines, plot_curve
+
+HELP_URL = "https://tijnsc.github.io/gammaspotter"
+# the documentation in the source tree, shown when the website can not be loaded
+# size of the binary copies of opened measurements, the least recently opened are removed first
+SPECTRUM_CACHE_BYTES = 512 * 2**20
 
 
 class UserInterface(QtWidgets.QMainWindow):
@@ -23,13 +38,10 @@ class UserInterface(QtWidgets.QMainWindow):
         """
         super().__init__()
 
-        # load default isotope catalog
-        catalog_path = impresources.path(
-            "gammaspotter.catalogs", "gamma-energies-common.csv"
-        )
-
-        self.isotope_catalog = pd.read_csv(catalog_path)
-        self.catalog_name = catalog_path.name
+        # binary copies of opened measurements, so reopening a file skips parsing the CSV
+        self.spectrum_store = SpectrumStore(max_bytes=SPECTRUM_CACHE_BYTES)
+        # calibrations of the detectors, applied to uncalibrated measurements when they are opened
+        self.calibration_store = CalibrationStore()
 
         self.central_widget = QtWidgets.QTabWidget()
         self.setCentralWidget(self.central_widget)
@@ -47,6 +59,58 @@ class UserInterface(QtWidgets.QMainWindow):
         self.setup_analyze_tab()
         self.setup_help_tab()
 
+        # worker threads for fitting the peaks and calibrating files, worker processes would import numpy,
+        # scipy and pandas again, which takes longer than the fits of a spectrum
+        self.fit_executor = ThreadPoolExecutor(thread_name_prefix="fit")
+
+        # fitting, matching and writing files run in the background, with their progress in the status bar
+        self.analysis_worker = AnalysisWorker(self)
+        self.progress_label = QtWidgets.QLabel()
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.statusBar().addPermanentWidget(self.progress_label)
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.show_progress(False)
+        self.analysis_worker.progress.connect(self.update_progress)
+        self.analysis_worker.idle.connect(lambda: self.show_progress(False))
+        self.analysis_worker.idle.connect(self.show_performance)
+
+        # the default isotope catalog is parsed in the background while the window opens
+        catalog_path = (
+            impresources.files("gammaspotter.catalogs") / "gamma-energies-common.csv"
+        )
+        self.catalog_name = catalog_path.name
+        self.analysis_worker.submit(
+            "loading catalog",
+            lambda progress: Catalog.from_csv(catalog_path),
+            on_finished=self.set_catalog,
+            on_failed=lambda message: self.analysis_log.append(
+                f"The isotope catalog could not be loaded: {message}\n"
+            ),
+        )
+
+    def set_catalog(self, catalog: Catalog):
+        self.isotope_catalog = catalog
+
+    def closeEvent(self, event):
+        """Stops the background jobs and the worker processes when the window is closed."""
+        self.analysis_worker.cancel_all()
+        self.fit_executor.shutdown(cancel_futures=True)
+        super().closeEvent(event)
+
+    def show_progress(self, action: bool):
+        """Toggles the visibility of the progress of the background jobs."""
+        self.progress_label.setVisible(action)
+        self.progress_bar.setVisible(action)
+
+    @Slot()
+    def update_progress(self, name: str, done: int, total: int):
+        """Shows the progress of a background job, a total of zero shows a busy indicator."""
+        self.progress_label.setText(f"{name.capitalize()}...")
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+        self.show_progress(True)
+
     def setup_calibrate_tab(self):
         """
         Set up the calibrate tab in the GUI.
@@ -97,10 +161,26 @@ class UserInterface(QtWidgets.QMainWindow):
         self.calc_factors_btn = QtWidgets.QPushButton("Calculate Conversion Factors")
         form.addRow(self.calc_factors_btn)
 
+        self.reference_nuclides = QtWidgets.QLineEdit("Na-22")
+        self.reference_nuclides.setToolTip(
+            "Nuclides in the calibration source, separated by commas"
+        )
+        form.addRow("Reference nuclides", self.reference_nuclides)
+
+        self.auto_cal_btn = QtWidgets.QPushButton("Auto Calibrate")
+        form.addRow(self.auto_cal_btn)
+
         self.apply_cal_btn = QtWidgets.QPushButton("Apply Calibration To Files")
         form.addRow(self.apply_cal_btn)
         self.apply_cal_btn.setEnabled(False)
 
+        self.detector_name = QtWidgets.QLineEdit("Detector 1")
+        form.addRow("Detector", self.detector_name)
+
+        self.save_profile_btn = QtWidgets.QPushButton("Save Calibration Profile")
+        form.addRow(self.save_profile_btn)
+        self.save_profile_btn.setEnabled(False)
+
         self.allow_calibration_steps(False)
 
         line = QtWidgets.QFrame()
@@ -125,6 +205,21 @@ class UserInterface(QtWidgets.QMainWindow):
 
         self.v_line_mouse_left = pg.InfiniteLine(pen=pg.mkPen(color="g", width=1))
         self.v_line_mouse_right = pg.InfiniteLine(pen=pg.mkPen(color="g", width=1))
+        self.hover_fit_curve = pg.PlotDataItem(
+            pen=pg.mkPen(color="c", width=2, style=Qt.DashLine)
+        )
+
+        # the mouse moves far more often than the screen is drawn, so the overlay follows it at a limited rate
+        # and the fit under the cursor is only previewed once the mouse rests
+        self.hover_pos = None
+        self.hover_timer = QTimer(self)
+        self.hover_timer.setSingleShot(True)
+        self.hover_timer.setInterval(30)
+        self.hover_timer.timeout.connect(self.update_hover_domain)
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(150)
+        self.preview_timer.timeout.connect(self.preview_hover_fit)
 
         self.show_calibrate_funcs(False)
 
@@ -135,10 +230,12 @@ class UserInterface(QtWidgets.QMainWindow):
 
         self.preset_energies.currentIndexChanged.connect(self.set_preset_energies)
         self.calc_factors_btn.clicked.connect(self.calc_cal_factors)
+        self.auto_cal_btn.clicked.connect(self.auto_calibrate)
 
         open_btn.clicked.connect(self.open_file)
         self.reset_axis_btn.clicked.connect(self.plot_widget_calibrate.autoRange)
         self.apply_cal_btn.clicked.connect(self.apply_calibration)
+        self.save_profile_btn.clicked.connect(self.save_calibration_profile)
 
         clear_calibration_log_btn.clicked.connect(self.clear_calibration_log)
         clear_calibration_data_btn.clicked.connect(self.clear_calibration_data)
@@ -162,9 +259,21 @@ class UserInterface(QtWidgets.QMainWindow):
         form = QtWidgets.QFormLayout()
         vbox_menu.addLayout(form)
 
+        self.profile_combo = QtWidgets.QComboBox()
+        self.profile_combo.setToolTip(
+            "Calibration applied to uncalibrated measurements when they are opened"
+        )
+        form.addRow("Calibration profile", self.profile_combo)
+        self.refresh_calibration_profiles()
+        self.profile_combo.currentIndexChanged.connect(self.reload_with_profile)
+
         open_btn = QtWidgets.QPushButton("Open calibrated data")
         form.addRow(open_btn)
 
+        self.live_btn = QtWidgets.QPushButton("Follow live measurement")
+        self.live_btn.setCheckable(True)
+        form.addRow(self.live_btn)
+
         self.reset_axis_btn_analyze = QtWidgets.QPushButton("Reset Axis")
         form.addRow(self.reset_axis_btn_analyze)
 
@@ -206,13 +315,34 @@ class UserInterface(QtWidgets.QMainWindow):
         line.setFrameShadow(QtWidgets.QFrame.Sunken)
         form.addRow(line)
 
-        vbox_menu.addWidget(QtWidgets.QLabel("Analysis Log"))
+        # the performance of the analysis is shown next to the log
+        self.log_tabs = QtWidgets.QTabWidget()
+        vbox_menu.addWidget(self.log_tabs)
+
         self.analysis_log = QtWidgets.QTextEdit()
         self.analysis_log.setReadOnly(True)
         self.analysis_log.append(
             "Gammaspotter by Dylan Telleman and Tijn Schuitevoerder.\n"
         )
-        vbox_menu.addWidget(self.analysis_log)
+        self.log_tabs.addTab(self.analysis_log, "Analysis Log")
+
+        performance_tab = QtWidgets.QWidget()
+        vbox_performance = QtWidgets.QVBoxLayout(performance_tab)
+        self.performance_log = QtWidgets.QTextEdit()
+        self.performance_log.setReadOnly(True)
+        self.performance_log.setLineWrapMode(QtWidgets.QTextEdit.NoWrap)
+        self.performance_log.setFontFamily("monospace")
+        vbox_performance.addWidget(self.performance_log)
+
+        self.profile_checkbox = QtWidgets.QCheckBox("Profile with cProfile")
+        vbox_performance.addWidget(self.profile_checkbox)
+        hbox_performance = QtWidgets.QHBoxLayout()
+        vbox_performance.addLayout(hbox_performance)
+        reset_performance_btn = QtWidgets.QPushButton("Reset")
+        hbox_performance.addWidget(reset_performance_btn)
+        export_performance_btn = QtWidgets.QPushButton("Export JSON")
+        hbox_performance.addWidget(export_performance_btn)
+        self.log_tabs.addTab(performance_tab, "Performance")
 
         hbox_clear = QtWidgets.QHBoxLayout()
         vbox_menu.addLayout(hbox_clear)
@@ -226,6 +356,13 @@ class UserInterface(QtWidgets.QMainWindow):
         open_btn.clicked.connect(self.open_file)
         self.reset_axis_btn_analyze.clicked.connect(self.plot_widget_analyze.autoRange)
 
+        # polls the followed measurement for new counts
+        self.live_follower = None
+        self.live_timer = QTimer(self)
+        self.live_timer.setInterval(1000)
+        self.live_timer.timeout.connect(self.update_live_data)
+        self.live_btn.toggled.connect(self.toggle_live_acquisition)
+
         self.peak_thresh_spin.valueChanged.connect(self.plot_peaks)
         self.peaks_checkbox.stateChanged.connect(self.plot_peaks)
 
@@ -239,13 +376,95 @@ class UserInterface(QtWidgets.QMainWindow):
         clear_analysis_log_btn.clicked.connect(self.clear_analysis_log)
         clear_analysis_data_btn.clicked.connect(self.clear_analysis_data)
 
+        self.log_tabs.currentChanged.connect(self.show_performance)
+        self.profile_checkbox.toggled.connect(self.toggle_profiling)
+        reset_performance_btn.clicked.connect(self.reset_performance)
+        export_performance_btn.clicked.connect(self.export_performance)
+
+    @Slot()
+    def show_performance(self):
+        """Shows the time spent in every stage of the analysis and the counters, and the profile when profiling."""
+        if self.log_tabs.currentIndex() != 1:
+            return
+        text = instrumentation.summary()
+        if self.profile_checkbox.isChecked():
+            text += f"\n\n{instrumentation.profile_summary()}"
+        self.performance_log.setPlainText(text)
+
+    @Slot()
+    def toggle_profiling(self, checked: bool):
+        """Profiles the background jobs started from now on, the fits in the worker processes are not profiled."""
+        self.analysis_worker.profile = checked
+        if not checked:
+            instrumentation.clear_profile()
+        self.show_performance()
+
+    @Slot()
+    def reset_performance(self):
+        instrumentation.reset()
+        instrumentation.clear_profile()
+        self.show_performance()
+
+    @Slot()
+    def export_performance(self):
+        """Writes the stages and counters to a JSON file, and the profile next to it when profiling."""
+        filename, _ = QtWidgets.QFileDialog.getSaveFileName(
+            filter="JSON files (*.json)"
+        )
+        if filename:
+            instrumentation.to_json(filename)
+            if self.profile_checkbox.isChecked():
+                instrumentation.dump_profile(Path(filename).with_suffix(".prof"))
+            self.analysis_log.append(f"Exported the performance to {filename}.\n")
+
     def setup_help_tab(self):
-        """Set up the help tab in the GUI. Connects with the documentation website."""
-        vbox_main = QtWidgets.QVBoxLayout(self.help_tab)
+        """Set up the help tab in the GUI. The documentation is only loaded when the tab is first shown."""
+        self.help_layout = QtWidgets.QVBoxLayout(self.help_tab)
+        self.help_view = None
+        self.central_widget.currentChanged.connect(self.load_help)
+
+    @Slot()
+    def load_help(self, index: int):
+        """Connects with the documentation website the first time the help tab is shown.
 
-        self.webEngineView = QWebEngineView()
-        self.webEngineView.load(QUrl("https://tijnsc.github.io/gammaspotter"))
-        vbox_main.addWidget(self.webEngineView)
+        QtWebEngine starts a complete browser, so it is only imported here. Without QtWebEngine
+        or without an internet connection, the documentation included with gammaspotter is shown instead.
+        """
+        if (
+            self.central_widget.widget(index) is not self.help_tab
+            or self.help_view is not None
+        ):
+            return
+
+        try:
+            from PySide6.QtWebEngineWidgets import QWebEngineView
+        except ImportError:
+            self.show_local_help()
+            return
+
+        self.help_view = QWebEngineView()
+        self.help_view.loadFinished.connect(
+            lambda success: success or self.show_local_help()
+        )
+        self.help_view.load(QUrl(HELP_URL))
+        self.help_layout.addWidget(self.help_view)
+
+    def show_local_help(self):
+        """Shows the documentation that is installed with the package, or a link to the website if it is not there."""
+        if self.help_view is not None:
+            self.help_layout.removeWidget(self.help_view)
+            self.help_view.deleteLater()
+
+        self.help_view = QtWidgets.QTextBrowser()
+        self.help_view.setOpenExternalLinks(True)
+        help_page = impresources.files("gammaspotter.help") / "index.md"
+        if help_page.is_file():
+            self.help_view.setSource(QUrl.fromLocalFile(str(help_page)))
+        else:
+            self.help_view.setMarkdown(
+                f"The documentation could not be loaded. It can be found at <{HELP_URL}>."
+            )
+        self.help_layout.addWidget(self.help_view)
 
     def show_analysis_funcs(self, action: bool):
         """Toggles the enabled state of the widgets in the analyze tab. Also unchecks the checkboxes.
@@ -276,6 +495,8 @@ class UserInterface(QtWidgets.QMainWindow):
         widgets = [
             self.reset_axis_btn,
             self.domain_width_spin_cal,
+            self.reference_nuclides,
+            self.auto_cal_btn,
         ]
         for widget in widgets:
             widget.setEnabled(action)
@@ -296,12 +517,26 @@ class UserInterface(QtWidgets.QMainWindow):
         """Function for loading a custom isotope catalog."""
         filename, _ = QtWidgets.QFileDialog.getOpenFileName(filter="CSV files (*.csv)")
         if filename:
-            self.isotope_catalog = pd.read_csv(filename)
-            self.catalog_name = filename.split("/")[-1]
-            self.analysis_log.append(
-                f"Loaded {self.catalog_name} with {len(self.isotope_catalog)} entries as custom catalog.\n"
+            # replaces the default catalog if it is still loading, matching waits for this one
+            self.analysis_worker.submit(
+                "loading catalog",
+                lambda progress: Catalog.from_csv(filename),
+                on_finished=lambda catalog: self.set_custom_catalog(
+                    catalog, filename.split("/")[-1]
+                ),
+                on_failed=lambda message: self.analysis_log.append(
+                    f"The catalog could not be loaded: {message}\n"
+                ),
             )
 
+    def set_custom_catalog(self, catalog: Catalog, catalog_name: str):
+        """Uses a catalog the user loaded for matching."""
+        self.set_catalog(catalog)
+        self.catalog_name = catalog_name
+        self.analysis_log.append(
+            f"Loaded {self.catalog_name} with {len(self.isotope_catalog)} entries as custom catalog.\n"
+        )
+
     @Slot()
     def clear_analysis_log(self):
         """Function for clearing the analysis log."""
@@ -315,6 +550,9 @@ class UserInterface(QtWidgets.QMainWindow):
     @Slot()
     def clear_analysis_data(self):
         """Reset the analysis tab to its initial state."""
+        self.live_btn.setChecked(False)
+        self.analysis_worker.cancel("fitting peaks")
+        self.analysis_worker.cancel("matching isotopes")
         try:
             del self.process_data_analyze
         except:
@@ -332,6 +570,11 @@ class UserInterface(QtWidgets.QMainWindow):
     @Slot()
     def clear_calibration_data(self):
         """Reset the calibration tab to its initial state."""
+        self.analysis_worker.cancel("fitting calibration peaks")
+        self.analysis_worker.cancel("auto calibrating")
+        self.analysis_worker.cancel("previewing fit")
+        self.preview_timer.stop()
+        self.hover_fit_curve.clear()
         try:
             del self.process_data_calibrate
         except:
@@ -347,6 +590,7 @@ class UserInterface(QtWidgets.QMainWindow):
             self.cal_click_y = deque(maxlen=2)
 
             self.apply_cal_btn.setEnabled(False)
+            self.save_profile_btn.setEnabled(False)
             self.allow_calibration_steps(False)
 
     def allow_calibration_steps(self, action: bool):
@@ -367,46 +611,178 @@ class UserInterface(QtWidgets.QMainWindow):
         """Function for opening a file and showing it in the plot. Also initializes the ProcessData class."""
         filename, _ = QtWidgets.QFileDialog.getOpenFileName(filter="CSV files (*.csv)")
         if filename:
-            opened_file = pd.read_csv(filename)
-
-            match self.central_widget.currentIndex():
-                case 0:
-                    self.clear_calibration_data()
-                    plot_widget = self.plot_widget_calibrate
-                    self.process_data_calibrate = ProcessData(opened_file)
-                    latest_data = self.process_data_calibrate
-                    window_log = self.calibration_log
-                    self.show_calibrate_funcs(True)
-                    x_unit = "mV"
-                    self.cal_data_loaded = True
-                case 1:
-                    self.clear_analysis_data()
-                    plot_widget = self.plot_widget_analyze
-                    self.process_data_analyze = ProcessData(opened_file)
-                    latest_data = self.process_data_analyze
-                    window_log = self.analysis_log
-                    self.show_analysis_funcs(True)
-                    x_unit = "keV"
-                    self.analyze_data_loaded = True
-
-            plot_widget.clear()
-
-            plot_widget.setTitle(filename.split("/")[-1])
-            plot_widget.setLabel("left", "Counts")
-            plot_widget.setLabel("bottom", f"Energy [{x_unit}]")
-            plot_widget.showGrid(x=True, y=True)
-
-            spectrum_data = latest_data.data
-            plot_widget.plot(
-                x=spectrum_data.iloc[:, 0],
-                y=spectrum_data.iloc[:, 1],
-                symbol=None,
-                pen={"color": "w", "width": 3},
+            self.load_file(filename)
+
+    def load_file(self, filename: str):
+        """Shows a measurement in the plot of the current tab, the Analyze tab applies the selected calibration profile."""
+        with instrumentation.stage("read spectrum"):
+            opened_file = self.spectrum_store.load(filename)
+
+        match self.central_widget.currentIndex():
+            case 0:
+                self.clear_calibration_data()
+                self.calibration_filename = filename
+                plot_widget = self.plot_widget_calibrate
+                self.process_data_calibrate = ProcessData(opened_file)
+                latest_data = self.process_data_calibrate
+                window_log = self.calibration_log
+                self.show_calibrate_funcs(True)
+                x_unit = "mV"
+                self.cal_data_loaded = True
+            case 1:
+                self.clear_analysis_data()
+                calibration = self.selected_calibration(filename)
+                if calibration is not None:
+                    # the raw measurement is calibrated in memory, only the energies are computed
+                    opened_file = calibration.apply(opened_file)
+                self.analyze_filename = filename
+                plot_widget = self.plot_widget_analyze
+                self.process_data_analyze = ProcessData(opened_file)
+                latest_data = self.process_data_analyze
+                window_log = self.analysis_log
+                self.show_analysis_funcs(True)
+                x_unit = "keV"
+                self.analyze_data_loaded = True
+
+        self.spectrum_curve = self.plot_spectrum(
+            plot_widget=plot_widget,
+            title=filename.split("/")[-1],
+            x_unit=x_unit,
+            spectrum_data=latest_data.data,
+        )
+        window_log.append(f"Opened {filename}.\n")
+
+    def plot_spectrum(
+        self,
+        plot_widget: pg.PlotWidget,
+        title: str,
+        x_unit: str,
+        spectrum_data: pd.DataFrame,
+    ) -> pg.PlotDataItem:
+        """Clears the plot and shows a spectrum in it.
+
+        Args:
+            plot_widget (pg.PlotWidget): the plot of the calibrate or analyze tab
+            title (str): title of the plot
+            x_unit (str): unit of the energy axis
+            spectrum_data (pd.DataFrame): the spectrum to show
+
+        Returns:
+            pg.PlotDataItem: the curve of the spectrum, for updating it later
+        """
+        plot_widget.clear()
+
+        plot_widget.setTitle(title)
+        plot_widget.setLabel("left", "Counts")
+        plot_widget.setLabel("bottom", f"Energy [{x_unit}]")
+        plot_widget.showGrid(x=True, y=True)
+
+        spectrum_curve = plot_curve(
+            plot_widget, spectrum_data, pen={"color": "w", "width": 3}
+        )
+
+        plot_widget.autoRange()
+        plot_widget.disableAutoRange()
+
+        return spectrum_curve
+
+    @Slot()
+    def toggle_live_acquisition(self, checked: bool):
+        """Starts or stops following a measurement which is still being written by the detector."""
+        if checked:
+            filename, _ = QtWidgets.QFileDialog.getOpenFileName(
+                filter="CSV files (*.csv);;All files (*)"
+            )
+            if not filename:
+                self.live_btn.setChecked(False)
+                return
+            self.clear_analysis_data()
+            # clearing the data unchecks the button
+            self.live_btn.blockSignals(True)
+            self.live_btn.setChecked(True)
+            self.live_btn.blockSignals(False)
+
+            self.live_follower = FileFollower(filename)
+            self.live_calibration = self.selected_calibration()
+            self.live_spectrum = None
+            self.live_filename = filename
+            self.analysis_log.append(f"Following {filename}.\n")
+            self.update_live_data()
+            self.live_timer.start()
+        elif self.live_follower is not None:
+            self.live_timer.stop()
+            self.live_follower.close()
+            self.live_follower = None
+            self.analysis_log.append(f"Stopped following {self.live_filename}.\n")
+
+    @Slot()
+    def update_live_data(self):
+        """Adds the new counts of the followed measurement to the spectrum.
+        Only the curve and the fits of the peaks whose domain changed are updated."""
+        rows, truncated = self.live_follower.poll()
+        if truncated:
+            self.live_spectrum = None
+            # a fit of the old measurement must not be drawn over the new one
+            self.analysis_worker.cancel("fitting peaks")
+        if len(rows) == 0:
+            return
+        if self.live_calibration is not None:
+            rows[:, 0] = self.live_calibration.energy(rows[:, 0])
+
+        if self.live_spectrum is None:
+            self.live_spectrum = LiveSpectrum(rows)
+            self.process_data_analyze = self.live_spectrum.process_data()
+            self.spectrum_curve = self.plot_spectrum(
+                plot_widget=self.plot_widget_analyze,
+                title=self.live_filename.split("/")[-1],
+                x_unit="keV",
+                spectrum_data=self.process_data_analyze.data,
             )
+            self.show_analysis_funcs(True)
+            self.analyze_data_loaded = True
+            return
+
+        self.live_spectrum.add_counts(rows)
+        self.process_data_analyze = self.live_spectrum.process_data()
+        spectrum_data = self.process_data_analyze.data
+        self.spectrum_curve.setData(
+            x=spectrum_data.iloc[:, 0].to_numpy(dtype=float),
+            y=spectrum_data.iloc[:, 1].to_numpy(dtype=float),
+        )
 
-            plot_widget.autoRange()
-            plot_widget.disableAutoRange()
-            window_log.append(f"Opened {filename}.\n")
+        if self.peaks_checkbox.isChecked():
+            self.draw_peak_markers(
+                self.process_data_analyze.find_gamma_peaks(
+                    prominence=self.peak_thresh_spin.value()
+                )
+            )
+        # while a fit is running the new counts are only drawn, the next fit includes them
+        if self.fit_checkbox.isChecked() and not self.analysis_worker.is_running(
+            "fitting peaks"
+        ):
+            live_spectrum = self.live_spectrum
+            process_data = self.process_data_analyze
+            changed = live_spectrum.take_changed()
+            prominence = self.peak_thresh_spin.value()
+            domain_width = self.domain_width_spin.value()
+            self.analysis_worker.submit(
+                "fitting peaks",
+                lambda progress: live_spectrum.fit_peaks(
+                    process_data=process_data,
+                    prominence=prominence,
+                    domain_width=domain_width,
+                    changed=changed,
+                ),
+                on_finished=self.show_live_fit,
+                on_failed=self.log_failed_fit,
+                silent=True,
+            )
+
+    def show_live_fit(self, fit_peaks_x: pd.DataFrame):
+        """Shows the fitted peaks of the followed measurement in the plot."""
+        self.fit_peaks_x = fit_peaks_x
+        self.fit_peaks_x.insert(0, "peak", range(1, len(self.fit_peaks_x) + 1))
+        self.draw_fit_lines()
 
     @Slot()
     def add_calibration_point(self, event):
@@ -435,70 +811,112 @@ class UserInterface(QtWidgets.QMainWindow):
                             "counts": self.cal_click_y,
                         }
                     )
-                    try:
-                        self.fitted_calibration_peaks = (
-                            self.process_data_calibrate.fit_peaks(
-                                peaks=selected_peaks,
-                                domain_width=self.domain_width_spin_cal.value(),
-                            )
-                        )
-                    except RuntimeError:
-                        self.calibration_log.append(
-                            "The selected peaks could not be analyzed, please try selecting different peaks.\n"
-                        )
-                        # clear the lines and reset point deques
-                        self.plot_vlines_cal([])
-                        self.cal_click_x.clear()
-                        self.cal_click_y.clear()
-                    else:
-                        # everything went well, plot the lines and save the energies with uncertainties
-                        self.plot_vlines_cal(self.fitted_calibration_peaks["energy"])
-                        if len(self.fitted_calibration_peaks) == 2:
-                            self.calibration_log.append(
-                                f"Selected peaks:\n{self.fitted_calibration_peaks.to_markdown(index=False, tablefmt='plain', headers=['Energy [mV]', 'Energy Std [mV]'])}\n"
-                            )
+                    self.analysis_worker.submit(
+                        "fitting calibration peaks",
+                        self.process_data_calibrate.fit_peaks,
+                        peaks=selected_peaks,
+                        domain_width=self.domain_width_spin_cal.value(),
+                        on_finished=self.show_calibration_points,
+                        on_failed=self.reset_calibration_points,
+                    )
             else:
                 self.calibration_log.append(
                     "Please select a peak within the range of the data.\n"
                 )
 
+    def show_calibration_points(self, fitted_calibration_peaks: pd.DataFrame):
+        """Shows the fitted calibration peaks, or resets the selection when a fit failed."""
+        self.fitted_calibration_peaks = fitted_calibration_peaks
+        if not self.fitted_calibration_peaks["success"].all():
+            self.reset_calibration_points()
+        else:
+            # everything went well, plot the lines and save the energies with uncertainties
+            self.plot_vlines_cal(self.fitted_calibration_peaks["energy"])
+            if len(self.fitted_calibration_peaks) == 2:
+                self.calibration_log.append(
+                    f"Selected peaks:\n{self.fitted_calibration_peaks.iloc[:, :2].to_markdown(index=False, tablefmt='plain', headers=['Energy [mV]', 'Energy Std [mV]'])}\n"
+                )
+
+    def reset_calibration_points(self, message: str = ""):
+        """Clears the selected calibration peaks after their fit failed, with the error of the fit if there was one."""
+        error = f" ({message})" if message else ""
+        self.calibration_log.append(
+            f"The selected peaks could not be analyzed{error}, please try selecting different peaks.\n"
+        )
+        # clear the lines and reset point deques
+        self.plot_vlines_cal([])
+        self.cal_click_x.clear()
+        self.cal_click_y.clear()
+
     def plot_vlines_cal(self, x_positions: list):
         """Function for plotting the vertical lines in the calibration plot."""
         try:
-            for vline in self.vlines_cal:
-                self.plot_widget_calibrate.removeItem(vline)
+            self.plot_widget_calibrate.removeItem(self.vlines_cal)
         except:
             pass
-        self.vlines_cal = []
-        for x_peak in x_positions:
-            vline = pg.InfiniteLine(pos=x_peak, pen=pg.mkPen(color="y", width=1))
-            self.vlines_cal.append(vline)
-            self.plot_widget_calibrate.addItem(vline)
+        self.vlines_cal = PeakLines()
+        self.vlines_cal.setData(x_positions)
+        self.plot_widget_calibrate.addItem(self.vlines_cal, ignoreBounds=True)
 
         if len(x_positions) == 2:
             self.allow_calibration_steps(True)
         else:
             self.allow_calibration_steps(False)
 
-    # not a very good solution, but it works
     @Slot()
     def cal_mouse_domain(self, event):
-        """Function for displaying the domain lines in the plot at mouse postition."""
+        """Remembers the mouse position, the domain lines follow it at most every 30 ms."""
         if self.cal_data_loaded:
-            pos_click = self.plot_widget_calibrate.plotItem.vb.mapSceneToView(event)
-            try:
-                self.plot_widget_calibrate.removeItem(self.v_line_mouse_left)
-                self.plot_widget_calibrate.removeItem(self.v_line_mouse_right)
-            except:
-                pass
-            self.v_line_mouse_left.setPos(
-                pos_click.x() - (self.domain_width_spin_cal.value() / 2)
-            )
-            self.v_line_mouse_right.setPos(
-                pos_click.x() + (self.domain_width_spin_cal.value() / 2)
-            )
-            self.plot_widget_calibrate.addItem(self.v_line_mouse_left)
-            self.plot_widget_calibrate.addItem(self.v_line_mouse_right)
+            self.hover_pos = event
+            if not self.hover_timer.isActive():
+                self.hover_timer.start()
+
+    @Slot()
+    def update_hover_domain(self):
+        """Moves the domain lines to the last mouse position, and schedules a preview of the fit of the domain."""
+        if not self.cal_data_loaded or self.hover_pos is None:
+            return
+        self.hover_x = self.plot_widget_calibrate.plotItem.vb.mapSceneToView(
+            self.hover_pos
+        ).x()
+
+        # the lines stay in the plot, they are only added again after the plot was cleared
+        plot_items = self.plot_widget_calibrate.getPlotItem().items
+        for line in (self.v_line_mouse_left, self.v_line_mouse_right):
+            if line not in plot_items:
+                self.plot_widget_calibrate.addItem(line)
+        if self.hover_fit_curve not in plot_items:
+            self.plot_widget_calibrate.addItem(self.hover_fit_curve, ignoreBounds=True)
+
+        half_width = self.domain_width_spin_cal.value() / 2
+        self.v_line_mouse_left.setPos(self.hover_x - half_width)
+        self.v_line_mouse_right.setPos(self.hover_x + half_width)
+
+        # restarting the timer postpones the preview until the mouse rests
+        self.preview_timer.start()
+
+    @Slot()
+    def preview_hover_fit(self):
+        """Fits the domain under the mouse in the background, replacing a preview that is still running."""
+        if not self.cal_data_loaded:
+            return
+        center = self.hover_x
+        domain_width = self.domain_width_spin_cal.value()
+        self.analysis_worker.submit(
+            "previewing fit",
+            lambda progress: self.process_data_calibrate.fit_curve(
+                center, domain_width
+            ),
+            on_finished=self.show_hover_fit,
+            silent=True,
+        )
+
+    def show_hover_fit(self, curve: tuple | None):
+        """Shows the fitted gaussian of the domain under the mouse, or nothing when the fit failed."""
+        if curve is None:
+            self.hover_fit_curve.clear()
+        else:
+            self.hover_fit_curve.setData(*curve)
 
     @Slot()
     def plot_peaks(self):
@@ -512,61 +930,111 @@ class UserInterface(QtWidgets.QMainWindow):
             peaks_data = self.process_data_analyze.find_gamma_peaks(
                 prominence=self.peak_thresh_spin.value()
             )
-            self.peaks_scatter = pg.ScatterPlotItem(
-                size=15, brush=pg.mkBrush("r"), symbol="x"
-            )
-            self.peaks_scatter.addPoints(
-                x=peaks_data.iloc[:, 0], y=peaks_data.iloc[:, 1]
-            )
-            self.plot_widget_analyze.addItem(self.peaks_scatter)
+            self.draw_peak_markers(peaks_data)
 
-            self.analysis_log.append(
-                f"DETECTED {len(peaks_data)} PEAKS:\n{peaks_data.to_markdown(index=False, tablefmt='plain', headers=['Energy [keV]', 'Counts'])}\n"
-            )
+            with instrumentation.stage("format log"):
+                self.analysis_log.append(
+                    f"DETECTED {len(peaks_data)} PEAKS:\n{peaks_data.to_markdown(index=False, tablefmt='plain', headers=['Energy [keV]', 'Counts'])}\n"
+                )
+
+    def draw_peak_markers(self, peaks_data: pd.DataFrame):
+        """Function for showing the detected peaks in the plot, replacing the previous markers."""
+        try:
+            self.plot_widget_analyze.removeItem(self.peaks_scatter)
+        except:
+            pass
+        # all markers are a single item
+        self.peaks_scatter = pg.ScatterPlotItem(
+            size=15, brush=pg.mkBrush("r"), symbol="x"
+        )
+        self.peaks_scatter.setData(
+            x=peaks_data.iloc[:, 0].to_numpy(dtype=float),
+            y=peaks_data.iloc[:, 1].to_numpy(dtype=float),
+        )
+        self.plot_widget_analyze.addItem(self.peaks_scatter)
+
+    def draw_fit_lines(self):
+        """Function for showing the successfully fitted peaks in the plot, replacing the previous lines."""
+        try:
+            self.plot_widget_analyze.removeItem(self.vlines)
+        except:
+            pass
+
+        # all lines are a single item, which only draws the visible lines
+        fitted = self.fit_peaks_x[self.fit_peaks_x["success"]]
+        self.vlines = PeakLines()
+        self.vlines.setData(fitted["energy"], labels=fitted["peak"].astype(str))
+        self.plot_widget_analyze.addItem(self.vlines, ignoreBounds=True)
 
     @Slot()
     def plot_fit_peaks(self):
         """Function for fitting the peaks to a gaussian function for finding a more accurate peak and showing this in the plot."""
         try:
-            for vline in self.vlines:
-                self.plot_widget_analyze.removeItem(vline)
+            self.plot_widget_analyze.removeItem(self.vlines)
         except:
             pass
 
+        # matches of the previous fit are not valid anymore
+        self.analysis_worker.cancel("matching isotopes")
+
         if self.fit_checkbox.isChecked():
-            try:
-                peaks = self.process_data_analyze.find_gamma_peaks(
-                    prominence=self.peak_thresh_spin.value()
-                )
-                self.fit_peaks_x = self.process_data_analyze.fit_peaks(
+            process_data = self.process_data_analyze
+            prominence = self.peak_thresh_spin.value()
+            domain_width = self.domain_width_spin.value()
+
+            def fit(progress):
+                peaks = process_data.find_gamma_peaks(prominence=prominence)
+                return process_data.fit_peaks(
                     peaks=peaks,
-                    domain_width=self.domain_width_spin.value(),
-                )
-            except RuntimeError:
-                self.analysis_log.append(
-                    "Peaks could not be fitted. Try lowering the peak detection threshold or adjusting the domain width.\n"
+                    domain_width=domain_width,
+                    executor=self.fit_executor,
+                    progress=progress,
                 )
-            else:
-                self.vlines = []
-                for peak_nr, x_peak in enumerate(self.fit_peaks_x.iloc[:, 0]):
-                    vline = pg.InfiniteLine(
-                        pos=x_peak,
-                        label=f"{peak_nr + 1}",
-                        pen=pg.mkPen(color="y", width=1),
-                    )
-                    self.vlines.append(vline)
-                    self.plot_widget_analyze.addItem(vline)
 
-                peak_count = len(self.fit_peaks_x)
-                self.fit_peaks_x.insert(0, "peak", range(1, peak_count + 1))
+            # replaces the fit of the previous threshold or domain width, if it is still running
+            self.analysis_worker.submit(
+                "fitting peaks",
+                fit,
+                on_finished=self.show_fitted_peaks,
+                on_failed=self.log_failed_fit,
+            )
+        else:
+            self.analysis_worker.cancel("fitting peaks")
 
-                self.analysis_log.append(
-                    f"FITTED {peak_count} PEAKS:\n{self.fit_peaks_x.to_markdown(index=False, tablefmt='plain', headers=['Peak', 'Energy [keV]', 'Energy Std [keV]'])}\n"
-                )
+    def log_failed_fit(self, message: str):
+        """Reports a fit of the peaks that raised an error, instead of a result."""
+        self.analysis_log.append(f"Fitting the peaks failed: {message}\n")
+
+    def show_fitted_peaks(self, fit_peaks_x: pd.DataFrame):
+        """Shows the fitted peaks in the plot and the log."""
+        self.fit_peaks_x = fit_peaks_x
+        peak_count = len(self.fit_peaks_x)
+        self.fit_peaks_x.insert(0, "peak", range(1, peak_count + 1))
+        self.draw_fit_lines()
+
+        with instrumentation.stage("format log"):
+            self.analysis_log.append(
+                f"FITTED {peak_count} PEAKS:\n{self.fit_peaks_x.to_markdown(index=False, tablefmt='plain', headers=['Peak', 'Energy [keV]', 'Energy Std [keV]', 'Fitted'])}\n"
+            )
+        failed_peaks = self.fit_peaks_x["peak"][~self.fit_peaks_x["success"]]
+        if len(failed_peaks) > 0:
+            self.analysis_log.append(
+                f"The fit failed for peak(s) {', '.join(map(str, failed_peaks))}. Try lowering the peak detection threshold or adjusting the domain width.\n"
+            )
 
     @Slot()
     def find_isotopes(self):
         """Function for matching the peaks with the isotope catalog."""
+        if self.analysis_worker.is_running("fitting peaks"):
+            self.analysis_log.append(
+                "The peaks are still being fitted. Try again when the fit has finished.\n"
+            )
+            return
+        if self.analysis_worker.is_running("loading catalog"):
+            self.analysis_log.append(
+                "The isotope catalog is still being loaded. Try again in a moment.\n"
+            )
+            return
         try:
             mf = MatchFeatures(
                 data_peaks=self.fit_peaks_x, catalog_data=self.isotope_catalog
@@ -574,25 +1042,45 @@ class UserInterface(QtWidgets.QMainWindow):
         except AttributeError:
             self.analysis_log.append("No peaks fitted. Try fitting the peaks first.\n")
         else:
-            matches = mf.match_isotopes()
             result_length = self.result_length_spin.value()
             peak_count = len(self.fit_peaks_x)
-            self.analysis_log.append(f"Using {self.catalog_name} as isotope catalog.")
-            self.analysis_log.append(f"MATCHED {peak_count} PEAKS:")
-            for index in range(peak_count):
-                peak_nr = index + 1
-
-                # gets the first result_length rows of the matches dataframe where the peak numbers match
-                peak_matches = matches[matches.iloc[:, 0] == peak_nr].iloc[
-                    :result_length, 1:4
-                ]
-                if len(peak_matches) > 0:
-                    self.analysis_log.append(
-                        f"--- Peak {peak_nr} matches with: ---\n{peak_matches.to_markdown(index=False, tablefmt='plain', headers=['Isotope', 'Certainty [%]', 'Energy [keV]'])}"
-                    )
-                else:
-                    self.analysis_log.append(f"--- Peak {peak_nr} has no matches. ---")
-            self.analysis_log.append("")
+            catalog_name = self.catalog_name
+            self.analysis_worker.submit(
+                "matching isotopes",
+                lambda progress: mf.match_isotopes(max_results=result_length),
+                on_finished=lambda matches: self.log_matches(
+                    matches, peak_count, result_length, catalog_name
+                ),
+                on_failed=lambda message: self.analysis_log.append(
+                    f"Matching the isotopes failed: {message}\n"
+                ),
+            )
+
+    @instrumentation.timed("format log")
+    def log_matches(
+        self,
+        matches: pd.DataFrame,
+        peak_count: int,
+        result_length: int,
+        catalog_name: str,
+    ):
+        """Shows the matched isotopes of every peak in the log."""
+        self.analysis_log.append(f"Using {catalog_name} as isotope catalog.")
+        self.analysis_log.append(f"MATCHED {peak_count} PEAKS:")
+        for index in range(peak_count):
+            peak_nr = index + 1
+
+            # gets the first result_length rows of the matches dataframe where the peak numbers match
+            peak_matches = matches[matches.iloc[:, 0] == peak_nr].iloc[
+                :result_length, 1:4
+            ]
+            if len(peak_matches) > 0:
+                self.analysis_log.append(
+                    f"--- Peak {peak_nr} matches with: ---\n{peak_matches.to_markdown(index=False, tablefmt='plain', headers=['Isotope', 'Certainty [%]', 'Energy [keV]'])}"
+                )
+            else:
+                self.analysis_log.append(f"--- Peak {peak_nr} has no matches. ---")
+        self.analysis_log.append("")
 
     @Slot()
     def calc_cal_factors(self):
@@ -607,10 +1095,124 @@ class UserInterface(QtWidgets.QMainWindow):
                 self.fitted_calibration_peaks.iloc[:, 0].values[1],
             ],
         )
+        self.calibration = CalibrationResult.linear(
+            self.scaling_factor, self.horizontal_offset
+        )
         self.calibration_log.append(
             f"CALIBRATION RESULTS:\nConversion factor: {self.scaling_factor:.2f} keV/mV\nEnergy offset: {self.horizontal_offset:.2f} keV\n"
         )
         self.apply_cal_btn.setEnabled(True)
+        self.save_profile_btn.setEnabled(True)
+
+    @Slot()
+    def auto_calibrate(self):
+        """Calibrates the spectrum on the lines of the reference nuclides, without selecting peaks."""
+        if self.analysis_worker.is_running("loading catalog"):
+            self.calibration_log.append(
+                "The isotope catalog is still loading, please try again in a moment.\n"
+            )
+            return
+        nuclides = [
+            nuclide.strip()
+            for nuclide in self.reference_nuclides.text().split(",")
+            if nuclide.strip()
+        ]
+        try:
+            auto_calibration = AutoCalibration.from_catalog(
+                self.isotope_catalog, nuclides
+            )
+        except ValueError as error:
+            self.calibration_log.append(f"{error}\n")
+            return
+
+        # the spectrum and the settings are read here, the job must not touch the widgets
+        try:
+            process_data = self.process_data_calibrate
+        except AttributeError:
+            self.calibration_log.append("Please open a spectrum to calibrate first.\n")
+            return
+        domain_width = self.domain_width_spin_cal.value()
+        self.analysis_worker.submit(
+            "auto calibrating",
+            lambda progress: auto_calibration.calibrate(
+                process_data, domain_width=domain_width
+            ),
+            on_finished=self.show_auto_calibration,
+            on_failed=lambda message: self.calibration_log.append(
+                f"Automatic calibration failed: {message}\n"
+            ),
+        )
+
+    def show_auto_calibration(self, calibration):
+        """Shows the matched peaks and the result of an automatic calibration, which can then be applied to files."""
+        self.calibration = calibration
+        self.scaling_factor = calibration.scaling_factor
+        self.horizontal_offset = calibration.horizontal_offset
+        # the matched peaks are labelled with their lines, they are not a selection for the manual calibration
+        try:
+            self.plot_widget_calibrate.removeItem(self.vlines_cal)
+        except:
+            pass
+        self.vlines_cal = PeakLines()
+        self.vlines_cal.setData(
+            calibration.matches["pulseheight"],
+            labels=[f"{energy:.1f} keV" for energy in calibration.matches["energy"]],
+        )
+        self.plot_widget_calibrate.addItem(self.vlines_cal, ignoreBounds=True)
+        self.calibration_log.append(
+            f"AUTOMATIC CALIBRATION RESULTS:\n{calibration.summary()}\nConversion factor: {self.scaling_factor:.2f} keV/mV\nEnergy offset: {self.horizontal_offset:.2f} keV\n"
+        )
+        self.apply_cal_btn.setEnabled(True)
+        self.save_profile_btn.setEnabled(True)
+
+    @Slot()
+    def save_calibration_profile(self):
+        """Saves the calibration as the current profile of the detector, so measurements can be analyzed without calibrated copies."""
+        detector = self.detector_name.text().strip()
+        if not detector:
+            self.calibration_log.append("Please enter the name of the detector.\n")
+            return
+        self.calibration_store.save(
+            detector, self.calibration, source=self.calibration_filename
+        )
+        self.refresh_calibration_profiles()
+        self.calibration_log.append(
+            f"Saved the calibration as profile of {detector}, select it in the Analyze tab to open uncalibrated measurements.\n"
+        )
+
+    def refresh_calibration_profiles(self):
+        """Lists the detectors with a calibration profile, keeping the selected one."""
+        selected = self.profile_combo.currentText()
+        self.profile_combo.blockSignals(True)
+        self.profile_combo.clear()
+        self.profile_combo.addItem("None (calibrated data)")
+        self.profile_combo.addItems(self.calibration_store.detectors())
+        self.profile_combo.setCurrentText(selected)
+        self.profile_combo.blockSignals(False)
+
+    def selected_calibration(
+        self, filename: str | None = None
+    ) -> CalibrationResult | None:
+        """The calibration of the detector selected in the Analyze tab, or None for calibrated data.
+
+        Args:
+            filename (str | None, optional): measurement to calibrate, which gets the calibration that was valid when it was written. Defaults to None, the latest calibration for a running measurement.
+        """
+        if self.profile_combo.currentIndex() <= 0:
+            return None
+        detector = self.profile_combo.currentText()
+        if filename is None:
+            return self.calibration_store.load(detector)
+        return self.calibration_store.load_for_file(detector, filename)
+
+    @Slot()
+    def reload_with_profile(self):
+        """Opens the measurement in the Analyze tab again with the newly selected calibration profile."""
+        if self.analyze_data_loaded and self.live_follower is None:
+            self.load_file(self.analyze_filename)
+            self.analysis_log.append(
+                f"Calibration profile: {self.profile_combo.currentText()}.\n"
+            )
 
     @Slot()
     def apply_calibration(self):
@@ -618,23 +1220,38 @@ class UserInterface(QtWidgets.QMainWindow):
         file_paths, _ = QtWidgets.QFileDialog.getOpenFileNames(
             filter="CSV files (*.csv)"
         )
-        saved_files = []
         if file_paths:
-            for file_path in file_paths:
-                file_path = Path(file_path)
-                opened_file = pd.read_csv(file_path)
-                calibrated_data = self.process_data_calibrate.apply_cal_to_data(
-                    data=opened_file,
-                    scaling_factor=self.scaling_factor,
-                    horizontal_offset=self.horizontal_offset,
+            files = [Path(file_path) for file_path in file_paths]
+            scaling_factor = self.scaling_factor
+            horizontal_offset = self.horizontal_offset
+
+            def calibrate_files(progress):
+                start = time.perf_counter()
+                written, failures = run_calibration(
+                    files=files,
+                    scaling_factor=scaling_factor,
+                    horizontal_offset=horizontal_offset,
+                    executor=self.fit_executor,
+                    progress=progress,
                 )
+                return written, failures, time.perf_counter() - start
+
+            self.analysis_worker.submit(
+                "calibrating files",
+                calibrate_files,
+                on_finished=self.log_calibrated_files,
+                on_failed=lambda message: self.calibration_log.append(
+                    f"Calibrating the files failed: {message}\n"
+                ),
+            )
 
-                filename_extended = file_path.stem + "_calibrated" + file_path.suffix
-                new_filename = file_path.parent / filename_extended
-                calibrated_data.to_csv(new_filename, index=False)
-                saved_files.append(filename_extended)
-
-            self.calibration_log.append(f"Saved {', '.join(saved_files)}.\n")
+    def log_calibrated_files(self, results: tuple):
+        """Shows the written files and the summary of a calibration run in the log."""
+        written, failures, elapsed = results
+        if written:
+            saved_files = [new_filename.name for new_filename in written.values()]
+            self.calibration_log.append(f"Saved {', '.join(saved_files)}.")
+        self.calibration_log.append(f"{summarize(written, failures, elapsed)}\n")
 
 
 def main():
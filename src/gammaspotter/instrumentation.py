@@ -0,0 +1,167 @@
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+import pandas as pd
+
+from pathlib import Path
+from typing import Callable
+from contextlib import contextmanager
+
+
+class Instrumentation:
+    def __init__(self) -> None:
+        """Collects the time spent in every stage of the analysis and counters of the work that was done.
+
+        The stages and counters of all threads are added together. Profiling with cProfile is opt-in,
+        because it slows down the analysis.
+        """
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.profiler = None
+        self.profiling = False
+
+    @contextmanager
+    def stage(self, name: str):
+        """Context manager which adds the time spent inside it to a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name: str) -> Callable:
+        """Decorator which adds the time spent in every call of a function to a stage."""
+
+        def decorator(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def record(self, name: str, seconds: float) -> None:
+        """Adds the duration of a call to a stage."""
+        with self.lock:
+            stage = self.stages.setdefault(name, {"calls": 0, "total": 0.0, "max": 0.0})
+            stage["calls"] += 1
+            stage["total"] += seconds
+            stage["max"] = max(stage["max"], seconds)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Adds an amount to a counter."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self) -> None:
+        """Forgets every stage and counter."""
+        with self.lock:
+            self.stages.clear()
+            self.counters.clear()
+
+    def report(self) -> dict:
+        """The stages, with their number of calls and total, mean and longest time in seconds, and the counters."""
+        with self.lock:
+            return {
+                "stages": {
+                    name: stage | {"mean": stage["total"] / max(stage["calls"], 1)}
+                    for name, stage in self.stages.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def merge(self, report: dict) -> None:
+        """Adds a report, for example of another process, to this instrumentation."""
+        with self.lock:
+            for name, other in report["stages"].items():
+                stage = self.stages.setdefault(
+                    name, {"calls": 0, "total": 0.0, "max": 0.0}
+                )
+                stage["calls"] += other["calls"]
+                stage["total"] += other["total"]
+                stage["max"] = max(stage["max"], other["max"])
+            for name, amount in report["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def summary(self) -> str:
+        """Tables of the stages, slowest first, and the counters."""
+        report = self.report()
+        stages = pd.DataFrame.from_dict(report["stages"], orient="index")
+        if stages.empty:
+            return "Nothing was measured yet."
+
+        stages = stages.sort_values("total", ascending=False)
+        stages[["total", "mean", "max"]] *= 1000
+        lines = [
+            stages[["calls", "total", "mean", "max"]].to_markdown(
+                tablefmt="plain",
+                floatfmt=("", ".0f", ".2f", ".2f", ".2f"),
+                headers=["Stage", "Calls", "Total [ms]", "Mean [ms]", "Max [ms]"],
+            )
+        ]
+        if report["counters"]:
+            lines.append("")
+            lines.append(
+                pd.Series(report["counters"]).to_markdown(
+                    tablefmt="plain", headers=["Counter", "Count"]
+                )
+            )
+        return "\n".join(lines)
+
+    def to_json(self, path: str | Path) -> None:
+        """Writes the report to a JSON file."""
+        Path(path).write_text(json.dumps(self.report(), indent=2))
+
+    @contextmanager
+    def profile(self):
+        """Profiles the code inside it with cProfile, the calls are added to the previous profile.
+
+        Only one thread is profiled at a time, code that runs while another thread is profiled is not profiled.
+        """
+        with self.lock:
+            if self.profiling:
+                profiler = None
+            else:
+                if self.profiler is None:
+                    self.profiler = cProfile.Profile()
+                profiler = self.profiler
+                self.profiling = True
+
+        if profiler is None:
+            yield
+            return
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self.profiling = False
+
+    def profile_summary(self, limit: int = 30) -> str:
+        """The functions with the most cumulative time in the profile."""
+        if self.profiler is None:
+            return "Nothing was profiled yet."
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats("cumulative").print_stats(
+            limit
+        )
+        return stream.getvalue()
+
+    def dump_profile(self, path: str | Path) -> None:
+        """Writes the profile in the format of pstats, for viewers like snakeviz."""
+        if self.profiler is not None:
+            self.profiler.dump_stats(str(path))
+
+    def clear_profile(self) -> None:
+        self.profiler = None
+
+
+# shared by the analysis classes, every process has its own
+instrumentation = Instrumentation()
@@ -0,0 +1,270 @@
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+
+from gammaspotter.process_data import ProcessData, SPECTRUM_COLUMNS
+
+
+def channel_name(channel: int) -> str:
+    """Letter of a channel, starting at A for channel zero and continuing with AA, AB, ... after Z."""
+    name = ""
+    channel += 1
+    while channel:
+        channel, letter = divmod(channel - 1, 26)
+        name = chr(ord("A") + letter) + name
+    return name
+
+
+def count_columns(channel_count: int) -> list[str]:
+    """Names of the count columns, in the layout of a PicoScope CSV file (at least channels A and B)."""
+    return [
+        f"counts_ch_{channel_name(channel)}" for channel in range(max(channel_count, 2))
+    ]
+
+
+class ListModeData:
+    def __init__(
+        self,
+        value_range: tuple[float, float],
+        channel_count: int = 1,
+        fine_bins: int = 65536,
+    ) -> None:
+        """Histogram of list-mode data, which has one pulse height per detected event instead of binned counts.
+
+        The events are counted in a fine histogram, which is summed into the channels of a spectrum
+        on request. The number of channels can therefore be changed without reading the events again.
+
+        Args:
+            value_range (tuple[float, float]): lowest and highest pulse height, events outside of it are not counted
+            channel_count (int, optional): number of detector channels the events come from. Defaults to 1.
+            fine_bins (int, optional): number of bins of the fine histogram, channel counts that divide it are rebinned exactly. Defaults to 65536.
+        """
+        self.low, self.high = float(value_range[0]), float(value_range[1])
+        if not self.high > self.low:
+            raise ValueError("The highest pulse height must be above the lowest.")
+        self.fine_bins = fine_bins
+        self.fine_counts = np.zeros((fine_bins, channel_count), dtype=np.int64)
+        self.event_count = 0
+
+    @classmethod
+    def from_events(
+        cls,
+        pulse_heights: np.ndarray,
+        channels: np.ndarray | None = None,
+        value_range: tuple[float, float] | None = None,
+        fine_bins: int = 65536,
+        chunk_size: int = 1000000,
+    ) -> "ListModeData":
+        """Histograms an array of events, for example a memory-mapped file, chunk by chunk.
+
+        Args:
+            pulse_heights (np.ndarray): pulse height of every event
+            channels (np.ndarray | None, optional): detector channel of every event, starting at zero. Defaults to None, which puts every event in channel A.
+            value_range (tuple[float, float] | None, optional): lowest and highest pulse height. Defaults to None, which uses zero and the highest pulse height.
+            fine_bins (int, optional): number of bins of the fine histogram. Defaults to 65536.
+            chunk_size (int, optional): number of events converted at once. Defaults to 1000000.
+
+        Returns:
+            ListModeData: the histogram of the events
+        """
+        if value_range is None:
+            value_range = (0, np.max(pulse_heights, initial=1))
+        channel_count = 1 if channels is None else int(np.max(channels, initial=0)) + 1
+
+        list_mode_data = cls(
+            value_range, channel_count=channel_count, fine_bins=fine_bins
+        )
+        for start in range(0, len(pulse_heights), chunk_size):
+            stop = start + chunk_size
+            list_mode_data.add_events(
+                pulse_heights[start:stop],
+                None if channels is None else channels[start:stop],
+            )
+
+        return list_mode_data
+
+    @classmethod
+    def from_file(
+        cls,
+        path: str | Path,
+        value_range: tuple[float, float] | None = None,
+        column: int = 0,
+        channel_column: int | None = None,
+        dtype: str = "float32",
+        fine_bins: int = 65536,
+        chunk_size: int = 1000000,
+    ) -> "ListModeData":
+        """Reads an event file and histograms it, without loading the whole file in memory.
+
+        NumPy (.npy) files and raw binary files are memory-mapped, CSV files are read in chunks.
+
+        Args:
+            path (str | Path): path of the event file
+            value_range (tuple[float, float] | None, optional): lowest and highest pulse height. Defaults to None, which
+                uses zero and the highest pulse height, a CSV file is then read twice.
+            column (int, optional): column of the pulse heights in a CSV or 2-D NumPy file. Defaults to 0.
+            channel_column (int | None, optional): column of the detector channels. Defaults to None, which puts every event in channel A.
+            dtype (str, optional): type of the values in a raw binary file. Defaults to "float32".
+            fine_bins (int, optional): number of bins of the fine histogram. Defaults to 65536.
+            chunk_size (int, optional): number of events read at once. Defaults to 1000000.
+
+        Returns:
+            ListModeData: the histogram of the events
+        """
+        path = Path(path)
+        if path.suffix.lower() in [".csv", ".txt"]:
+            return cls.from_csv(
+                path, value_range, column, channel_column, fine_bins, chunk_size
+            )
+
+        if path.suffix.lower() == ".npy":
+            events = np.load(path, mmap_mode="r")
+        else:
+            events = np.memmap(path, dtype=dtype, mode="r")
+
+        if events.ndim == 1:
+            return cls.from_events(
+                events,
+                value_range=value_range,
+                fine_bins=fine_bins,
+                chunk_size=chunk_size,
+            )
+        return cls.from_events(
+            events[:, column],
+            None if channel_column is None else events[:, channel_column],
+            value_range=value_range,
+            fine_bins=fine_bins,
+            chunk_size=chunk_size,
+        )
+
+    @classmethod
+    def from_csv(
+        cls,
+        path: str | Path,
+        value_range: tuple[float, float] | None = None,
+        column: int = 0,
+        channel_column: int | None = None,
+        fine_bins: int = 65536,
+        chunk_size: int = 1000000,
+    ) -> "ListModeData":
+        """Reads a CSV event file in chunks, see 'from_file'."""
+        usecols = [column] if channel_column is None else [column, channel_column]
+        # pandas returns the selected columns in the order of the file, not of usecols
+        pulse_height_index = sorted(usecols).index(column)
+        channel_index = (
+            sorted(usecols).index(channel_column)
+            if channel_column is not None
+            else None
+        )
+
+        def chunks():
+            return pd.read_csv(path, usecols=usecols, chunksize=chunk_size)
+
+        channel_count = 1
+        if value_range is None or channel_column is not None:
+            highest = 0
+            for chunk in chunks():
+                highest = max(highest, chunk.iloc[:, pulse_height_index].max())
+                if channel_column is not None:
+                    channel_count = max(
+                        channel_count, int(chunk.iloc[:, channel_index].max()) + 1
+                    )
+            value_range = value_range or (0, highest)
+
+        list_mode_data = cls(
+            value_range, channel_count=channel_count, fine_bins=fine_bins
+        )
+        for chunk in chunks():
+            list_mode_data.add_events(
+                chunk.iloc[:, pulse_height_index].to_numpy(dtype=float),
+                (
+                    None
+                    if channel_column is None
+                    else chunk.iloc[:, channel_index].to_numpy()
+                ),
+            )
+
+        return list_mode_data
+
+    def add_events(
+        self, pulse_heights: np.ndarray, channels: np.ndarray | None = None
+    ) -> None:
+        """Counts events in the fine histogram.
+
+        Args:
+            pulse_heights (np.ndarray): pulse height of every event
+            channels (np.ndarray | None, optional): detector channel of every event. Defaults to None, which puts every event in channel A.
+        """
+        pulse_heights = np.asarray(pulse_heights, dtype=float)
+        scale = self.fine_bins / (self.high - self.low)
+        bins = np.floor((pulse_heights - self.low) * scale)
+        # the highest pulse height belongs to the last bin
+        bins[pulse_heights == self.high] = self.fine_bins - 1
+        inside = (bins >= 0) & (bins < self.fine_bins)
+
+        channel_count = self.fine_counts.shape[1]
+        bins = bins[inside].astype(np.intp)
+        if channels is not None:
+            channels = np.asarray(channels, dtype=np.intp)[inside]
+            if channels.size and channels.max() >= channel_count:
+                raise ValueError(
+                    f"The events come from more than {channel_count} channels."
+                )
+            # one bincount for all channels, the channels are interleaved
+            bins = bins * channel_count + channels
+
+        self.fine_counts += np.bincount(
+            bins, minlength=self.fine_bins * channel_count
+        ).reshape(self.fine_bins, channel_count)
+        self.event_count += len(bins)
+
+    def histogram(self, bin_count: int = 1024) -> pd.DataFrame:
+        """Sums the fine histogram into a spectrum with the given number of bins.
+
+        Bin counts that divide the number of fine bins are exact. Otherwise the fine bins on the edge between two bins
+        are split between them in proportion to their overlap, rounded to whole counts, so every event is still counted once.
+
+        Args:
+            bin_count (int, optional): number of bins of the spectrum. Defaults to 1024.
+
+        Returns:
+            pd.DataFrame: the spectrum, in the layout of a PicoScope CSV file
+        """
+        if self.fine_bins % bin_count == 0:
+            counts = self.fine_counts.reshape(bin_count, -1, self.fine_counts.shape[1])
+            counts = counts.sum(axis=1)
+        else:
+            # counts below every edge of the bins, interpolated within the fine bin the edge falls in
+            cumulative = np.concatenate(
+                [
+                    np.zeros((1, self.fine_counts.shape[1]), dtype=np.int64),
+                    np.cumsum(self.fine_counts, axis=0),
+                ]
+            )
+            edges = np.arange(bin_count + 1) * self.fine_bins
+            fine_bin, remainder = np.divmod(edges, bin_count)
+            # the last edge falls on the end of the last fine bin, without a fine bin to split
+            split_counts = np.zeros_like(cumulative)
+            split_counts[:-1] = self.fine_counts
+            below = (
+                cumulative[fine_bin]
+                + (split_counts[fine_bin] * remainder[:, None] + bin_count // 2)
+                // bin_count
+            )
+            counts = np.diff(below, axis=0)
+
+        columns = count_columns(counts.shape[1])
+        if counts.shape[1] < len(columns):
+            counts = np.pad(counts, ((0, 0), (0, len(columns) - counts.shape[1])))
+
+        width = (self.high - self.low) / bin_count
+        data = pd.DataFrame(counts, columns=columns)
+        data.insert(
+            0, SPECTRUM_COLUMNS[0], self.low + (np.arange(bin_count) + 0.5) * width
+        )
+        return data
+
+    def process_data(self, bin_count: int = 1024) -> ProcessData:
+        """ProcessData of the spectrum with the given number of bins."""
+        return ProcessData(self.histogram(bin_count))
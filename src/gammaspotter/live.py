@@ -0,0 +1,334 @@
+import io
+import os
+import stat
+import socket
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+
+from gammaspotter.process_data import ProcessData
+
+
+class RowParser:
+    def __init__(self) -> None:
+        """Turns a stream of bytes into rows of numbers, in the CSV layout of the PicoScope
+        (pulseheight, counts_ch_A, counts_ch_B). Incomplete lines are kept until the rest arrives.
+        """
+        self.remainder = b""
+
+    def feed(self, chunk: bytes) -> np.ndarray:
+        """Parses the complete lines in the received bytes.
+
+        Args:
+            chunk (bytes): newly received bytes
+
+        Returns:
+            np.ndarray: one row per complete line, header lines are skipped
+        """
+        chunk = self.remainder + chunk
+        end_of_lines = chunk.rfind(b"\n") + 1
+        self.remainder = chunk[end_of_lines:]
+        if end_of_lines == 0:
+            return np.empty((0, 0))
+
+        rows = pd.read_csv(
+            io.BytesIO(chunk[:end_of_lines]), header=None, on_bad_lines="skip"
+        )
+        # header lines can not be converted to numbers
+        rows = rows.apply(pd.to_numeric, errors="coerce").dropna()
+
+        return rows.to_numpy(dtype=float)
+
+
+class FileFollower:
+    def __init__(self, path: str | Path) -> None:
+        """Follows a file which is written by the detector and returns the rows added since the last poll.
+        Named pipes are read without blocking.
+
+        Args:
+            path (str | Path): path of the growing file or named pipe
+        """
+        self.path = Path(path)
+        self.parser = RowParser()
+        self.offset = 0
+        self.pipe = None
+        if stat.S_ISFIFO(os.stat(self.path).st_mode):
+            self.pipe = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+
+    def poll(self) -> tuple[np.ndarray, bool]:
+        """Reads everything that was added to the file since the last poll.
+
+        Returns:
+            tuple[np.ndarray, bool]: the new rows and whether the file was truncated, in which case the rows start a new measurement
+        """
+        if self.pipe is not None:
+            chunks = []
+            while True:
+                try:
+                    chunk = os.read(self.pipe, 65536)
+                except BlockingIOError:
+                    break
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            return self.parser.feed(b"".join(chunks)), False
+
+        truncated = os.path.getsize(self.path) < self.offset
+        if truncated:
+            self.offset = 0
+            self.parser = RowParser()
+        with open(self.path, "rb") as file:
+            file.seek(self.offset)
+            chunk = file.read()
+        self.offset += len(chunk)
+
+        return self.parser.feed(chunk), truncated
+
+    def close(self) -> None:
+        if self.pipe is not None:
+            os.close(self.pipe)
+            self.pipe = None
+
+
+class SocketFollower:
+    def __init__(self, address: str | tuple[str, int]) -> None:
+        """Receives rows from a local socket without blocking.
+
+        Args:
+            address (str | tuple[str, int]): path of a unix domain socket or a (host, port) tuple
+        """
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.connection = socket.socket(family, socket.SOCK_STREAM)
+        self.connection.connect(address)
+        self.connection.setblocking(False)
+        self.parser = RowParser()
+
+    def poll(self) -> tuple[np.ndarray, bool]:
+        """Receives everything that was sent since the last poll.
+
+        Returns:
+            tuple[np.ndarray, bool]: the new rows and False, a socket can not be truncated
+        """
+        chunks = []
+        while True:
+            try:
+                chunk = self.connection.recv(65536)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+        return self.parser.feed(b"".join(chunks)), False
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class LiveSpectrum:
+    def __init__(
+        self,
+        rows: np.ndarray,
+        columns: list[str] | None = None,
+        max_bins: int = 2**20,
+    ) -> None:
+        """Histogram buffer of a running measurement, which counts are added to while the detector is acquiring.
+
+        Args:
+            rows (np.ndarray): first rows of the measurement, their pulse heights define the bins of the histogram,
+                which grows with bins of the same spacing when later rows have pulse heights outside of it
+            columns (list[str] | None, optional): column names of the spectrum. Defaults to the PicoScope names.
+            max_bins (int, optional): largest number of bins the histogram grows to, rows beyond it are left out. Defaults to 2**20.
+        """
+        rows = np.asarray(rows, dtype=float)
+        self.x = np.unique(rows[:, 0])
+        self.counts = np.zeros((len(self.x), rows.shape[1] - 1))
+        self.columns = (
+            columns or ["pulseheight", "counts_ch_A", "counts_ch_B"][: rows.shape[1]]
+        )
+        # the bins whose counts changed since the last peak fit
+        self.changed = np.zeros(len(self.x), dtype=bool)
+        self.fit_cache = {}
+        self.fit_domain_width = None
+        self.max_bins = max_bins
+        # rows whose pulse height was too far outside of the histogram to add bins for
+        self.dropped_rows = 0
+
+        # midpoints between the bins, for assigning counts to the nearest bin
+        self.bin_edges = (self.x[1:] + self.x[:-1]) / 2
+        self.add_counts(rows)
+
+    def extend_bins(self, pulse_heights: np.ndarray) -> None:
+        """Adds bins below the first and above the last bin, with the spacing of the bins there, until they reach the pulse heights.
+
+        A first read of a measurement which was still being written only has the lowest pulse heights,
+        without new bins the counts above them would all be added to the last bin.
+        The histogram does not grow beyond 'max_bins', the bins on the side that needs the fewest are added first.
+
+        Args:
+            pulse_heights (np.ndarray): pulse heights of new rows
+        """
+        if len(self.x) < 2 or len(pulse_heights) == 0:
+            # without a spacing, every new pulse height is a bin
+            new_x = np.setdiff1d(pulse_heights, self.x)[: self.max_bins - len(self.x)]
+            low_x, high_x = new_x[new_x < self.x[0]], new_x[new_x > self.x[0]]
+        else:
+            low_spacing = self.x[1] - self.x[0]
+            high_spacing = self.x[-1] - self.x[-2]
+            # enough bins that the furthest pulse height is within half a bin of the new end
+            low_count = max(
+                int(np.ceil((self.x[0] - pulse_heights.min()) / low_spacing - 0.5)), 0
+            )
+            high_count = max(
+                int(np.ceil((pulse_heights.max() - self.x[-1]) / high_spacing - 0.5)),
+                0,
+            )
+            if low_count == 0 and high_count == 0:
+                return
+            room = self.max_bins - len(self.x)
+            if low_count <= high_count:
+                low_count = min(low_count, room)
+                high_count = min(high_count, room - low_count)
+            else:
+                high_count = min(high_count, room)
+                low_count = min(low_count, room - high_count)
+            low_x = self.x[0] - low_spacing * np.arange(low_count, 0, -1)
+            high_x = self.x[-1] + high_spacing * np.arange(1, high_count + 1)
+        if len(low_x) == 0 and len(high_x) == 0:
+            return
+
+        channel_count = self.counts.shape[1]
+        self.x = np.concatenate([low_x, self.x, high_x])
+        self.counts = np.concatenate(
+            [
+                np.zeros((len(low_x), channel_count)),
+                self.counts,
+                np.zeros((len(high_x), channel_count)),
+            ]
+        )
+        # empty bins change the domains they are added to
+        self.changed = np.concatenate(
+            [
+                np.ones(len(low_x), dtype=bool),
+                self.changed,
+                np.ones(len(high_x), dtype=bool),
+            ]
+        )
+        self.bin_edges = (self.x[1:] + self.x[:-1]) / 2
+
+    def add_counts(self, rows: np.ndarray) -> np.ndarray:
+        """Adds counts to the histogram, every row adds its counts to the bin nearest to its pulse height.
+
+        Args:
+            rows (np.ndarray): pulse heights with the counts of every channel
+
+        Returns:
+            np.ndarray: positions of the bins that changed, after the bins for new pulse heights were added
+        """
+        rows = np.asarray(rows, dtype=float)
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.intp)
+
+        self.extend_bins(rows[:, 0])
+        if len(self.x) > 1:
+            # rows beyond the bins that could be added are left out, instead of piling up in the first or last bin
+            low_spacing = self.x[1] - self.x[0]
+            high_spacing = self.x[-1] - self.x[-2]
+            inside = (rows[:, 0] >= self.x[0] - low_spacing / 2) & (
+                rows[:, 0] <= self.x[-1] + high_spacing / 2
+            )
+            self.dropped_rows += int(np.count_nonzero(~inside))
+            rows = rows[inside]
+        bins = np.searchsorted(self.bin_edges, rows[:, 0])
+        for channel in range(self.counts.shape[1]):
+            self.counts[:, channel] += np.bincount(
+                bins, weights=rows[:, channel + 1], minlength=len(self.x)
+            )
+
+        changed_bins = np.unique(bins[np.any(rows[:, 1:] != 0, axis=1)])
+        self.changed[changed_bins] = True
+
+        return changed_bins
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """The current spectrum, in the layout of a PicoScope CSV file."""
+        data = pd.DataFrame(self.counts, columns=self.columns[1:])
+        data.insert(0, self.columns[0], self.x)
+        return data
+
+    def process_data(self) -> ProcessData:
+        """ProcessData of the current spectrum."""
+        return ProcessData(self.data)
+
+    def take_changed(self) -> np.ndarray:
+        """Which bins changed since the last call, the changes are forgotten afterwards."""
+        changed = self.changed.copy()
+        self.changed[:] = False
+        return changed
+
+    def fit_peaks(
+        self,
+        process_data: ProcessData,
+        prominence: float,
+        domain_width: float,
+        changed: np.ndarray | None = None,
+    ) -> pd.DataFrame:
+        """Detects and fits the peaks of the current spectrum, only the peaks whose domain changed since the last call are fitted again.
+
+        The fit can run in the background while counts are added, when the ProcessData and the changed bins
+        are taken together beforehand, see 'take_changed'. Only one fit may run at a time.
+
+        Args:
+            process_data (ProcessData): ProcessData of the current spectrum
+            prominence (float): peak detection threshold
+            domain_width (float): width of the domains generated for analysis
+            changed (np.ndarray | None, optional): which bins of the ProcessData changed since the last fit. Defaults to None, the bins changed since the last call.
+
+        Returns:
+            pd.DataFrame: x-values of fitted peaks with uncertainties and whether the fit of each peak succeeded
+        """
+        if changed is None:
+            changed = self.take_changed()
+        if domain_width != self.fit_domain_width:
+            self.fit_cache = {}
+            self.fit_domain_width = domain_width
+
+        peaks = process_data.find_gamma_peaks(prominence=prominence)
+        starts, stops = process_data.domain_bounds(
+            centers=peaks.iloc[:, 0], width=domain_width
+        )
+
+        # number of changed bins in every domain
+        changed_count = np.concatenate([[0], np.cumsum(changed[: len(process_data.x)])])
+        domain_changed = changed_count[stops] - changed_count[starts] > 0
+
+        # the domains are kept by the pulse heights of their first bin and of the bin after them,
+        # the positions of the bins move when bins are added below them
+        bounds = np.append(process_data.x, np.inf)
+        keys = list(zip(bounds[starts].tolist(), bounds[stops].tolist()))
+        refit = [
+            index
+            for index, key in enumerate(keys)
+            if domain_changed[index] or key not in self.fit_cache
+        ]
+        if refit:
+            try:
+                fitted = process_data.fit_peaks(
+                    peaks=peaks.iloc[refit], domain_width=domain_width
+                )
+            except Exception:
+                # the changes are forgotten already, so none of the cached fits can be trusted
+                self.fit_cache = {}
+                raise
+            for index, result in zip(refit, fitted.itertuples(index=False)):
+                self.fit_cache[keys[index]] = tuple(result)
+
+        # forget the peaks which disappeared
+        self.fit_cache = {key: self.fit_cache[key] for key in keys}
+
+        return pd.DataFrame(
+            [self.fit_cache[key] for key in keys],
+            columns=["energy", "stderr", "success"],
+        ).astype({"energy": float, "stderr": float, "success": bool})
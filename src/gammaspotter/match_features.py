@@ -1,56 +1,93 @@
 from math import sqrt
-from scipy.special import erfc
+import numpy as np
 import pandas as pd
 
+from gammaspotter.catalog import Catalog
+from gammaspotter.instrumentation import instrumentation
+
 
 class MatchFeatures:
-    def __init__(self, data_peaks: pd.DataFrame, catalog_data: pd.DataFrame):
+    def __init__(self, data_peaks: pd.DataFrame, catalog_data: pd.DataFrame | Catalog):
         """Class for matching the found gamma peaks with the literature energies.
 
+        The peaks of several detector channels can be matched at once, by adding a 'channel' column to the peaks.
+
         Args:
-            data_peaks (pd.DataFrame): DataFrame containing the found gamma peaks.
-            catalog_data (pd.DataFrame): DataFrame containing the literature energies.
+            data_peaks (pd.DataFrame): DataFrame containing the found gamma peaks, with the peak number, energy and standard error.
+            catalog_data (pd.DataFrame | Catalog): DataFrame or indexed Catalog containing the literature energies.
         """
         self.data_peaks = data_peaks
-        self.catalog_isotopes = catalog_data.iloc[:, [0, 1]].values.tolist()
+        if not isinstance(catalog_data, Catalog):
+            catalog_data = Catalog(catalog_data)
+        self.catalog = catalog_data
 
-    def match_isotopes(self) -> pd.DataFrame:
+    @instrumentation.timed("match isotopes")
+    def match_isotopes(
+        self, max_results: int | None = None, n_sigma: float | None = 5
+    ) -> pd.DataFrame:
         """Function for matching the found gamma peaks with the literature energies.
 
+        Only the catalog entries within n_sigma standard deviations of a peak are compared with it,
+        the percentage match of entries further away rounds to zero anyway.
+
+        Args:
+            max_results (int | None, optional): only keep the best matches per peak. Defaults to None, which keeps all matches.
+            n_sigma (float | None, optional): half width of the catalog window around every peak in standard deviations.
+                Defaults to 5, None compares every peak with the whole catalog.
+
         Returns:
-            pd.DataFrame: A sorted DataFrame of possible sources.
+            pd.DataFrame: A sorted DataFrame of possible sources, labeled with the channel of the peak if the peaks have a channel.
         """
-        output_list = []
-        peak_nr = 1
-
-        # looping every known source by every peak for finding all the sigmas
-        for found_isotope in self.data_peaks.itertuples(index=False):
-            for catalog_isotope in self.catalog_isotopes:
-                literature_energy = catalog_isotope[0]
-                literature_isotope = catalog_isotope[1]
-                measured_energy = found_isotope[1]
-                std_meas = found_isotope[2]
-
-                z_score = (measured_energy - literature_energy) / std_meas
-                percentage_match = self.erfc_pecentage(abs(z_score))
-
-                if percentage_match > 0:
-                    output_list.append(
-                        [
-                            peak_nr,
-                            literature_isotope,
-                            percentage_match,
-                            literature_energy,
-                        ]
-                    )
-            peak_nr += 1
-
-        output_df = pd.DataFrame(
-            output_list, columns=["Peak Number", "Isotope", "Percentage", "Energy"]
-        )
-        sorted_df = output_df.sort_values(
-            by=["Peak Number", "Percentage"], ascending=[True, False]
+        measured_energies = self.data_peaks.iloc[:, 1].to_numpy(dtype=float)
+        std_meas = self.data_peaks.iloc[:, 2].to_numpy(dtype=float)
+
+        rows, entries = self.catalog.candidates(measured_energies, std_meas, n_sigma)
+        instrumentation.count("catalog rows scanned", len(entries))
+        z_scores = (
+            measured_energies[rows] - self.catalog.energies[entries]
+        ) / std_meas[rows]
+        percentages = self.erfc_pecentage(np.abs(z_scores))
+
+        matched = percentages > 0
+        rows = rows[matched]
+        entries = entries[matched]
+        percentages = percentages[matched]
+        catalog_positions = self.catalog.positions[entries]
+
+        # index rows by their position in the peak by catalog order
+        row_index = np.empty(len(rows), dtype=np.int64)
+        row_index[np.lexsort((catalog_positions, rows))] = np.arange(len(rows))
+
+        # sort by peak, then by percentage and then by the order of the catalog file
+        order = np.lexsort((catalog_positions, -percentages, rows))
+        rows = rows[order]
+        entries = entries[order]
+        percentages = percentages[order]
+        row_index = row_index[order]
+
+        if max_results is not None:
+            _, peak_starts, peak_counts = np.unique(
+                rows, return_index=True, return_counts=True
+            )
+            rank = np.arange(len(rows)) - np.repeat(peak_starts, peak_counts)
+            best = rank < max_results
+            rows = rows[best]
+            entries = entries[best]
+            percentages = percentages[best]
+            row_index = row_index[best]
+
+        instrumentation.count("matches", len(rows))
+        sorted_df = pd.DataFrame(
+            {
+                "Peak Number": self.data_peaks.iloc[:, 0].to_numpy()[rows],
+                "Isotope": self.catalog.nuclides[self.catalog.codes[entries]],
+                "Percentage": percentages,
+                "Energy": self.catalog.energies[entries],
+            },
+            index=row_index,
         )
+        if "channel" in self.data_peaks.columns:
+            sorted_df.insert(0, "Channel", self.data_peaks["channel"].to_numpy()[rows])
 
         return sorted_df
 
@@ -58,9 +95,12 @@ class MatchFeatures:
         """Function for calculating the percentage match between the measured and literature energy.
 
         Args:
-            z_score (float): The z_score of the measured data compared to the literature value.
+            z_score (float | np.ndarray): The z_score of the measured data compared to the literature value.
 
         Returns:
-            float: The percentage match between the measured and literature energy.
+            float | np.ndarray: The percentage match between the measured and literature energy.
         """
-        return round(erfc(z_score / sqrt(2)) * 100, 2)
+        # scipy is imported on first use, which keeps the startup of the GUI fast
+        from scipy.special import erfc
+
+        return np.round(erfc(z_score / sqrt(2)) * 100, 2)
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pyqtgraph as pg
+
+from PySide6.QtCore import QLineF, QPointF, QRectF
+
+
+def plot_curve(
+    plot_widget: pg.PlotWidget, spectrum_data: pd.DataFrame, pen: dict
+) -> pg.PlotDataItem:
+    """Plots a spectrum which stays fast to pan and zoom, whatever its number of channels.
+
+    Only the visible part of the spectrum is drawn, reduced to the minimum and maximum of every
+    group of channels that falls on the same pixel, so no peak disappears from the plot.
+
+    Args:
+        plot_widget (pg.PlotWidget): the plot to add the curve to
+        spectrum_data (pd.DataFrame): the spectrum, with the pulse heights in the first column and the counts in the second
+        pen (dict): pen of the curve
+
+    Returns:
+        pg.PlotDataItem: the curve of the spectrum
+    """
+    curve = plot_widget.plot(
+        x=np.ascontiguousarray(spectrum_data.iloc[:, 0], dtype=float),
+        y=np.ascontiguousarray(spectrum_data.iloc[:, 1], dtype=float),
+        symbol=None,
+        pen=pen,
+        skipFiniteCheck=True,
+    )
+    # set after adding the curve, pyqtgraph can not clip a curve that is not in a plot yet
+    curve.setDownsampling(auto=True, method="peak")
+    curve.setClipToView(True)
+    return curve
+
+
+class PeakLines(pg.GraphicsObject):
+    def __init__(self, pen: dict | None = None, label_color: str = "y") -> None:
+        """Vertical lines through the whole plot at many positions, drawn as a single graphics item.
+
+        Adding an InfiniteLine per peak makes every pan and zoom update hundreds of items,
+        this item only draws the lines that are visible.
+
+        Args:
+            pen (dict | None, optional): pen of the lines. Defaults to None, a yellow line of one pixel.
+            label_color (str, optional): color of the labels. Defaults to "y".
+        """
+        super().__init__()
+        self.pen = pg.mkPen(pen or {"color": "y", "width": 1})
+        self.pen.setCosmetic(True)
+        self.label_pen = pg.mkPen(label_color)
+        self.positions = np.empty(0)
+        self.labels = []
+
+    def setData(self, positions: list[float], labels: list[str] | None = None) -> None:
+        """Replaces the lines, with an optional label at the top of every line."""
+        self.positions = np.asarray(positions, dtype=float)
+        self.labels = list(labels) if labels is not None else []
+        self.prepareGeometryChange()
+        self.update()
+
+    def viewTransformChanged(self) -> None:
+        # the lines span the visible range, which changed
+        self.prepareGeometryChange()
+        super().viewTransformChanged()
+
+    def boundingRect(self) -> QRectF:
+        view_rect = self.viewRect()
+        if view_rect is None or len(self.positions) == 0:
+            return QRectF()
+        return view_rect
+
+    def dataBounds(self, axis: int, frac: float = 1.0, orthoRange=None):
+        # the lines do not change the range of the plot
+        return None
+
+    def paint(self, painter, *args) -> None:
+        view_rect = self.viewRect()
+        if view_rect is None or len(self.positions) == 0:
+            return
+
+        visible = np.flatnonzero(
+            (self.positions >= view_rect.left()) & (self.positions <= view_rect.right())
+        )
+        top, bottom = view_rect.top(), view_rect.bottom()
+        painter.setPen(self.pen)
+        painter.drawLines(
+            [
+                QLineF(self.positions[index], top, self.positions[index], bottom)
+                for index in visible
+            ]
+        )
+
+        if not self.labels:
+            return
+        # the labels are drawn in pixels, so they are not stretched with the axes
+        transform = painter.transform()
+        painter.resetTransform()
+        painter.setPen(self.label_pen)
+        for index in visible:
+            point = transform.map(QPointF(self.positions[index], max(top, bottom)))
+            painter.drawText(point + QPointF(3, 15), self.labels[index])
@@ -1,40 +1,176 @@
 import pandas as pd
 import numpy as np
 
+from typing import Callable
 from statistics import mean
-from scipy.signal import find_peaks
-from scipy.optimize import curve_fit
+from concurrent.futures import Executor
 
 from gammaspotter.fit_models import FitModels
+from gammaspotter.cache import LRUCache
+from gammaspotter.instrumentation import instrumentation
+
+SPECTRUM_COLUMNS = ["pulseheight", "counts_ch_A", "counts_ch_B"]
 
 
 class ProcessData:
-    def __init__(self, data: pd.DataFrame) -> None:
-        """Class for processing the raw data from the gamma detector from the PicoScope."""
+    def __init__(
+        self,
+        data: pd.DataFrame | np.ndarray,
+        peak_cache_size: int = 32,
+        fit_cache_size: int = 4096,
+    ) -> None:
+        """Class for processing the raw data from the gamma detector from the PicoScope.
+
+        Every column after the pulse height is a detector channel, the first channel is used unless another channel is asked for.
+        The detected peaks of every prominence and the fit of every domain are remembered,
+        so repeating an analysis with the same parameters does not redo the work.
+
+        Args:
+            data (pd.DataFrame | np.ndarray): the spectrum, an array (for example memory-mapped from the spectrum store) is used without copying
+            peak_cache_size (int, optional): number of prominences whose peaks are remembered. Defaults to 32.
+            fit_cache_size (int, optional): number of domain fits that are remembered. Defaults to 4096.
+        """
+        if isinstance(data, np.ndarray):
+            data = pd.DataFrame(
+                data, columns=SPECTRUM_COLUMNS[: data.shape[1]], copy=False
+            )
         # remove last four rows of data to remove edge effect from out of range binning
         self.data = data[:-4]
 
-    def find_gamma_peaks(self, prominence) -> pd.DataFrame:
+        # the pulse heights are monotonic, which allows binary searches on the x-values
+        self.x = self.data.iloc[:, 0].to_numpy(dtype=float)
+        # one column per channel
+        self.channels = self.data.columns[1:].tolist()
+        self.counts = self.data.iloc[:, 1:].to_numpy(dtype=float)
+        self.y = self.counts[:, 0]
+
+        # the spectrum does not change, so results only depend on the parameters
+        self.peak_cache = LRUCache(maxsize=peak_cache_size)
+        self.prominence_profiles = {}
+        self.fit_cache = LRUCache(maxsize=fit_cache_size)
+
+    def channel_positions(
+        self, channel: int | str | list[int | str], count: int | None = None
+    ) -> int | np.ndarray:
+        """Converts channel names or numbers to column positions in the counts array.
+
+        Args:
+            channel (int | str | list[int | str]): a channel number or column name, or one per peak
+            count (int | None, optional): number of peaks a single channel is repeated for. Defaults to None, which returns a single position.
+
+        Returns:
+            int | np.ndarray: the position of the channel, or the position for every peak
+        """
+        if isinstance(channel, (int, np.integer, str)):
+            position = (
+                self.channels.index(channel) if isinstance(channel, str) else channel
+            )
+            if count is None:
+                return int(position)
+            return np.full(count, position, dtype=np.intp)
+
+        channel = np.asarray(channel)
+        if np.issubdtype(channel.dtype, np.integer):
+            return channel.astype(np.intp)
+        return np.array(
+            [self.channel_positions(single_channel) for single_channel in channel],
+            dtype=np.intp,
+        )
+
+    @instrumentation.timed("find peaks")
+    def find_gamma_peaks(self, prominence, channel: int | str = 0) -> pd.DataFrame:
         """Detect peaks in the gamma spectrum and return their positions in the graph.
 
+        Args:
+            prominence (float): peak detection threshold
+            channel (int | str, optional): number or column name of the channel. Defaults to 0, the first channel.
+
         Returns:
             pd.DataFrame: The x and y coordinates of the detected peaks.
         """
-        y = self.data.iloc[:, 1]
-        peaks, _ = find_peaks(y, prominence=prominence)
-        peak_positions = self.data.index[peaks]
-
-        x_peaks = self.data.iloc[:, 0][peak_positions]
-        y_peaks = self.data.iloc[:, 1][peak_positions]
+        position = self.channel_positions(channel)
+        peaks_data = self.peak_cache.get((prominence, position))
+        if peaks_data is not None:
+            instrumentation.count("peak cache hits")
+            return peaks_data.copy()
+
+        # the peaks above the threshold are the end of the maxima sorted by prominence
+        maxima, prominences = self.prominence_profile(position)
+        start = np.searchsorted(prominences, prominence, side="left")
+        peaks = np.sort(maxima[start:])
+        instrumentation.count("peaks found", len(peaks))
 
         peaks_data = pd.DataFrame(
             {
-                "x_peaks": x_peaks,
-                "y_peaks": y_peaks,
+                "x_peaks": self.data.iloc[peaks, 0],
+                "y_peaks": self.data.iloc[peaks, position + 1],
             }
         )
+        self.peak_cache.put((prominence, position), peaks_data)
+
+        return peaks_data.copy()
+
+    def prominence_profile(self, position: int) -> tuple[np.ndarray, np.ndarray]:
+        """Finds every local maximum of a channel and its prominence, sorted by prominence.
+
+        The profile is computed once per channel, after which the peaks of any threshold are found
+        with a binary search. The peaks are the same as those of 'scipy.signal.find_peaks' with that prominence.
+
+        Args:
+            position (int): position of the channel in the counts array
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: row positions of the maxima and their prominences, in order of increasing prominence
+        """
+        profile = self.prominence_profiles.get(position)
+        if profile is None:
+            # scipy is imported on first use, importing it takes longer than starting the GUI
+            from scipy.signal import find_peaks, peak_prominences
+
+            with instrumentation.stage("prominence profile"):
+                counts = self.counts[:, position]
+                maxima, _ = find_peaks(counts)
+                prominences = peak_prominences(counts, maxima)[0]
+                order = np.argsort(prominences, kind="stable")
+                profile = maxima[order], prominences[order]
+            self.prominence_profiles[position] = profile
+
+        return profile
+
+    def find_gamma_peaks_all_channels(self, prominence) -> pd.DataFrame:
+        """Detect the peaks of every channel.
+
+        Args:
+            prominence (float): peak detection threshold
+
+        Returns:
+            pd.DataFrame: The x and y coordinates of the detected peaks, with the column name of their channel.
+        """
+        peaks_data = [
+            self.find_gamma_peaks(prominence, channel=position).assign(
+                channel=channel_name
+            )
+            for position, channel_name in enumerate(self.channels)
+        ]
+        return pd.concat(peaks_data)
+
+    def domain_bounds(
+        self, centers: list[float], width: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Finds the row positions of the domains of given width around specified center values with a binary search.
+
+        Args:
+            centers (list[float]): x-values around which the domains should be generated.
+            width (float): Width of the domains.
+
+        Returns:
+            tuple[np.ndarray]: start and stop row positions of every domain, for slicing the data.
+        """
+        centers = np.asarray(centers, dtype=float)
+        starts = np.searchsorted(self.x, centers - width / 2, side="left")
+        stops = np.searchsorted(self.x, centers + width / 2, side="right")
 
-        return peaks_data
+        return starts, stops
 
     def isolate_domains(self, centers: list[float], width: float) -> list[pd.DataFrame]:
         """Creates subset dataframes from the input data which contain a domain of given width around specified center values,
@@ -45,72 +181,345 @@ class ProcessData:
             width (float, optional): Width of the generated DataFrames.
 
         Returns:
-            list[pd.DataFrame]: List containing generated DataFrames.
+            list[pd.DataFrame]: List containing generated DataFrames, as slices of the data.
         """
-        domains = []
-        for x in centers:
-            upper_bound = x + width / 2
-            lower_bound = x - width / 2
-            domain = self.data[
-                (self.data.iloc[:, 0] >= lower_bound)
-                & (self.data.iloc[:, 0] <= upper_bound)
-            ]
-            domains.append(domain)
-
-        return domains
-
-    def fit_peaks(self, peaks: pd.DataFrame, domain_width: float) -> pd.DataFrame:
+        starts, stops = self.domain_bounds(centers=centers, width=width)
+
+        return [self.data.iloc[start:stop] for start, stop in zip(starts, stops)]
+
+    def stack_domains(
+        self,
+        centers: list[float],
+        width: float,
+        channel: int | str | list[int | str] = 0,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Gathers the domains around specified center values into 2-D arrays, padded to the length of the longest domain.
+
+        Args:
+            centers (list[float]): x-values around which the domains should be generated.
+            width (float): Width of the domains.
+            channel (int | str | list[int | str], optional): channel of the y-values, or the channel of every domain. Defaults to 0.
+
+        Returns:
+            tuple[np.ndarray]: x-values, y-values and a mask of the valid (not padded) values, one row per domain.
+        """
+        starts, stops = self.domain_bounds(centers=centers, width=width)
+        lengths = stops - starts
+        channel_positions = self.channel_positions(channel, count=len(starts))
+
+        positions = starts[:, np.newaxis] + np.arange(lengths.max(initial=0))
+        valid = positions < stops[:, np.newaxis]
+        positions = np.where(valid, positions, 0)
+        if len(self.x) == 0:
+            positions = positions[:, :0]
+            valid = valid[:, :0]
+
+        return (
+            self.x[positions],
+            self.counts[positions, channel_positions[:, np.newaxis]],
+            valid,
+        )
+
+    @staticmethod
+    def fit_domain(
+        x: np.ndarray,
+        y: np.ndarray,
+        initial_guess: list[float] | None = None,
+        center: float | None = None,
+    ) -> tuple[float, float, bool, int]:
+        """Performs a gaussian model fit on a single isolated domain.
+
+        A fit whose center ends up outside of the domain found another peak, or none, and is marked as failed.
+
+        Args:
+            x (np.ndarray): x-values of the domain around a peak
+            y (np.ndarray): y-values of the domain around a peak
+            initial_guess (list[float] | None, optional): initial amplitude, center, width and start height of the peak.
+                Defaults to None, which estimates them from the moments of the domain.
+            center (float | None, optional): detected position of the peak, the initial center of the estimated guess. Defaults to None, the center of mass of the domain.
+
+        Returns:
+            tuple[float, float, bool, int]: energy and standard error of the peak, whether the fit succeeded and the number of model evaluations
+        """
+        from scipy.optimize import curve_fit
+
+        # only positive parameters are allowed
+        bounds = ([0, 0, 0, 0], np.inf)
+
+        fit_func = FitModels.gaussian
+        try:
+            if initial_guess is None:
+                initial_guess = FitModels.gaussian_guess(x, y)
+                if center is not None:
+                    initial_guess[1] = center
+            popt, pcov, info, _, _ = curve_fit(
+                fit_func,
+                x,
+                y,
+                p0=initial_guess,
+                bounds=bounds,
+                jac=FitModels.gaussian_jacobian,
+                full_output=True,
+            )
+        except (RuntimeError, ValueError):
+            return np.nan, np.nan, False, 0
+
+        # extract fitted parameters
+        amp, cen, wid, startheight = popt
+        # fit_errors = np.sqrt(np.diag(pcov))
+
+        # the fit moved to a peak outside of the domain
+        if not x[0] <= cen <= x[-1]:
+            return np.nan, np.nan, False, info["nfev"]
+
+        # get the energy and standard error
+        return cen, wid, True, info["nfev"]
+
+    @instrumentation.timed("fit peaks")
+    def fit_peaks(
+        self,
+        peaks: pd.DataFrame,
+        domain_width: float,
+        executor: Executor | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        channel: int | str | list[int | str] = 0,
+    ) -> pd.DataFrame:
         """Takes raw spectrum data and performs a gaussian model fit on domains of the roughly detected peaks.
         This function returns more accurate peak positions than 'find_gamma_peaks'.
 
         Args:
-            peaks (pd.DataFrame): x and y values of peaks
+            peaks (pd.DataFrame): x and y values of peaks, the x values are used as domain centers
             domain_width (float): width of the domains generated for analysis
+            executor (Executor | None, optional): thread or process pool to run the fits concurrently. Defaults to None, which fits the peaks one by one.
+            progress (Callable[[int, int], None] | None, optional): called with the number of finished fits and the number of fits after every fit. Defaults to None.
+            channel (int | str | list[int | str], optional): channel of the peaks, or the channel of every peak. Defaults to 0, the first channel.
         Returns:
-            pd.DataFrame: x-values of fitted peaks with uncertainties
+            pd.DataFrame: x-values of fitted peaks with uncertainties and whether the fit of each peak succeeded
         """
         peaks_x = peaks.iloc[:, 0]
-        peaks_y = peaks.iloc[:, 1]
 
-        domains = self.isolate_domains(centers=peaks_x, width=domain_width)
+        starts, stops = self.domain_bounds(centers=peaks_x, width=domain_width)
+        channels = self.channel_positions(channel, count=len(starts))
+        keys = [
+            (start, stop, position, "gaussian")
+            for start, stop, position in zip(
+                starts.tolist(), stops.tolist(), channels.tolist()
+            )
+        ]
+        results = [self.fit_cache.get(key) for key in keys]
+        missing = [index for index, result in enumerate(results) if result is None]
+
+        # views on the cached arrays, no copies of the data are made
+        xs = [self.x[starts[index] : stops[index]] for index in missing]
+        ys = [
+            self.counts[starts[index] : stops[index], channels[index]]
+            for index in missing
+        ]
+        # the fits start at the detected peaks, the domains of nearby peaks overlap
+        initial_guesses = [None] * len(missing)
+        centers = peaks_x.iloc[missing].astype(float).tolist()
+
+        # a failed fit only marks its own peak as unsuccessful
+        if executor is not None and len(xs) > 1:
+            fitted = executor.map(self.fit_domain, xs, ys, initial_guesses, centers)
+        else:
+            fitted = map(self.fit_domain, xs, ys, initial_guesses, centers)
+        for done, (index, result) in enumerate(zip(missing, fitted), start=1):
+            # the fits can run in other processes, so they are counted here
+            instrumentation.count("fits tried")
+            instrumentation.count("fits failed", int(not result[2]))
+            instrumentation.count("curve_fit evaluations", result[3])
+            results[index] = result[:3]
+            self.fit_cache.put(keys[index], result[:3])
+            if progress is not None:
+                progress(done, len(missing))
+        instrumentation.count("fit cache hits", len(keys) - len(missing))
 
-        x_positions = []
-        x_positions_std = []
-        for index, domain in enumerate(domains):
-            x = domain.iloc[:, 0]
-            y = domain.iloc[:, 1]
+        x_positions_df = pd.DataFrame(
+            results, columns=["energy", "stderr", "success"]
+        ).astype({"energy": float, "stderr": float, "success": bool})
 
-            # [amp, cen, wid, startheight]
-            initial_guess = [
-                peaks_y.values[index],
-                peaks_x.values[index],
-                domain_width,
-                domain.iloc[:, 1].min(),
-            ]
+        return x_positions_df
 
-            # only positive parameters are allowed
-            bounds = ([0, 0, 0, 0], np.inf)
+    def fit_curve(
+        self, center: float, domain_width: float, points: int = 100
+    ) -> tuple[np.ndarray, np.ndarray] | None:
+        """Fits the domain around a center and evaluates the fitted gaussian, for previewing a fit.
 
-            fit_func = FitModels.gaussian
-            popt, pcov = curve_fit(fit_func, x, y, p0=initial_guess, bounds=bounds)
+        The fit is the same as that of 'fit_peaks', and is remembered in the same way. Given the center
+        and width, the amplitude and start height follow from a linear least squares fit.
 
-            # extract fitted parameters
-            amp, cen, wid, startheight = popt
-            # fit_errors = np.sqrt(np.diag(pcov))
+        Args:
+            center (float): x-value around which the domain is taken
+            domain_width (float): width of the domain
+            points (int, optional): number of points of the curve. Defaults to 100.
 
-            # get the energy and standard error
-            energy_of_peak = cen
-            standard_error = wid
+        Returns:
+            tuple[np.ndarray, np.ndarray] | None: x and y-values of the fitted curve, or None when the fit failed
+        """
+        peaks = pd.DataFrame({"x_peaks": [center]})
+        energy, width, success = self.fit_peaks(peaks, domain_width).iloc[0]
+        if not success:
+            return None
+
+        starts, stops = self.domain_bounds(centers=[center], width=domain_width)
+        x = self.x[starts[0] : stops[0]]
+        y = self.y[starts[0] : stops[0]]
+        gauss = np.exp(-((x - energy) ** 2) / (2 * width**2))
+        (amp, startheight), *_ = np.linalg.lstsq(
+            np.column_stack([gauss, np.ones_like(x)]), y, rcond=None
+        )
 
-            x_positions.append(energy_of_peak)
-            x_positions_std.append(standard_error)
+        curve_x = np.linspace(x[0], x[-1], points)
+        return curve_x, FitModels.gaussian(curve_x, amp, energy, width, startheight)
 
-        x_positions_df = pd.DataFrame(
-            {
-                "energy": x_positions,
-                "stderr": x_positions_std,
-            }
+    @instrumentation.timed("fit peaks batched")
+    def fit_peaks_batched(
+        self,
+        peaks: pd.DataFrame,
+        domain_width: float,
+        max_iterations: int = 200,
+        tolerance: float = 1e-8,
+        channel: int | str | list[int | str] = 0,
+    ) -> pd.DataFrame:
+        """Performs the gaussian model fits of all peaks together, as one stacked least squares problem.
+
+        The domains are padded into 2-D arrays and solved with a Levenberg-Marquardt loop which
+        updates every peak in the same NumPy operations, so the overhead per call does not grow with the number of peaks.
+
+        Args:
+            peaks (pd.DataFrame): x and y values of peaks, the x values are used as domain centers
+            domain_width (float): width of the domains generated for analysis
+            max_iterations (int, optional): maximum number of iterations before a fit is marked as failed. Defaults to 200.
+            tolerance (float, optional): relative change in the cost or the parameters at which a fit has converged. Defaults to 1e-8.
+            channel (int | str | list[int | str], optional): channel of the peaks, or the channel of every peak, the peaks of
+                all channels are fitted in the same stacked problem. Defaults to 0, the first channel.
+        Returns:
+            pd.DataFrame: x-values of fitted peaks with uncertainties and whether the fit of each peak succeeded
+        """
+        starts, stops = self.domain_bounds(centers=peaks.iloc[:, 0], width=domain_width)
+        channels = self.channel_positions(channel, count=len(starts))
+        keys = [
+            (start, stop, position, "gaussian-batched", max_iterations, tolerance)
+            for start, stop, position in zip(
+                starts.tolist(), stops.tolist(), channels.tolist()
+            )
+        ]
+        results = [self.fit_cache.get(key) for key in keys]
+        missing = [index for index, result in enumerate(results) if result is None]
+
+        # the padding of the domains has zero weight
+        x, y, valid = self.stack_domains(
+            centers=peaks.iloc[missing, 0],
+            width=domain_width,
+            channel=channels[missing],
+        )
+        weights = valid.astype(float)
+        peak_count = len(x)
+
+        # every parameter needs at least one data point
+        active = weights.sum(axis=1) >= 4
+        params = np.ones((peak_count, 4))
+        if active.any():
+            padded_x = np.where(valid[active], x[active], np.nan)
+            padded_y = np.where(valid[active], y[active], np.nan)
+            params[active] = np.column_stack(
+                FitModels.gaussian_guess(padded_x, padded_y)
+            )
+            # the fits start at the detected peaks, like those of 'fit_peaks'
+            params[active, 1] = peaks.iloc[missing, 0].to_numpy(dtype=float)[active]
+
+        def residuals(params: np.ndarray) -> np.ndarray:
+            return (FitModels.gaussian(x, *params.T[:, :, np.newaxis]) - y) * weights
+
+        def keep_in_bounds(params: np.ndarray) -> np.ndarray:
+            # only positive parameters are allowed, the width can not become zero
+            params = np.maximum(params, 0)
+            params[:, 2] = np.maximum(params[:, 2], np.finfo(float).eps)
+            return params
+
+        params = keep_in_bounds(params)
+        residual = residuals(params)
+        cost = np.sum(residual**2, axis=1)
+        damping = np.full(peak_count, 1e-3)
+        converged = np.zeros(peak_count, dtype=bool)
+
+        with np.errstate(all="ignore"):
+            for _ in range(max_iterations):
+                if not active.any():
+                    break
+                instrumentation.count("batched fit iterations")
+
+                jacobian = (
+                    FitModels.gaussian_jacobian(x, *params.T[:, :, np.newaxis])
+                    * weights[:, :, np.newaxis]
+                )
+                # parameters on their bound which want to cross it are kept fixed
+                at_bound = (params <= 0) & (
+                    np.einsum("pmi,pm->pi", jacobian, residual) > 0
+                )
+                jacobian = jacobian * ~at_bound[:, np.newaxis, :]
+                normal_matrix = np.einsum("pmi,pmj->pij", jacobian, jacobian)
+                gradient = np.einsum("pmi,pm->pi", jacobian, residual)
+
+                # Marquardt damping, scaled with the diagonal of the normal matrix
+                diagonal = normal_matrix.diagonal(axis1=1, axis2=2)
+                damped_matrix = normal_matrix + damping[:, np.newaxis, np.newaxis] * (
+                    diagonal[:, :, np.newaxis] * np.eye(4)
+                )
+                step = -np.einsum("pij,pj->pi", np.linalg.pinv(damped_matrix), gradient)
+                step[~active] = 0
+
+                trial_params = keep_in_bounds(params + step)
+                trial_residual = residuals(trial_params)
+                trial_cost = np.sum(trial_residual**2, axis=1)
+
+                improved = active & (trial_cost < cost)
+                small_reduction = improved & (cost - trial_cost <= tolerance * cost)
+                small_step = np.linalg.norm(step, axis=1) <= (
+                    tolerance * (np.linalg.norm(params, axis=1) + tolerance)
+                )
+
+                params[improved] = trial_params[improved]
+                residual[improved] = trial_residual[improved]
+                cost[improved] = trial_cost[improved]
+                damping = np.where(improved, damping / 10, damping * 10)
+
+                newly_converged = active & (small_reduction | small_step)
+                converged |= newly_converged
+                # a fit that keeps rejecting steps will not converge anymore
+                active &= ~newly_converged & (damping < 1e16)
+
+        # a gaussian without amplitude does not describe a peak, a center outside of the domain describes another peak
+        inside = (
+            params[:, 1]
+            >= np.nanmin(np.where(valid, x, np.nan), axis=1, initial=np.inf)
+        ) & (
+            params[:, 1]
+            <= np.nanmax(np.where(valid, x, np.nan), axis=1, initial=-np.inf)
         )
+        success = (
+            converged
+            & np.all(np.isfinite(params), axis=1)
+            & (params[:, 0] > 0)
+            & inside
+        )
+
+        fitted = zip(
+            np.where(success, params[:, 1], np.nan).tolist(),
+            np.where(success, params[:, 2], np.nan).tolist(),
+            success.tolist(),
+        )
+        for index, result in zip(missing, fitted):
+            results[index] = result
+            self.fit_cache.put(keys[index], result)
+        instrumentation.count("fits tried", len(missing))
+        instrumentation.count("fits failed", int(np.sum(~success)))
+        instrumentation.count("fit cache hits", len(keys) - len(missing))
+
+        x_positions_df = pd.DataFrame(
+            results, columns=["energy", "stderr", "success"]
+        ).astype({"energy": float, "stderr": float, "success": bool})
 
         return x_positions_df
 
@@ -147,10 +556,12 @@ class ProcessData:
 
         return scaling_factor, horizontal_offset
 
+    @staticmethod
     def apply_cal_to_data(
-        self, data: pd.DataFrame, scaling_factor: float, horizontal_offset: float
+        data: pd.DataFrame, scaling_factor: float, horizontal_offset: float
     ):
         """Function for applying the calibration to the data.
+        Only the pulse height column is replaced, the count columns are not copied.
 
         Args:
             data (pd.DataFrame): the data that needs to be calibrated
@@ -160,6 +571,7 @@ class ProcessData:
         Returns:
             pd.DataFrame: the calibrated data
         """
-        data.iloc[:, 0] = data.iloc[:, 0] * scaling_factor - horizontal_offset
+        pulseheight = data.iloc[:, 0].to_numpy(dtype=float)
+        data[data.columns[0]] = pulseheight * scaling_factor - horizontal_offset
 
         return data
@@ -0,0 +1,148 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+
+
+def default_cache_dir() -> Path:
+    """Directory of the spectrum cache, inside the cache directory of the user."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "gammaspotter" / "spectra"
+
+
+class SpectrumStore:
+    def __init__(
+        self, cache_dir: str | Path | None = None, max_bytes: int | None = None
+    ) -> None:
+        """Cache of spectrum CSV files converted to memory-mappable binary arrays, so every file only has to be parsed once.
+
+        Every spectrum is stored as a float64 .npy file with a small JSON header, keyed by
+        the path, modification time and size of the CSV file. A changed CSV file gets a new entry.
+
+        Args:
+            cache_dir (str | Path | None, optional): directory of the cache. Defaults to the cache directory of the user.
+            max_bytes (int | None, optional): size of the cache, the least recently used spectra are removed when a new one
+                does not fit. Defaults to None, which never removes spectra of other files.
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def key(self, path: str | Path) -> tuple[str, str]:
+        """Cache key of a CSV file.
+
+        Args:
+            path (str | Path): path of the CSV file
+
+        Returns:
+            tuple[str, str]: prefix which is the same for every version of the file and the full key
+        """
+        path = Path(path).resolve()
+        file_stat = path.stat()
+        prefix = hashlib.sha1(str(path).encode()).hexdigest()
+        return prefix, f"{prefix}-{file_stat.st_mtime_ns}-{file_stat.st_size}"
+
+    def load_array(self, path: str | Path) -> tuple[np.ndarray, list[str]]:
+        """Loads a spectrum as a read-only memory-mapped array, the CSV file is converted on the first load.
+
+        Args:
+            path (str | Path): path of the CSV file
+
+        Returns:
+            tuple[np.ndarray, list[str]]: the values of the spectrum, one column per CSV column, and the column names
+        """
+        prefix, key = self.key(path)
+        array_path = self.cache_dir / f"{key}.npy"
+        header_path = self.cache_dir / f"{key}.json"
+
+        if not (array_path.exists() and header_path.exists()):
+            data = pd.read_csv(path)
+            try:
+                self.write(prefix, key, data, source=path)
+            except OSError:
+                # the cache is optional, a read-only cache directory should not prevent loading
+                return data.to_numpy(dtype=float), data.columns.tolist()
+
+        columns = json.loads(header_path.read_text())["columns"]
+        if self.max_bytes is not None:
+            # the modification time of the header is the last use of the entry
+            try:
+                os.utime(header_path)
+            except OSError:
+                pass
+        return np.load(array_path, mmap_mode="r"), columns
+
+    def load(self, path: str | Path) -> pd.DataFrame:
+        """Loads a spectrum as a DataFrame on top of the memory-mapped array.
+
+        Args:
+            path (str | Path): path of the CSV file
+
+        Returns:
+            pd.DataFrame: the spectrum, with float values
+        """
+        values, columns = self.load_array(path)
+        return pd.DataFrame(values, columns=columns, copy=False)
+
+    def write(self, prefix: str, key: str, data: pd.DataFrame, source: str | Path):
+        """Writes a cache entry and removes the entries of older versions of the same file.
+
+        Args:
+            prefix (str): prefix of the cache key, the same for every version of the file
+            key (str): full cache key
+            data (pd.DataFrame): the parsed spectrum
+            source (str | Path): path of the CSV file, stored in the header
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for old_entry in self.cache_dir.glob(f"{prefix}-*"):
+            if not old_entry.name.startswith(key):
+                old_entry.unlink(missing_ok=True)
+
+        # write to temporary files first, so an interrupted write never leaves a broken entry
+        array_path = self.cache_dir / f"{key}.npy"
+        temporary_array_path = self.cache_dir / f"{key}.tmp.npy"
+        np.save(temporary_array_path, data.to_numpy(dtype=float))
+        os.replace(temporary_array_path, array_path)
+
+        header = {"source": str(Path(source).resolve()), "columns": list(data.columns)}
+        header_path = self.cache_dir / f"{key}.json"
+        temporary_header_path = self.cache_dir / f"{key}.tmp.json"
+        temporary_header_path.write_text(json.dumps(header))
+        os.replace(temporary_header_path, header_path)
+
+        if self.max_bytes is not None:
+            self.evict(keep=key)
+
+    def evict(self, keep: str | None = None) -> None:
+        """Removes the least recently used entries until the cache fits in 'max_bytes'.
+
+        Args:
+            keep (str | None, optional): key of an entry which is never removed, the one that was just written. Defaults to None.
+        """
+        entries = []
+        for header_path in self.cache_dir.glob("*.json"):
+            if header_path.name.endswith(".tmp.json"):
+                continue
+            array_path = header_path.with_suffix(".npy")
+            try:
+                last_use = header_path.stat().st_mtime_ns
+                size = header_path.stat().st_size + array_path.stat().st_size
+            except OSError:
+                continue
+            entries.append((last_use, header_path.stem, size, header_path, array_path))
+
+        total = sum(entry[2] for entry in entries)
+        for _, key, size, header_path, array_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                header_path.unlink(missing_ok=True)
+                array_path.unlink(missing_ok=True)
+            except OSError:
+                # a spectrum that is still memory-mapped can not be removed on every platform
+                continue
+            total -= size
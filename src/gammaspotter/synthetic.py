@@ -0,0 +1,356 @@
+import argparse
+import sys
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from scipy.special import erfc
+
+from gammaspotter.batch import default_catalog_path
+from gammaspotter.list_mode import count_columns
+from gammaspotter.process_data import SPECTRUM_COLUMNS
+
+ELECTRON_MASS = 510.999
+
+TRUTH_COLUMNS = ["nuclide", "energy", "area", "pulseheight", "fwhm"]
+
+
+def compton_edge(energy: np.ndarray) -> np.ndarray:
+    """Highest energy a photon deposits by Compton scattering, in keV."""
+    energy = np.asarray(energy, dtype=float)
+    return energy * (1 - 1 / (1 + 2 * energy / ELECTRON_MASS))
+
+
+def catalog_lines(
+    catalog_data: pd.DataFrame,
+    energy_range: tuple[float, float],
+    count: int | None = None,
+    nuclides: list[str] | None = None,
+    area_range: tuple[float, float] = (1e3, 1e5),
+    seed: int | None = None,
+) -> pd.DataFrame:
+    """Picks gamma lines from an isotope catalog to put in a synthetic spectrum.
+
+    Either every line of the given nuclides is used, with areas in proportion to the yield
+    of the lines, or a number of random lines is drawn with log-uniform areas.
+
+    Args:
+        catalog_data (pd.DataFrame): catalog with the energies in the first column and the isotopes in the second column, the yield in percent is read from a 'Percent Yield per decay' column if there is one.
+        energy_range (tuple[float, float]): lowest and highest energy of the spectrum, lines outside of it are skipped
+        count (int | None, optional): number of random lines. Defaults to None, which uses every line in the energy range.
+        nuclides (list[str] | None, optional): nuclides to take every line from. Defaults to None.
+        area_range (tuple[float, float], optional): smallest and largest number of counts in a peak. Defaults to (1e3, 1e5).
+        seed (int | None, optional): seed of the random number generator. Defaults to None.
+
+    Returns:
+        pd.DataFrame: one row per line with the nuclide, the energy in keV and the number of counts in the peak
+    """
+    rng = np.random.default_rng(seed)
+    energies = catalog_data.iloc[:, 0].to_numpy(dtype=float)
+    inside = (energies > energy_range[0]) & (energies < energy_range[1])
+    lines = pd.DataFrame(
+        {
+            "nuclide": catalog_data.iloc[:, 1].to_numpy()[inside],
+            "energy": energies[inside],
+        }
+    )
+
+    if nuclides is not None:
+        if "Percent Yield per decay" in catalog_data.columns:
+            yields = catalog_data["Percent Yield per decay"].to_numpy(dtype=float)
+        else:
+            yields = np.full(len(catalog_data), 100.0)
+        lines["area"] = yields[inside] / 100 * area_range[1]
+        lines = lines[lines["nuclide"].isin(nuclides)]
+    else:
+        if count is not None:
+            if count > len(lines):
+                raise ValueError(
+                    f"The catalog has only {len(lines)} lines in the energy range."
+                )
+            lines = lines.iloc[np.sort(rng.choice(len(lines), count, replace=False))]
+        lines["area"] = np.exp(rng.uniform(*np.log(area_range), len(lines)))
+
+    return lines.sort_values("energy").reset_index(drop=True)
+
+
+class SpectrumGenerator:
+    def __init__(
+        self,
+        channels: int = 1024,
+        energy_range: tuple[float, float] = (0.0, 3000.0),
+        resolution: float = 0.07,
+        reference_energy: float = 661.7,
+        background: float = 50.0,
+        background_slope: float = 1000.0,
+        compton_fraction: float = 2.0,
+        scaling_factor: float = 1.0,
+        horizontal_offset: float = 0.0,
+        channel_count: int = 1,
+    ) -> None:
+        """Generator of synthetic spectra in the layout of a PicoScope CSV file, with known peak energies.
+
+        A spectrum is the sum of a gaussian peak for every gamma line, the Compton continuum of every line
+        and an exponentially falling background, with Poisson noise on every channel.
+        The FWHM of the peaks grows with the square root of the energy, like in a scintillation detector.
+
+        The pulse heights are the energies converted with the inverse of a calibration, so generating
+        with a scaling factor and offset gives an uncalibrated spectrum that the calibration turns back into keV.
+
+        Args:
+            channels (int, optional): number of bins of the spectrum. Defaults to 1024.
+            energy_range (tuple[float, float], optional): lowest and highest energy of the spectrum in keV. Defaults to (0.0, 3000.0).
+            resolution (float, optional): FWHM as a fraction of the reference energy, at the reference energy. Defaults to 0.07.
+            reference_energy (float, optional): energy at which the resolution is given in keV. Defaults to 661.7.
+            background (float, optional): background counts per keV at zero energy. Defaults to 50.0.
+            background_slope (float, optional): energy in keV over which the background falls by a factor e. Defaults to 1000.0.
+            compton_fraction (float, optional): counts in the Compton continuum of a line relative to the counts in its peak. Defaults to 2.0.
+            scaling_factor (float, optional): conversion factor of the calibration that turns the pulse heights into keV. Defaults to 1.0.
+            horizontal_offset (float, optional): energy offset of that calibration. Defaults to 0.0.
+            channel_count (int, optional): number of detector channels, each with its own noise. Defaults to 1.
+        """
+        self.channels = channels
+        self.energy_range = energy_range
+        self.resolution = resolution
+        self.reference_energy = reference_energy
+        self.background = background
+        self.background_slope = background_slope
+        self.compton_fraction = compton_fraction
+        self.scaling_factor = scaling_factor
+        self.horizontal_offset = horizontal_offset
+        self.channel_count = channel_count
+
+        low, high = energy_range
+        self.bin_width = (high - low) / channels
+        # the energy at the center of every bin
+        self.energies = low + (np.arange(channels) + 0.5) * self.bin_width
+
+    def fwhm(self, energy: np.ndarray) -> np.ndarray:
+        """FWHM of a peak at the given energy in keV."""
+        energy = np.asarray(energy, dtype=float)
+        return (
+            self.resolution
+            * self.reference_energy
+            * np.sqrt(np.clip(energy, 0, None) / self.reference_energy)
+        )
+
+    def pulseheight(self, energy: np.ndarray) -> np.ndarray:
+        """Pulse height which the calibration of the generator converts to the given energy."""
+        return (np.asarray(energy, dtype=float) + self.horizontal_offset) / (
+            self.scaling_factor
+        )
+
+    def expected_counts(self, lines: pd.DataFrame) -> np.ndarray:
+        """Noiseless counts of every bin for the given gamma lines.
+
+        Args:
+            lines (pd.DataFrame): gamma lines with an 'energy' column in keV and an 'area' column with the number of counts in the peak
+
+        Returns:
+            np.ndarray: the expected counts of every bin
+        """
+        x = self.energies
+        counts = self.background * np.exp(-x / self.background_slope) * self.bin_width
+        plateau = np.zeros(len(x) + 1)
+
+        for energy, area in zip(lines["energy"], lines["area"]):
+            sigma = self.fwhm(energy) / (2 * np.sqrt(2 * np.log(2)))
+            # only the bins near the peak are computed, which keeps many peaks on many channels fast
+            start, stop = np.searchsorted(x, [energy - 8 * sigma, energy + 8 * sigma])
+            counts[start:stop] += (
+                area
+                * self.bin_width
+                / (sigma * np.sqrt(2 * np.pi))
+                * np.exp(-((x[start:stop] - energy) ** 2) / (2 * sigma**2))
+            )
+
+            # a flat continuum up to the Compton edge, smeared out by the resolution near the edge
+            edge = compton_edge(energy)
+            edge_sigma = self.fwhm(edge) / (2 * np.sqrt(2 * np.log(2)))
+            height = self.compton_fraction * area * self.bin_width / edge
+            start, stop = np.searchsorted(
+                x, [edge - 8 * edge_sigma, edge + 8 * edge_sigma]
+            )
+            plateau[start] += height
+            counts[start:stop] += (
+                height * 0.5 * erfc((x[start:stop] - edge) / (np.sqrt(2) * edge_sigma))
+            )
+
+        # every plateau covers the bins below the start of its edge
+        counts += np.cumsum(plateau[::-1])[::-1][1:]
+
+        return counts
+
+    def generate(
+        self, lines: pd.DataFrame, seed: int | None = None
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Generates a spectrum with Poisson noise and the ground truth of its peaks.
+
+        Args:
+            lines (pd.DataFrame): gamma lines with an 'energy' column in keV and an 'area' column with the number of counts in the peak, a 'nuclide' column is copied to the ground truth
+            seed (int | None, optional): seed of the random number generator. Defaults to None.
+
+        Returns:
+            tuple[pd.DataFrame, pd.DataFrame]: the spectrum in the layout of a PicoScope CSV file, and every line with its nuclide, energy, area, pulse height and FWHM
+        """
+        rng = np.random.default_rng(seed)
+        expected = self.expected_counts(lines)
+
+        columns = count_columns(self.channel_count)
+        data = pd.DataFrame(
+            {SPECTRUM_COLUMNS[0]: self.pulseheight(self.energies)}
+            | {
+                column: (
+                    rng.poisson(expected)
+                    if channel < self.channel_count
+                    else np.zeros(self.channels, dtype=np.int64)
+                )
+                for channel, column in enumerate(columns)
+            }
+        )
+
+        truth = pd.DataFrame(
+            {
+                "nuclide": (
+                    lines["nuclide"].to_numpy()
+                    if "nuclide" in lines.columns
+                    else [""] * len(lines)
+                ),
+                "energy": lines["energy"].to_numpy(dtype=float),
+                "area": lines["area"].to_numpy(dtype=float),
+            },
+            columns=TRUTH_COLUMNS,
+        )
+        truth["pulseheight"] = self.pulseheight(truth["energy"])
+        truth["fwhm"] = self.fwhm(truth["energy"])
+        return data, truth
+
+
+def generate_files(
+    output_dir: str | Path,
+    file_count: int,
+    generator: SpectrumGenerator,
+    catalog_data: pd.DataFrame,
+    line_count: int = 10,
+    area_range: tuple[float, float] = (1e3, 1e5),
+    seed: int = 0,
+) -> pd.DataFrame:
+    """Writes synthetic spectra with random catalog lines to a directory.
+
+    Every file gets its own lines and noise, and the same seed writes the same files.
+
+    Args:
+        output_dir (str | Path): directory to write the spectra to
+        file_count (int): number of spectra
+        generator (SpectrumGenerator): generator with the channels, resolution and calibration of the spectra
+        catalog_data (pd.DataFrame): catalog to draw the lines from
+        line_count (int, optional): number of lines in every spectrum. Defaults to 10.
+        area_range (tuple[float, float], optional): smallest and largest number of counts in a peak. Defaults to (1e3, 1e5).
+        seed (int, optional): seed of the first spectrum, the others count up from it. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: the ground truth of every file, with the file name in a 'file' column
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    truths = []
+    for number in range(file_count):
+        lines = catalog_lines(
+            catalog_data,
+            generator.energy_range,
+            count=line_count,
+            area_range=area_range,
+            seed=seed + number,
+        )
+        data, truth = generator.generate(lines, seed=seed + number)
+
+        file_name = f"synthetic_{number:05d}.csv"
+        data.to_csv(output_dir / file_name, index=False)
+        truth.insert(0, "file", file_name)
+        truths.append(truth)
+
+    return pd.concat(truths, ignore_index=True)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="gammaspotter-synthetic",
+        description="Write synthetic spectra with known peak energies for load and accuracy tests.",
+    )
+    parser.add_argument("output_dir", help="directory to write the spectra to")
+    parser.add_argument(
+        "-n",
+        "--files",
+        type=int,
+        default=100,
+        help="number of spectra (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--channels",
+        type=int,
+        default=1024,
+        help="number of bins of every spectrum (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--lines",
+        type=int,
+        default=10,
+        help="number of catalog lines in every spectrum (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-c",
+        "--catalog",
+        default=None,
+        help="isotope catalog CSV to draw the lines from, defaults to gamma-energies-common.csv",
+    )
+    parser.add_argument(
+        "--max-energy",
+        type=float,
+        default=3000,
+        help="highest energy of the spectra in keV (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--resolution",
+        type=float,
+        default=0.07,
+        help="FWHM as a fraction of the energy at 661.7 keV (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--truth",
+        default=None,
+        help="CSV file to write the ground truth to, defaults to truth.csv next to the output directory",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed of the first spectrum"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+
+    generator = SpectrumGenerator(
+        channels=args.channels,
+        energy_range=(0, args.max_energy),
+        resolution=args.resolution,
+    )
+    catalog_data = pd.read_csv(args.catalog or default_catalog_path())
+    truth = generate_files(
+        args.output_dir,
+        args.files,
+        generator,
+        catalog_data,
+        line_count=args.lines,
+        seed=args.seed,
+    )
+
+    # the ground truth is kept out of the output directory, so it is not analyzed as a spectrum
+    output_dir = Path(args.output_dir).resolve()
+    truth_path = args.truth or output_dir.parent / f"{output_dir.name}_truth.csv"
+    truth.to_csv(truth_path, index=False)
+    print(f"Wrote {args.files} spectra to {output_dir}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
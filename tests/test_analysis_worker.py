@@ -0,0 +1,90 @@
+import os
+import threading
+import unittest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+from gammaspotter.analysis_worker import AnalysisWorker
+
+
+class TestAnalysisWorker(unittest.TestCase):
+    def setUp(self):
+        # a widget application, so the plot tests in the same run can use it
+        self.app = QApplication.instance() or QApplication([])
+        self.worker = AnalysisWorker()
+
+    def wait(self):
+        self.worker.pool.waitForDone()
+        self.app.processEvents()
+
+    def test_submit(self):
+        results = []
+        progress = []
+        self.worker.progress.connect(lambda *args: progress.append(args))
+
+        def job(value, progress):
+            progress(1, 1)
+            return value * 2
+
+        self.worker.submit(
+            "job",
+            job,
+            21,
+            on_finished=lambda result: results.append(
+                (result, threading.current_thread() is threading.main_thread())
+            ),
+        )
+        self.wait()
+        self.assertEqual(results, [(42, True)])
+        self.assertEqual(progress, [("job", 0, 0), ("job", 1, 1)])
+        self.assertFalse(self.worker.is_running("job"))
+
+    def test_silent_job(self):
+        results = []
+        progress = []
+        self.worker.progress.connect(lambda *args: progress.append(args))
+        self.worker.submit(
+            "job", lambda progress: 1, on_finished=results.append, silent=True
+        )
+        self.wait()
+        self.assertEqual(results, [1])
+        self.assertEqual(progress, [])
+
+    def test_replace_stale_job(self):
+        started = threading.Event()
+        release = threading.Event()
+        results = []
+
+        def slow_job(progress):
+            started.set()
+            release.wait()
+            progress(1, 2)
+            return "stale"
+
+        self.worker.submit("job", slow_job, on_finished=results.append)
+        started.wait()
+        self.worker.submit("job", lambda progress: "latest", on_finished=results.append)
+        release.set()
+        self.wait()
+        self.assertEqual(results, ["latest"])
+
+    def test_failure(self):
+        messages = []
+        self.worker.submit("job", lambda progress: 1 / 0, on_failed=messages.append)
+        self.wait()
+        self.assertEqual(messages, ["division by zero"])
+
+    def test_cancel_finished_job(self):
+        results = []
+        self.worker.submit("job", lambda progress: 1, on_finished=results.append)
+        # the job ran, but its signals were not delivered yet
+        self.worker.pool.waitForDone()
+        self.worker.cancel_all()
+        self.app.processEvents()
+        self.assertEqual(results, [])
+        self.assertEqual(self.worker.active, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from gammaspotter.auto_calibration import (
+    AutoCalibration,
+    CalibrationResult,
+    reference_energies,
+)
+from gammaspotter.batch import default_catalog_path
+from gammaspotter.process_data import ProcessData
+from gammaspotter.synthetic import SpectrumGenerator, catalog_lines
+
+
+class TestAutoCalibration(unittest.TestCase):
+    def setUp(self):
+        self.catalog_data = pd.read_csv(default_catalog_path())
+        self.nuclides = ["Na-22", "Cs-137", "Co-60"]
+
+    def test_reference_energies(self):
+        np.testing.assert_allclose(
+            reference_energies(self.catalog_data, ["Co-60", "Na-22"]),
+            [511.0034, 1173.2, 1274.5, 1332.5],
+        )
+        with self.assertRaises(ValueError):
+            reference_energies(self.catalog_data, ["Na-22", "Xx-1"])
+
+    def test_fit(self):
+        lines = np.array([80, 356, 511, 662, 1173, 1333])
+        # energy = -20 + 4 * pulseheight + 0.0002 * pulseheight^2, with two peaks that are not on any line
+        positions = (-4 + np.sqrt(16 + 4 * 0.0002 * (lines + 20))) / (2 * 0.0002)
+        positions = np.sort(np.r_[positions, 7, 45])
+        widths = np.full(len(positions), 0.5)
+
+        linear = AutoCalibration(lines).fit(positions, widths)
+        self.assertEqual(linear.degree, 1)
+        self.assertGreaterEqual(len(linear.matches), 5)
+        self.assertGreater(linear.chi_squared, 1)
+
+        quadratic = AutoCalibration(lines, degree=2).fit(positions, widths)
+        self.assertEqual(quadratic.matches["energy"].tolist(), lines.tolist())
+        np.testing.assert_allclose(quadratic.matches["residual"], 0, atol=1e-6)
+        np.testing.assert_allclose(quadratic.coefficients, [-20, 4, 0.0002], atol=1e-6)
+        # the uncertainty of a calibration without residuals comes from the peak widths alone
+        self.assertTrue((quadratic.uncertainties > 0).all())
+
+        result = CalibrationResult.from_dict(quadratic.to_dict())
+        np.testing.assert_allclose(
+            result.energy([10, 100]), quadratic.energy([10, 100])
+        )
+        with self.assertRaises(ValueError):
+            quadratic.scaling_factor
+
+    def test_no_assignment(self):
+        with self.assertRaises(ValueError):
+            AutoCalibration([100, 200, 300], min_matches=3).fit(
+                positions=[1, 2, 10], widths=[1, 1, 1]
+            )
+
+    def test_calibrate(self):
+        # a resolution at which the lines of Co-60 and Na-22 around 1300 keV do not overlap
+        generator = SpectrumGenerator(
+            channels=4096, resolution=0.03, scaling_factor=2.0, horizontal_offset=10.0
+        )
+        lines = catalog_lines(self.catalog_data, (0, 3000), nuclides=self.nuclides)
+        data, _ = generator.generate(lines, seed=2)
+        auto_calibration = AutoCalibration.from_catalog(
+            self.catalog_data, self.nuclides
+        )
+        calibration = auto_calibration.calibrate(ProcessData(data), domain_width=20)
+
+        self.assertEqual(
+            calibration.matches["energy"].tolist(),
+            [511.0034, 661.64, 1173.2, 1274.5, 1332.5],
+        )
+        self.assertAlmostEqual(calibration.scaling_factor, 2.0, delta=0.01)
+        self.assertAlmostEqual(calibration.horizontal_offset, 10.0, delta=3)
+        self.assertLess(calibration.energy_uncertainty(661.7 / 2), 1)
+
+        calibrated = calibration.apply(data.copy())
+        np.testing.assert_allclose(
+            calibrated["pulseheight"], data["pulseheight"] * 2.0 - 10.0, atol=3
+        )
+
+    def test_example_data(self):
+        data = pd.read_csv("example_data/Na-22 Cs-137 Ba-133.csv")
+        calibration = AutoCalibration.from_catalog(
+            self.catalog_data, ["Na-22", "Cs-137", "Ba-133"]
+        ).calibrate(ProcessData(data), domain_width=3)
+        self.assertEqual(
+            calibration.matches["energy"].tolist(), [511.0034, 661.64, 1274.5]
+        )
+        self.assertAlmostEqual(calibration.scaling_factor, 26.7, delta=0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
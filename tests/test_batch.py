@@ -0,0 +1,102 @@
+import os
+import json
+import pstats
+import unittest
+import tempfile
+import pandas as pd
+
+from unittest import mock
+from pathlib import Path
+from gammaspotter.batch import collect_files, default_catalog_path, main, run_batch
+
+EXAMPLE_FILES = sorted(Path("example_data").glob("*.csv"))
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        # the compiled catalog is kept out of the cache of the user
+        environment = mock.patch.dict(
+            os.environ, {"XDG_CACHE_HOME": self.directory.name}
+        )
+        environment.start()
+        self.addCleanup(environment.stop)
+
+        self.broken_file = Path(self.directory.name) / "broken.csv"
+        # pandas can not read an empty file
+        self.broken_file.write_text("")
+        self.settings = dict(
+            catalog_path=default_catalog_path(), prominence=40, domain_width=20
+        )
+
+    def test_collect_files(self):
+        directory = Path(self.directory.name)
+        (directory / "notes.txt").write_text("")
+        (directory / "sub").mkdir()
+        (directory / "sub" / "a.csv").write_text("")
+        (directory / "sub" / "b.csv").write_text("")
+
+        files = collect_files(
+            [
+                str(directory),
+                str(directory / "sub" / "*.csv"),
+                str(directory / "sub" / "b.csv"),
+                str(directory / "missing*.csv"),
+            ]
+        )
+        # only CSV files, without duplicates, in the order of the patterns
+        self.assertEqual(
+            files,
+            [
+                self.broken_file,
+                directory / "sub" / "a.csv",
+                directory / "sub" / "b.csv",
+            ],
+        )
+
+    def test_run_batch(self):
+        files = EXAMPLE_FILES + [self.broken_file]
+        results, failures = run_batch(files=files, workers=1, **self.settings)
+        parallel_results, parallel_failures = run_batch(
+            files=files, workers=2, **self.settings
+        )
+
+        self.assertEqual(list(failures), [self.broken_file])
+        self.assertEqual(list(parallel_failures), [self.broken_file])
+        self.assertEqual(
+            results["File"].unique().tolist(), list(map(str, EXAMPLE_FILES))
+        )
+        self.assertTrue(results["Fit Success"].any())
+        pd.testing.assert_frame_equal(results, parallel_results)
+
+    def test_main(self):
+        directory = Path(self.directory.name)
+        stats_path = directory / "stats.json"
+        profile_path = directory / "analysis.prof"
+        output_path = directory / "results.csv"
+
+        with mock.patch("sys.stderr"), self.assertRaises(SystemExit) as exit:
+            main(
+                [str(EXAMPLE_FILES[0]), str(self.broken_file)]
+                + ["-p", "40", "-w", "20", "-o", str(output_path)]
+                + ["--stats", str(stats_path), "--profile", str(profile_path)]
+            )
+        # the failed file makes the command fail, the other results are still written
+        self.assertEqual(exit.exception.code, 1)
+        results = pd.read_csv(output_path)
+        self.assertEqual(results["File"].unique().tolist(), [str(EXAMPLE_FILES[0])])
+
+        stats = json.loads(stats_path.read_text())
+        self.assertIn("fit peaks", stats["stages"])
+        self.assertGreater(stats["counters"]["peaks found"], 0)
+        self.assertGreater(pstats.Stats(str(profile_path)).total_calls, 0)
+
+    def test_no_files(self):
+        with self.assertRaises(SystemExit) as exit:
+            main([str(Path(self.directory.name) / "missing" / "*.csv")])
+        self.assertEqual(exit.exception.code, "No CSV files found.")
+
+
+if __name__ == "__main__":
+    unittest.main()
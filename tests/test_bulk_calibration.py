@@ -0,0 +1,115 @@
+import json
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from gammaspotter.bulk_calibration import (
+    run_calibration,
+    calibrate_file,
+    calibrated_path,
+)
+from gammaspotter.auto_calibration import AutoCalibration, CalibrationResult
+from gammaspotter.process_data import ProcessData
+
+
+class TestBulkCalibration(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.files = []
+        for number in range(3):
+            file_path = Path(self.directory.name) / f"measurement_{number}.csv"
+            pd.DataFrame(
+                {"pulseheight": [0.5, 1.5], "counts_ch_A": [1, 2], "counts_ch_B": 0}
+            ).to_csv(file_path, index=False)
+            self.files.append(file_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_run_calibration(self):
+        missing_file = Path(self.directory.name) / "missing.csv"
+        progress = []
+        written, failures = run_calibration(
+            files=self.files + [missing_file],
+            scaling_factor=2,
+            horizontal_offset=1,
+            workers=1,
+            progress=lambda done, total: progress.append((done, total)),
+        )
+        self.assertEqual(list(failures), [missing_file])
+        self.assertEqual(progress[-1], (4, 4))
+
+        calibrated_file = written[self.files[0]]
+        self.assertEqual(calibrated_file, calibrated_path(self.files[0]))
+        self.assertEqual(calibrated_file.name, "measurement_0_calibrated.csv")
+        calibrated_data = pd.read_csv(calibrated_file)
+        self.assertEqual(calibrated_data["pulseheight"].tolist(), [0, 2])
+        self.assertEqual(calibrated_data["counts_ch_A"].tolist(), [1, 2])
+        # no temporary files are left behind
+        self.assertEqual(len(list(Path(self.directory.name).iterdir())), 6)
+
+    def test_output_dir(self):
+        output_dir = Path(self.directory.name) / "calibrated"
+        written, failures = run_calibration(
+            files=self.files,
+            scaling_factor=2,
+            horizontal_offset=1,
+            output_dir=output_dir,
+            workers=2,
+        )
+        self.assertEqual(failures, {})
+        self.assertEqual(len(list(output_dir.glob("*_calibrated.csv"))), 3)
+
+    def test_chunked_calibration(self):
+        file_path = Path(self.directory.name) / "long_acquisition.csv"
+        data = pd.DataFrame(
+            {
+                "pulseheight": np.linspace(0, 5000, 1001),
+                "counts_ch_A": np.arange(1001),
+                "counts_ch_B": 0,
+            }
+        )
+        # an empty cell in the last chunk turns the whole column into floats
+        data["counts_ch_B"] = data["counts_ch_B"].astype(object)
+        data.loc[1000, "counts_ch_B"] = None
+        data.to_csv(file_path, index=False)
+
+        expected = ProcessData.apply_cal_to_data(
+            pd.read_csv(file_path), scaling_factor=0.37, horizontal_offset=4.2
+        ).to_csv(index=False)
+        calibrated_file = calibrate_file(
+            file_path, scaling_factor=0.37, horizontal_offset=4.2, chunk_size=100
+        )
+        self.assertEqual(calibrated_file.read_text(), expected)
+
+    def test_auto_calibration(self):
+        file_path = Path(self.directory.name) / "mixed.csv"
+        pd.read_csv("example_data/Na-22 Cs-137 Ba-133.csv").to_csv(
+            file_path, index=False
+        )
+        written, failures = run_calibration(
+            files=[file_path, self.files[0]],
+            scaling_factor=None,
+            horizontal_offset=None,
+            workers=1,
+            auto_calibration=AutoCalibration([356, 511.0034, 661.64, 1274.5]),
+            domain_width=3,
+        )
+        # the measurement without peaks can not be calibrated
+        self.assertEqual(list(failures), [self.files[0]])
+
+        calibration = CalibrationResult.from_dict(
+            json.loads(written[file_path].with_suffix(".json").read_text())
+        )
+        calibrated = pd.read_csv(written[file_path])
+        original = pd.read_csv(file_path)
+        np.testing.assert_allclose(
+            calibrated["pulseheight"], calibration.energy(original["pulseheight"])
+        )
+        self.assertAlmostEqual(calibration.scaling_factor, 26.7, delta=0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
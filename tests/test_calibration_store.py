@@ -0,0 +1,173 @@
+import os
+import json
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from datetime import datetime
+from gammaspotter.auto_calibration import CalibrationResult
+from gammaspotter.batch import default_catalog_path, run_batch
+from gammaspotter.bulk_calibration import calibrate_file
+from gammaspotter.calibration_store import CalibrationStore
+
+
+class TestCalibrationStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = CalibrationStore(Path(self.directory.name) / "calibrations")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_history(self):
+        self.assertEqual(self.store.detectors(), [])
+        with self.assertRaises(ValueError):
+            self.store.load("NaI/1")
+
+        self.store.save(
+            "NaI/1", CalibrationResult.linear(2.0, 10.0), datetime(2024, 3, 1)
+        )
+        self.store.save(
+            "NaI/1", CalibrationResult.linear(2.1, 12.0), datetime(2024, 1, 1)
+        )
+        self.store.save("HPGe", CalibrationResult.linear(0.5, 1.0))
+
+        self.assertEqual(self.store.detectors(), ["HPGe", "NaI/1"])
+        self.assertEqual(
+            [profile["timestamp"] for profile in self.store.history("NaI/1")],
+            ["2024-01-01T00:00:00", "2024-03-01T00:00:00"],
+        )
+        self.assertEqual(self.store.load("NaI/1").scaling_factor, 2.0)
+        # a measurement is calibrated with the calibration that was valid when it was made
+        self.assertEqual(
+            self.store.load("NaI/1", at=datetime(2024, 2, 1)).scaling_factor, 2.1
+        )
+        with self.assertRaises(ValueError):
+            self.store.load("NaI/1", at=datetime(2023, 1, 1))
+
+        # a new calibration with the same time replaces the old one
+        self.store.save(
+            "NaI/1", CalibrationResult.linear(3.0, 0.0), datetime(2024, 3, 1)
+        )
+        self.assertEqual(len(self.store.history("NaI/1")), 2)
+        self.assertEqual(self.store.load("NaI/1").scaling_factor, 3.0)
+
+    def test_detector_names(self):
+        # names that only differ in characters which can not be in a file name keep their own history
+        self.store.save("HPGe 1", CalibrationResult.linear(1.0, 0.0))
+        self.store.save("HPGe/1", CalibrationResult.linear(2.0, 0.0))
+        self.store.save("HPGe_1", CalibrationResult.linear(3.0, 0.0))
+        self.assertEqual(self.store.detectors(), ["HPGe 1", "HPGe/1", "HPGe_1"])
+        self.assertEqual(self.store.load("HPGe 1").scaling_factor, 1.0)
+        self.assertEqual(self.store.load("HPGe/1").scaling_factor, 2.0)
+        self.assertEqual(self.store.load("HPGe_1").scaling_factor, 3.0)
+        self.assertEqual(self.store.path("../HPGe").parent, self.store.profile_dir)
+        with self.assertRaises(ValueError):
+            self.store.path(" ")
+
+    def test_legacy_file(self):
+        # profiles saved by older versions under the name with '_' for unsafe characters are still read
+        self.store.profile_dir.mkdir(parents=True)
+        legacy_path = self.store.profile_dir / "NaI_1.json"
+        legacy_path.write_text(
+            json.dumps(
+                {
+                    "detector": "NaI 1",
+                    "profiles": [
+                        {
+                            "timestamp": "2024-01-01T00:00:00",
+                            "source": "",
+                            "calibration": CalibrationResult.linear(2.0, 1.0).to_dict(),
+                        }
+                    ],
+                }
+            )
+        )
+        self.assertEqual(self.store.load("NaI 1").scaling_factor, 2.0)
+        self.assertEqual(self.store.history("NaI/1"), [])
+
+        self.store.save(
+            "NaI 1", CalibrationResult.linear(3.0, 0.0), datetime(2024, 2, 1)
+        )
+        self.assertFalse(legacy_path.exists())
+        self.assertEqual(len(self.store.history("NaI 1")), 2)
+        self.assertEqual(self.store.detectors(), ["NaI 1"])
+
+    def test_batch_with_profile(self):
+        # analyzing a raw measurement with a profile gives the results of its calibrated copy
+        file_path = Path(self.directory.name) / "Na-22.csv"
+        pd.read_csv("example_data/Na-22.csv").to_csv(file_path, index=False)
+        calibrated_file = calibrate_file(
+            file_path, scaling_factor=26.9, horizontal_offset=33.8
+        )
+        settings = dict(
+            catalog_path=default_catalog_path(),
+            prominence=40,
+            domain_width=20,
+            workers=1,
+        )
+
+        self.store.save("NaI", CalibrationResult.linear(26.9, 33.8))
+        results, failures = run_batch(
+            files=[file_path], calibration=self.store.load("NaI"), **settings
+        )
+        expected, _ = run_batch(files=[calibrated_file], **settings)
+
+        self.assertEqual(failures, {})
+        np.testing.assert_allclose(results["Energy"], expected["Energy"])
+        self.assertEqual(results["Isotope"].tolist(), expected["Isotope"].tolist())
+
+    def test_profile_per_file(self):
+        # two measurements of the same source, made before and after the gain of the detector changed
+        directory = Path(self.directory.name)
+        raw_data = pd.read_csv("example_data/Na-22.csv")
+        files = [directory / "january.csv", directory / "march.csv"]
+        for file_path, written in zip(
+            files, [datetime(2024, 1, 15), datetime(2024, 3, 15)]
+        ):
+            raw_data.to_csv(file_path, index=False)
+            os.utime(file_path, (written.timestamp(), written.timestamp()))
+
+        self.store.save(
+            "NaI", CalibrationResult.linear(26.9, 33.8), datetime(2024, 1, 1)
+        )
+        self.store.save(
+            "NaI", CalibrationResult.linear(30.0, 0.0), datetime(2024, 3, 1)
+        )
+        self.assertEqual(self.store.load_for_file("NaI", files[0]).scaling_factor, 26.9)
+        self.assertEqual(self.store.load_for_file("NaI", files[1]).scaling_factor, 30.0)
+        # a measurement from before the first calibration gets the first calibration
+        os.utime(files[0], (datetime(2023, 6, 1).timestamp(),) * 2)
+        self.assertEqual(self.store.load_for_file("NaI", files[0]).scaling_factor, 26.9)
+
+        settings = dict(
+            catalog_path=default_catalog_path(), prominence=40, domain_width=20
+        )
+        for workers in [1, 2]:
+            results, failures = run_batch(
+                files=files,
+                detector="NaI",
+                calibration_dir=self.store.profile_dir,
+                workers=workers,
+                **settings,
+            )
+            self.assertEqual(failures, {})
+            for file_path, scaling_factor, offset in zip(
+                files, [26.9, 30.0], [33.8, 0.0]
+            ):
+                expected, _ = run_batch(
+                    files=[file_path],
+                    calibration=CalibrationResult.linear(scaling_factor, offset),
+                    workers=1,
+                    **settings,
+                )
+                np.testing.assert_allclose(
+                    results.loc[results["File"] == str(file_path), "Energy"],
+                    expected["Energy"],
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
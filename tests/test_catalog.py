@@ -0,0 +1,139 @@
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from unittest import mock
+from gammaspotter.catalog import Catalog, checksum, main
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.catalog = Catalog(
+            pd.DataFrame(
+                {
+                    "energy": [1460, 511, 1274.5, 661.64, 511],
+                    "isotope": ["K-40", "Na-22", "Na-22", "Cs-137", "Cu-64"],
+                }
+            )
+        )
+
+    def test_sorted(self):
+        self.assertEqual(
+            self.catalog.energies.tolist(), [511, 511, 661.64, 1274.5, 1460]
+        )
+        self.assertEqual(
+            self.catalog.isotopes.tolist(),
+            ["Na-22", "Cu-64", "Cs-137", "Na-22", "K-40"],
+        )
+        self.assertEqual(self.catalog.positions.tolist(), [1, 4, 3, 2, 0])
+
+    def test_window(self):
+        starts, stops = self.catalog.window([515, 1300], [2, 10], n_sigma=2)
+        self.assertEqual(starts.tolist(), [0, 4])
+        self.assertEqual(stops.tolist(), [2, 4])
+
+    def test_candidates(self):
+        rows, entries = self.catalog.candidates([515, 1300], [2, 10], n_sigma=3)
+        self.assertEqual(rows.tolist(), [0, 0, 1])
+        self.assertEqual(entries.tolist(), [0, 1, 3])
+
+        rows, entries = self.catalog.candidates([515], [2], n_sigma=None)
+        self.assertEqual(entries.tolist(), [0, 1, 2, 3, 4])
+
+    def test_duplicates(self):
+        catalog = Catalog(
+            pd.DataFrame(
+                {
+                    "energy": [1173.2, 1332.5, 1173.2, 59.5],
+                    "isotope": ["Co-60", "Co-60", "Co-60", "Am-241"],
+                    "Half-Life": [5.27, 5.27, 5.27, 432.6],
+                    "Half-Life Unit": ["years", "years", "years", "years"],
+                    "Percent Yield per decay": [99.85, 99.98, 99.85, 35.9],
+                }
+            )
+        )
+        # the line listed twice is kept once, with the first listing
+        self.assertEqual(catalog.duplicates, 1)
+        self.assertEqual(catalog.energies.tolist(), [59.5, 1173.2, 1332.5])
+        self.assertEqual(catalog.positions.tolist(), [3, 0, 1])
+        self.assertEqual(catalog.nuclides.tolist(), ["Am-241", "Co-60"])
+        self.assertEqual(catalog.codes.dtype, np.uint8)
+        self.assertAlmostEqual(catalog.half_lives[1], 5.27 * 365.25 * 86400)
+        self.assertEqual(catalog.yields.tolist(), [35.9, 99.85, 99.98])
+        # catalogs without half-lives still load
+        self.assertTrue(np.isnan(self.catalog.half_lives).all())
+
+    def test_missing_nuclide(self):
+        catalog = Catalog(
+            pd.DataFrame(
+                {
+                    "energy": [1460, 88.0, 511],
+                    "isotope": ["K-40", np.nan, "Na-22"],
+                }
+            )
+        )
+        # a blank nuclide is left out, not reported as one of the other nuclides
+        self.assertEqual(catalog.energies.tolist(), [511, 1460])
+        self.assertEqual(catalog.isotopes.tolist(), ["Na-22", "K-40"])
+        self.assertEqual(catalog.positions.tolist(), [2, 0])
+        self.assertEqual(catalog.duplicates, 0)
+
+    def test_compiled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = Path(directory) / "catalog.csv"
+            pd.DataFrame(
+                {
+                    "energy": [1460, 511, 1274.5, 661.64, 511, 511],
+                    "isotope": ["K-40", "Na-22", "Na-22", "Cs-137", "Cu-64", "Na-22"],
+                }
+            ).to_csv(csv_path, index=False)
+            cache_dir = Path(directory) / "cache"
+
+            catalog = Catalog.from_csv(csv_path, cache_dir=cache_dir)
+            self.assertTrue((cache_dir / checksum(csv_path) / "header.json").exists())
+            self.assertEqual(catalog.name, "catalog.csv")
+            self.assertEqual(catalog.duplicates, 1)
+            self.assertIsInstance(catalog.energies, np.memmap)
+            self.assertEqual(catalog.isotopes.tolist(), self.catalog.isotopes.tolist())
+            self.assertEqual(
+                catalog.positions.tolist(), self.catalog.positions.tolist()
+            )
+
+            # the second load does not parse the file
+            with mock.patch("pandas.read_csv", side_effect=AssertionError):
+                catalog = Catalog.from_csv(csv_path, cache_dir=cache_dir)
+            self.assertEqual(
+                catalog.candidates([515], [2], n_sigma=3)[1].tolist(), [0, 1]
+            )
+
+            # a changed file is compiled again
+            csv_path.write_text("energy,isotope\n122.06,Co-57\n")
+            catalog = Catalog.from_csv(csv_path, cache_dir=cache_dir)
+            self.assertEqual(catalog.isotopes.tolist(), ["Co-57"])
+            self.assertEqual(len(list(cache_dir.iterdir())), 2)
+
+            # a compiled catalog can be written anywhere
+            catalog.save(Path(directory) / "compiled")
+            loaded = Catalog.load(Path(directory) / "compiled")
+            self.assertEqual(loaded.name, "catalog.csv")
+            self.assertEqual(loaded.energies.tolist(), [122.06])
+
+    def test_compile_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = Path(directory) / "catalog.csv"
+            csv_path.write_text("energy,isotope\n661.64,Cs-137\n661.64,Cs-137\n")
+            cache_dir = Path(directory) / "cache"
+            with mock.patch("sys.stderr"):
+                main([str(csv_path), "--cache-dir", str(cache_dir)])
+
+            # the compiled catalog is used when the file is loaded
+            with mock.patch("pandas.read_csv", side_effect=AssertionError):
+                catalog = Catalog.from_csv(csv_path, cache_dir=cache_dir)
+            self.assertEqual(catalog.isotopes.tolist(), ["Cs-137"])
+            self.assertEqual(catalog.duplicates, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
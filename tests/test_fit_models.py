@@ -0,0 +1,32 @@
+import unittest
+import numpy as np
+
+from scipy.optimize import approx_fprime
+from gammaspotter.fit_models import FitModels
+
+
+class TestFitModels(unittest.TestCase):
+    def test_jacobians(self):
+        x = np.linspace(-10, 10, 50)
+        params = [3, 0.7, 2.1, 0.4]
+        for model, jacobian in [
+            (FitModels.gaussian, FitModels.gaussian_jacobian),
+            (FitModels.lorenzian, FitModels.lorenzian_jacobian),
+        ]:
+            numerical = np.array(
+                [approx_fprime(params, lambda p: model(x_i, *p)) for x_i in x]
+            )
+            np.testing.assert_allclose(jacobian(x, *params), numerical, atol=1e-6)
+
+    def test_gaussian_guess(self):
+        x = np.linspace(80, 120, 401)
+        y = FitModels.gaussian(x, 50, 101, 2.5, 4)
+        amp, cen, wid, startheight = FitModels.gaussian_guess(x, y)
+        self.assertAlmostEqual(amp, 50, places=2)
+        self.assertAlmostEqual(cen, 101, places=2)
+        self.assertAlmostEqual(wid, 2.5, places=2)
+        self.assertAlmostEqual(startheight, 4, places=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
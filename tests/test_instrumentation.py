@@ -0,0 +1,75 @@
+import json
+import unittest
+import tempfile
+import pandas as pd
+
+from pathlib import Path
+from gammaspotter.instrumentation import Instrumentation, instrumentation
+from gammaspotter.process_data import ProcessData
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.instrumentation = Instrumentation()
+
+    def test_stages_and_counters(self):
+        @self.instrumentation.timed("double")
+        def double(value):
+            return value * 2
+
+        self.assertEqual(double(2), 4)
+        self.assertEqual(double(3), 6)
+        self.assertEqual(double.__name__, "double")
+        with self.assertRaises(ValueError):
+            with self.instrumentation.stage("failing"):
+                raise ValueError
+        self.instrumentation.count("items", 3)
+        self.instrumentation.count("items")
+
+        report = self.instrumentation.report()
+        self.assertEqual(report["stages"]["double"]["calls"], 2)
+        self.assertEqual(report["stages"]["failing"]["calls"], 1)
+        self.assertEqual(report["counters"], {"items": 4})
+
+        # reports of other processes are added
+        other = Instrumentation()
+        other.merge(report)
+        other.merge(report)
+        self.assertEqual(other.report()["stages"]["double"]["calls"], 4)
+        self.assertEqual(other.report()["counters"], {"items": 8})
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "stats.json"
+            self.instrumentation.to_json(path)
+            self.assertEqual(json.loads(path.read_text()), report)
+
+        self.assertIn("double", self.instrumentation.summary())
+        self.instrumentation.reset()
+        self.assertEqual(self.instrumentation.report(), {"stages": {}, "counters": {}})
+
+    def test_profile(self):
+        self.assertEqual(
+            self.instrumentation.profile_summary(), "Nothing was profiled yet."
+        )
+        with self.instrumentation.profile():
+            sorted(range(1000), key=str)
+        self.assertIn("sorted", self.instrumentation.profile_summary())
+
+    def test_pipeline_counters(self):
+        data = pd.read_csv("example_data/Na-22.csv")
+        instrumentation.reset()
+        process_data = ProcessData(data)
+        peaks = process_data.find_gamma_peaks(prominence=60)
+        process_data.fit_peaks(peaks=peaks, domain_width=60)
+        process_data.fit_peaks(peaks=peaks, domain_width=60)
+
+        report = instrumentation.report()
+        self.assertEqual(report["counters"]["peaks found"], len(peaks))
+        self.assertEqual(report["counters"]["fits tried"], len(peaks))
+        self.assertEqual(report["counters"]["fit cache hits"], len(peaks))
+        self.assertGreater(report["counters"]["curve_fit evaluations"], len(peaks))
+        self.assertEqual(report["stages"]["fit peaks"]["calls"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from gammaspotter.list_mode import ListModeData, count_columns
+
+
+class TestListModeData(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.pulse_heights = np.concatenate(
+            [rng.uniform(0, 1000, 20000), rng.normal(662, 5, 20000)]
+        )
+        self.channels = np.arange(len(self.pulse_heights)) % 2
+
+    def test_histogram(self):
+        list_mode_data = ListModeData.from_events(
+            self.pulse_heights, value_range=(0, 1000), chunk_size=7000
+        )
+        histogram = list_mode_data.histogram(bin_count=1024)
+        self.assertEqual(
+            histogram.columns.tolist(), ["pulseheight", "counts_ch_A", "counts_ch_B"]
+        )
+        self.assertEqual(len(histogram), 1024)
+        self.assertEqual(histogram["counts_ch_A"].sum(), len(self.pulse_heights))
+        np.testing.assert_array_equal(
+            histogram["counts_ch_A"],
+            np.histogram(self.pulse_heights, bins=1024, range=(0, 1000))[0],
+        )
+
+        # rebinning keeps every event, also when the bins do not divide the fine bins
+        self.assertEqual(
+            list_mode_data.histogram(bin_count=1000)["counts_ch_A"].sum(),
+            len(self.pulse_heights),
+        )
+
+        # a flat distribution stays flat, without a comb of bins with one fine bin more
+        flat = ListModeData((0, 1000), channel_count=1)
+        flat.fine_counts[:] = 10
+        for bin_count in [1000, 3000, 65535]:
+            counts = flat.histogram(bin_count)["counts_ch_A"]
+            self.assertEqual(counts.sum(), 10 * 65536)
+            self.assertLessEqual(counts.max() - counts.min(), 1)
+
+        peaks = list_mode_data.process_data(bin_count=256).find_gamma_peaks(
+            prominence=1000
+        )
+        self.assertEqual(len(peaks), 1)
+        self.assertAlmostEqual(peaks.iloc[0, 0], 662, delta=4)
+
+    def test_from_file(self):
+        expected = ListModeData.from_events(
+            self.pulse_heights, self.channels, value_range=(0, 1000)
+        ).histogram(512)
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = Path(directory) / "events.csv"
+            pd.DataFrame(
+                {"pulseheight": self.pulse_heights, "channel": self.channels}
+            ).to_csv(csv_path, index=False)
+            npy_path = Path(directory) / "events.npy"
+            np.save(npy_path, np.column_stack([self.pulse_heights, self.channels]))
+
+            for path in [csv_path, npy_path]:
+                list_mode_data = ListModeData.from_file(
+                    path, value_range=(0, 1000), channel_column=1, chunk_size=5000
+                )
+                pd.testing.assert_frame_equal(list_mode_data.histogram(512), expected)
+
+        self.assertEqual(expected["counts_ch_B"].sum(), np.count_nonzero(self.channels))
+
+    def test_channel_column_first(self):
+        expected = ListModeData.from_events(
+            self.pulse_heights, self.channels, value_range=(0, 1000)
+        ).histogram(512)
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = Path(directory) / "events.csv"
+            pd.DataFrame(
+                {"channel": self.channels, "pulseheight": self.pulse_heights}
+            ).to_csv(csv_path, index=False)
+
+            list_mode_data = ListModeData.from_file(
+                csv_path, column=1, channel_column=0, chunk_size=5000
+            )
+            self.assertEqual(list_mode_data.fine_counts.shape[1], 2)
+            self.assertAlmostEqual(list_mode_data.high, self.pulse_heights.max())
+
+            list_mode_data = ListModeData.from_file(
+                csv_path, value_range=(0, 1000), column=1, channel_column=0
+            )
+            pd.testing.assert_frame_equal(list_mode_data.histogram(512), expected)
+
+    def test_count_columns(self):
+        columns = count_columns(30)
+        self.assertEqual(columns[:2], ["counts_ch_A", "counts_ch_B"])
+        self.assertEqual(
+            columns[25:28], ["counts_ch_Z", "counts_ch_AA", "counts_ch_AB"]
+        )
+        self.assertEqual(len(set(columns)), 30)
+        self.assertEqual(count_columns(1), ["counts_ch_A", "counts_ch_B"])
+
+
+if __name__ == "__main__":
+    unittest.main()
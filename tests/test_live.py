@@ -0,0 +1,123 @@
+import unittest
+import tempfile
+import numpy as np
+
+from unittest import mock
+from pathlib import Path
+from gammaspotter.live import RowParser, FileFollower, LiveSpectrum
+from tests.test_process_data import gaussian_spectrum
+
+
+class TestLive(unittest.TestCase):
+    def test_row_parser(self):
+        parser = RowParser()
+        rows = parser.feed(b"pulseheight,counts_ch_A,counts_ch_B\n1.5,2,0\n2.5,")
+        self.assertEqual(rows.tolist(), [[1.5, 2, 0]])
+        rows = parser.feed(b"4,1\n")
+        self.assertEqual(rows.tolist(), [[2.5, 4, 1]])
+
+    def test_file_follower(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "live.csv"
+            path.write_text("pulseheight,counts_ch_A,counts_ch_B\n1,2,0\n")
+            follower = FileFollower(path)
+            rows, truncated = follower.poll()
+            self.assertEqual(rows.tolist(), [[1, 2, 0]])
+            self.assertFalse(truncated)
+
+            with open(path, "a") as file:
+                file.write("2,3,0\n")
+            rows, truncated = follower.poll()
+            self.assertEqual(rows.tolist(), [[2, 3, 0]])
+
+            path.write_text("1,1,1\n")
+            rows, truncated = follower.poll()
+            self.assertEqual(rows.tolist(), [[1, 1, 1]])
+            self.assertTrue(truncated)
+
+    def test_add_counts(self):
+        spectrum = LiveSpectrum(np.array([[0, 1, 0], [1, 2, 0], [2, 3, 0]]))
+        changed = spectrum.add_counts(np.array([[0.9, 5, 1], [2.2, 0, 0]]))
+        self.assertEqual(changed.tolist(), [1])
+        self.assertEqual(spectrum.counts.tolist(), [[1, 0], [7, 1], [3, 0]])
+        self.assertEqual(spectrum.data.columns.tolist()[0], "pulseheight")
+
+    def test_add_counts_new_bins(self):
+        # the first read only had the lowest pulse heights of the measurement
+        spectrum = LiveSpectrum(np.column_stack([np.arange(10), np.ones((10, 2))]))
+        spectrum.changed[:] = False
+        changed = spectrum.add_counts(
+            np.column_stack([np.arange(10, 100), np.ones(90), np.zeros(90)])
+        )
+        self.assertEqual(spectrum.x.tolist(), list(range(100)))
+        self.assertEqual(spectrum.counts[:, 0].tolist(), [1] * 100)
+        self.assertEqual(spectrum.counts[:, 1].sum(), 10)
+        self.assertEqual(changed.tolist(), list(range(10, 100)))
+
+        # bins below the first bin have the same spacing and move the other bins
+        spectrum.add_counts(np.array([[-2.2, 4, 0], [5, 1, 0]]))
+        self.assertEqual(spectrum.x[:3].tolist(), [-2, -1, 0])
+        self.assertEqual(
+            spectrum.counts[:, 0].tolist(), [4, 0] + [1] * 5 + [2] + [1] * 94
+        )
+        self.assertTrue(spectrum.changed[:2].all())
+
+    def test_add_counts_outlier(self):
+        spectrum = LiveSpectrum(
+            np.column_stack([np.arange(0, 10, 0.5), np.ones((20, 2))]), max_bins=1000
+        )
+        # a single far pulse height does not get a bin of its own
+        spectrum.add_counts(np.array([[1e6, 1, 0], [12.1, 1, 0]]))
+        np.testing.assert_allclose(np.diff(spectrum.x), 0.5)
+        self.assertEqual(len(spectrum.x), 1000)
+        self.assertEqual(spectrum.dropped_rows, 1)
+        self.assertEqual(spectrum.counts[:, 0].sum(), 21)
+
+        # the pulse heights in the gap are counted in their own bins
+        spectrum.add_counts(np.array([[30.2, 1, 0], [30.4, 1, 0]]))
+        self.assertEqual(spectrum.counts[spectrum.x == 30, 0].tolist(), [1])
+        self.assertEqual(spectrum.counts[spectrum.x == 30.5, 0].tolist(), [1])
+        self.assertEqual(spectrum.counts[spectrum.x == 12, 0].tolist(), [1])
+
+    def test_fit_peaks_incremental(self):
+        spectrum = LiveSpectrum(gaussian_spectrum([100, 250, 400]).to_numpy())
+        fitted = spectrum.fit_peaks(spectrum.process_data(), 50, 30)
+        np.testing.assert_allclose(fitted["energy"], [100, 250, 400], atol=1e-6)
+
+        # only the domain of the last peak changes, the other fits are reused
+        spectrum.add_counts(np.array([[401, 30, 0]]))
+        process_data = spectrum.process_data()
+        with mock.patch.object(
+            process_data, "fit_peaks", wraps=process_data.fit_peaks
+        ) as fit_peaks:
+            fitted = spectrum.fit_peaks(process_data, 50, 30)
+        self.assertEqual(len(fit_peaks.call_args.kwargs["peaks"]), 1)
+        np.testing.assert_allclose(fitted["energy"][:2], [100, 250], atol=1e-6)
+        self.assertGreater(fitted["energy"][2], 400)
+
+    def test_fit_peaks_snapshot(self):
+        spectrum = LiveSpectrum(gaussian_spectrum([100, 250, 400]).to_numpy())
+        spectrum.fit_peaks(spectrum.process_data(), 50, 30)
+
+        # counts arrive while a fit of the spectrum before them runs in the background
+        spectrum.add_counts(np.array([[401, 30, 0]]))
+        process_data, changed = spectrum.process_data(), spectrum.take_changed()
+        spectrum.add_counts(np.array([[-50, 1, 0]]))
+        with mock.patch.object(
+            process_data, "fit_peaks", wraps=process_data.fit_peaks
+        ) as fit_peaks:
+            spectrum.fit_peaks(process_data, 50, 30, changed=changed)
+        self.assertEqual(len(fit_peaks.call_args.kwargs["peaks"]), 1)
+
+        # the bin added below the spectrum does not invalidate the cached fits
+        process_data = spectrum.process_data()
+        with mock.patch.object(
+            process_data, "fit_peaks", wraps=process_data.fit_peaks
+        ) as fit_peaks:
+            fitted = spectrum.fit_peaks(process_data, 50, 30)
+        fit_peaks.assert_not_called()
+        self.assertEqual(len(fitted), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,41 +1,73 @@
 import unittest
+import pandas as pd
 from gammaspotter.match_features import MatchFeatures
 
 
 class TestMatchFeatures(unittest.TestCase):
     def test_matcher(self):
-        mf = MatchFeatures()
-        found_energy_sigma_list = [[1475.5, 15], [511, 5], [200, 20]]
-        energy_list = [
-            ["Na-22", 1274.5],
-            ["Cs-137", 661.64],
-            ["Ba-133", 356],
-            ["Co-60", 1173.2],
-            ["Co-60", 1332.5],
-            ["K-40", 1460],
-        ]
+        data_peaks = pd.DataFrame(
+            {"peak": [1, 2, 3], "energy": [1475.5, 511, 200], "stderr": [15, 5, 20]}
+        )
+        catalog = pd.DataFrame(
+            {
+                "energy": [1274.5, 661.64, 356, 1173.2, 1332.5, 1460],
+                "isotope": ["Na-22", "Cs-137", "Ba-133", "Co-60", "Co-60", "K-40"],
+            }
+        )
+        mf = MatchFeatures(data_peaks=data_peaks, catalog_data=catalog)
+        self.assertEqual(mf.erfc_pecentage(15.5 / 15), 30.14)
+
+        # the other catalog entries round to a percentage of zero and are left out
+        expected_output = [[1, "K-40", 30.14, 1460.0]]
+        self.assertEqual(mf.match_isotopes().values.tolist(), expected_output)
+        self.assertEqual(
+            mf.match_isotopes(n_sigma=None).values.tolist(), expected_output
+        )
+
+    def test_match_isotopes(self):
+        data_peaks = pd.DataFrame(
+            {"peak": [1, 2, 3], "energy": [1475.5, 660, 1250], "stderr": [15, 5, 80]}
+        )
+        catalog = pd.DataFrame(
+            {
+                "energy": [1274.5, 661.64, 356, 1173.2, 1332.5, 1460],
+                "isotope": ["Na-22", "Cs-137", "Ba-133", "Co-60", "Co-60", "K-40"],
+            }
+        )
+        mf = MatchFeatures(data_peaks=data_peaks, catalog_data=catalog)
         expected_output = [
-            [1, "K-40", 30.14479331380494],
-            [1, "Co-60", 1.5231238296442572e-19],
-            [1, "Na-22", 6.04631547189045e-39],
-            [1, "Co-60", 2.5158933893050456e-88],
-            [1, "Cs-137", 0.0],
-            [1, "Ba-133", 0.0],
-            [2, "Cs-137", 2.083181951639746e-197],
-            [2, "Ba-133", 5.390500162401e-209],
-            [2, "Na-22", 0.0],
-            [2, "Co-60", 0.0],
-            [2, "Co-60", 0.0],
-            [2, "K-40", 0.0],
-            [3, "Ba-133", 6.190717543917401e-13],
-            [3, "Cs-137", 7.02142579924698e-116],
-            [3, "Na-22", 0.0],
-            [3, "Co-60", 0.0],
-            [3, "Co-60", 0.0],
-            [3, "K-40", 0.0],
+            [1, "K-40", 30.14, 1460.0],
+            [2, "Cs-137", 74.29, 661.64],
+            [3, "Na-22", 75.94, 1274.5],
+            [3, "Co-60", 33.71, 1173.2],
+            [3, "Co-60", 30.24, 1332.5],
+            [3, "K-40", 0.87, 1460.0],
         ]
+        self.assertEqual(mf.match_isotopes().values.tolist(), expected_output)
+        self.assertEqual(
+            mf.match_isotopes(max_results=2).values.tolist(),
+            expected_output[:4],
+        )
+
+    def test_match_isotopes_channels(self):
+        data_peaks = pd.DataFrame(
+            {
+                "peak": [1, 1],
+                "energy": [1475.5, 660],
+                "stderr": [15, 5],
+                "channel": ["counts_ch_A", "counts_ch_B"],
+            }
+        )
+        catalog = pd.DataFrame(
+            {"energy": [661.64, 1460], "isotope": ["Cs-137", "K-40"]}
+        )
+        matches = MatchFeatures(data_peaks=data_peaks, catalog_data=catalog)
         self.assertEqual(
-            mf.matcher(found_energy_sigma_list, energy_list), expected_output
+            matches.match_isotopes().values.tolist(),
+            [
+                ["counts_ch_A", 1, "K-40", 30.14, 1460.0],
+                ["counts_ch_B", 1, "Cs-137", 74.29, 661.64],
+            ],
         )
 
 
@@ -0,0 +1,60 @@
+import os
+import unittest
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import pyqtgraph as pg
+
+from PySide6.QtWidgets import QApplication
+from gammaspotter.plotting import PeakLines, plot_curve
+
+
+class TestPlotting(unittest.TestCase):
+    def setUp(self):
+        self.app = QApplication.instance() or QApplication([])
+        self.plot_widget = pg.PlotWidget()
+        self.plot_widget.resize(800, 600)
+        self.plot_widget.show()
+
+        x = np.linspace(0, 3000, 1000000)
+        counts = np.zeros(len(x))
+        counts[123456] = 1000
+        self.spectrum = pd.DataFrame({"pulseheight": x, "counts_ch_A": counts})
+
+    def tearDown(self):
+        self.plot_widget.close()
+
+    def test_plot_curve(self):
+        curve = plot_curve(self.plot_widget, self.spectrum, pen="w")
+        self.plot_widget.autoRange()
+        self.app.processEvents()
+
+        # far fewer points than channels are drawn, but the single high channel is kept
+        x, y = curve.getData()
+        self.assertLess(len(x), 10000)
+        self.assertEqual(y.max(), 1000)
+
+        self.plot_widget.setXRange(1000, 1001, padding=0)
+        self.app.processEvents()
+        x, _ = curve.getData()
+        self.assertLess(x.max() - x.min(), 10)
+
+    def test_peak_lines(self):
+        plot_curve(self.plot_widget, self.spectrum, pen="w")
+        self.plot_widget.autoRange()
+        lines = PeakLines()
+        lines.setData(np.linspace(100, 2900, 500), labels=map(str, range(500)))
+        self.plot_widget.addItem(lines, ignoreBounds=True)
+
+        self.assertEqual(len(lines.positions), 500)
+        self.assertFalse(lines.boundingRect().isEmpty())
+        # the lines do not change the range of the plot
+        self.plot_widget.autoRange()
+        self.assertLess(self.plot_widget.viewRange()[1][1], 2000)
+        self.plot_widget.grab()
+
+
+if __name__ == "__main__":
+    unittest.main()
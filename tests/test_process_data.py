@@ -0,0 +1,154 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from gammaspotter.process_data import ProcessData
+
+
+def gaussian_spectrum(centers: list[float], width: float = 3) -> pd.DataFrame:
+    x = np.arange(0, 500, 0.5)
+    counts = 5 + sum(
+        200 * np.exp(-((x - center) ** 2) / (2 * width**2)) for center in centers
+    )
+    return pd.DataFrame({"pulseheight": x, "counts_ch_A": counts, "counts_ch_B": 0})
+
+
+class TestProcessData(unittest.TestCase):
+    def setUp(self):
+        self.process_data = ProcessData(gaussian_spectrum([100, 250, 400]))
+
+    def test_find_gamma_peaks(self):
+        peaks = self.process_data.find_gamma_peaks(prominence=50)
+        self.assertEqual(peaks.iloc[:, 0].tolist(), [100, 250, 400])
+
+    def test_prominence_profile(self):
+        from scipy.signal import find_peaks
+
+        rng = np.random.default_rng(0)
+        data = gaussian_spectrum([100, 105, 250, 400])
+        data["counts_ch_A"] = rng.poisson(data["counts_ch_A"])
+        process_data = ProcessData(data)
+
+        # every threshold gives the same peaks as scipy, without searching the spectrum again
+        for prominence in [0, 1, 5, 10, 25, 50, 100, 190, 1000]:
+            peaks = process_data.find_gamma_peaks(prominence=prominence)
+            expected, _ = find_peaks(process_data.y, prominence=prominence)
+            self.assertEqual(peaks.index.tolist(), expected.tolist())
+        self.assertEqual(list(process_data.prominence_profiles), [0])
+
+    def test_isolate_domains(self):
+        domains = self.process_data.isolate_domains(centers=[100, 499], width=2)
+        self.assertEqual(domains[0].iloc[:, 0].tolist(), [99, 99.5, 100, 100.5, 101])
+        self.assertEqual(len(domains[1]), 0)
+
+        x, y, valid = self.process_data.stack_domains(centers=[100, 498], width=2)
+        self.assertEqual(x.shape, (2, 5))
+        self.assertEqual(x[0].tolist(), [99, 99.5, 100, 100.5, 101])
+        self.assertEqual(valid.sum(axis=1).tolist(), [5, 2])
+        self.assertEqual(x[1][valid[1]].tolist(), [497, 497.5])
+
+    def test_fit_peaks(self):
+        peaks = self.process_data.find_gamma_peaks(prominence=50)
+        fitted = self.process_data.fit_peaks(peaks=peaks, domain_width=30)
+        np.testing.assert_allclose(fitted["energy"], [100, 250, 400], atol=1e-6)
+        np.testing.assert_allclose(fitted["stderr"], [3, 3, 3], atol=1e-6)
+        self.assertTrue(fitted["success"].all())
+
+        process_data = ProcessData(gaussian_spectrum([100, 250, 400]))
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            fitted_concurrent = process_data.fit_peaks(
+                peaks=peaks, domain_width=30, executor=executor
+            )
+        pd.testing.assert_frame_equal(fitted, fitted_concurrent)
+
+    def test_fit_peaks_failure(self):
+        # the second domain lies outside of the spectrum and can not be fitted
+        peaks = pd.DataFrame({"x_peaks": [100, 1000], "y_peaks": [205, 5]})
+        fitted = self.process_data.fit_peaks(peaks=peaks, domain_width=30)
+        self.assertEqual(fitted["success"].tolist(), [True, False])
+        self.assertAlmostEqual(fitted["energy"][0], 100, places=6)
+        self.assertTrue(np.isnan(fitted["energy"][1]))
+
+    def test_fit_peaks_inside_domain(self):
+        # a domain on the slope of a large peak, whose fit used to end far outside of it
+        process_data = ProcessData(pd.read_csv("example_data/Na-22.csv"))
+        peaks = process_data.find_gamma_peaks(prominence=40)
+        starts, stops = process_data.domain_bounds(centers=peaks.iloc[:, 0], width=20)
+        lows, highs = process_data.x[starts], process_data.x[stops - 1]
+
+        for fit_peaks in [process_data.fit_peaks, process_data.fit_peaks_batched]:
+            fitted = fit_peaks(peaks=peaks, domain_width=20)
+            success = fitted["success"].to_numpy()
+            energies = fitted["energy"].to_numpy()
+            self.assertTrue(success.any())
+            self.assertTrue(np.all(energies[success] >= lows[success]))
+            self.assertTrue(np.all(energies[success] <= highs[success]))
+            self.assertTrue(np.isnan(energies[~success]).all())
+            self.assertLess(np.nanmax(energies), 60)
+
+    def test_fit_curve(self):
+        x, y = self.process_data.fit_curve(center=102, domain_width=30, points=50)
+        self.assertEqual(len(x), 50)
+        self.assertAlmostEqual(x[np.argmax(y)], 100, delta=0.5)
+        self.assertAlmostEqual(y.max(), self.process_data.y.max(), delta=1)
+        self.assertIsNone(self.process_data.fit_curve(center=1000, domain_width=30))
+
+    def test_fit_peaks_batched(self):
+        peaks = pd.DataFrame({"x_peaks": [100, 250, 400, 1000], "y_peaks": 205})
+        fitted = self.process_data.fit_peaks(peaks=peaks, domain_width=30)
+        fitted_batched = self.process_data.fit_peaks_batched(
+            peaks=peaks, domain_width=30
+        )
+        self.assertEqual(fitted_batched["success"].tolist(), [True, True, True, False])
+        pd.testing.assert_frame_equal(fitted, fitted_batched, atol=1e-6)
+
+    def test_cached_results(self):
+        peaks = self.process_data.find_gamma_peaks(prominence=50)
+        peaks.iloc[0, 0] = -1
+        self.assertEqual(
+            self.process_data.find_gamma_peaks(prominence=50).iloc[0, 0], 100
+        )
+        self.assertEqual(self.process_data.peak_cache.hits, 1)
+
+        peaks = self.process_data.find_gamma_peaks(prominence=50)
+        fitted = self.process_data.fit_peaks(peaks=peaks.iloc[:2], domain_width=30)
+        with mock.patch.object(
+            ProcessData, "fit_domain", wraps=ProcessData.fit_domain
+        ) as fit_domain:
+            fitted_again = self.process_data.fit_peaks(peaks=peaks, domain_width=30)
+        # only the domain of the third peak is new
+        self.assertEqual(fit_domain.call_count, 1)
+        pd.testing.assert_frame_equal(fitted, fitted_again.iloc[:2])
+
+        self.process_data.fit_peaks_batched(peaks=peaks, domain_width=30)
+        self.assertEqual(len(self.process_data.fit_cache), 6)
+
+    def test_all_channels(self):
+        data = gaussian_spectrum([100, 250])
+        data["counts_ch_B"] = gaussian_spectrum([180])["counts_ch_A"]
+        process_data = ProcessData(data)
+
+        peaks = process_data.find_gamma_peaks_all_channels(prominence=50)
+        self.assertEqual(peaks["x_peaks"].tolist(), [100, 250, 180])
+        self.assertEqual(
+            peaks["channel"].tolist(), ["counts_ch_A", "counts_ch_A", "counts_ch_B"]
+        )
+        pd.testing.assert_frame_equal(
+            peaks.iloc[2:, :2],
+            process_data.find_gamma_peaks(prominence=50, channel="counts_ch_B"),
+        )
+
+        fitted = process_data.fit_peaks(
+            peaks=peaks, domain_width=30, channel=peaks["channel"]
+        )
+        fitted_batched = process_data.fit_peaks_batched(
+            peaks=peaks, domain_width=30, channel=peaks["channel"]
+        )
+        np.testing.assert_allclose(fitted["energy"], [100, 250, 180], atol=1e-6)
+        pd.testing.assert_frame_equal(fitted, fitted_batched, atol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
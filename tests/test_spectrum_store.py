@@ -0,0 +1,90 @@
+import os
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from unittest import mock
+from gammaspotter.spectrum_store import SpectrumStore
+from gammaspotter.process_data import ProcessData
+
+
+class TestSpectrumStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.csv_path = Path(self.directory.name) / "spectrum.csv"
+        pd.DataFrame(
+            {"pulseheight": [0.5, 1.5, 2.5], "counts_ch_A": [1, 2, 3], "counts_ch_B": 0}
+        ).to_csv(self.csv_path, index=False)
+        self.store = SpectrumStore(Path(self.directory.name) / "cache")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_load(self):
+        data = self.store.load(self.csv_path)
+        self.assertEqual(
+            data.columns.tolist(), ["pulseheight", "counts_ch_A", "counts_ch_B"]
+        )
+        self.assertEqual(data["counts_ch_A"].tolist(), [1, 2, 3])
+
+        # the second load is memory-mapped and does not parse the CSV file
+        with mock.patch("pandas.read_csv") as read_csv:
+            values, _ = self.store.load_array(self.csv_path)
+        read_csv.assert_not_called()
+        self.assertIsInstance(values, np.memmap)
+        self.assertEqual(ProcessData(values).data.shape, (0, 3))
+
+    def test_changed_file(self):
+        self.store.load(self.csv_path)
+        pd.DataFrame({"pulseheight": [0.5], "counts_ch_A": [7]}).to_csv(
+            self.csv_path, index=False
+        )
+        os.utime(self.csv_path, ns=(0, 10**9))
+        data = self.store.load(self.csv_path)
+        self.assertEqual(data["counts_ch_A"].tolist(), [7])
+        # the entry of the old version is removed
+        self.assertEqual(len(list(self.store.cache_dir.glob("*.npy"))), 1)
+
+    def test_eviction(self):
+        paths = []
+        for number in range(3):
+            path = Path(self.directory.name) / f"spectrum_{number}.csv"
+            pd.DataFrame(
+                {"pulseheight": np.arange(1000.0), "counts_ch_A": float(number)}
+            ).to_csv(path, index=False)
+            paths.append(path)
+
+        self.store.load(paths[0])
+        entry_size = sum(
+            entry.stat().st_size for entry in self.store.cache_dir.iterdir()
+        )
+        # room for two spectra
+        store = SpectrumStore(self.store.cache_dir, max_bytes=int(entry_size * 2.5))
+
+        def use(path: Path, second: int):
+            store.load(path)
+            header_path = store.cache_dir / f"{store.key(path)[1]}.json"
+            os.utime(header_path, ns=(second * 10**9, second * 10**9))
+
+        use(paths[0], 1)
+        use(paths[1], 2)
+        # opening the first spectrum again makes the second one the least recently used
+        use(paths[0], 3)
+        use(paths[2], 4)
+
+        remaining = {entry.stem for entry in store.cache_dir.glob("*.npy")}
+        self.assertEqual(remaining, {store.key(paths[0])[1], store.key(paths[2])[1]})
+        self.assertLessEqual(
+            sum(entry.stat().st_size for entry in store.cache_dir.iterdir()),
+            store.max_bytes,
+        )
+        # an evicted spectrum is parsed again
+        with mock.patch("pandas.read_csv", wraps=pd.read_csv) as read_csv:
+            self.assertEqual(store.load(paths[1])["counts_ch_A"].iloc[0], 1)
+        read_csv.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
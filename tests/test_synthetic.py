@@ -0,0 +1,82 @@
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from gammaspotter.batch import default_catalog_path
+from gammaspotter.process_data import ProcessData
+from gammaspotter.synthetic import SpectrumGenerator, catalog_lines, generate_files
+
+
+class TestSynthetic(unittest.TestCase):
+    def setUp(self):
+        self.catalog_data = pd.read_csv(default_catalog_path())
+        self.lines = catalog_lines(
+            self.catalog_data, (0, 3000), nuclides=["Cs-137", "Co-60"]
+        )
+
+    def test_catalog_lines(self):
+        self.assertEqual(self.lines["energy"].tolist(), [661.64, 1173.2, 1332.5])
+        self.assertEqual(self.lines["nuclide"].tolist(), ["Cs-137", "Co-60", "Co-60"])
+
+        random_lines = catalog_lines(self.catalog_data, (100, 2000), count=5, seed=3)
+        self.assertEqual(len(random_lines), 5)
+        self.assertTrue(random_lines["energy"].between(100, 2000).all())
+        self.assertTrue(random_lines["area"].between(1e3, 1e5).all())
+        pd.testing.assert_frame_equal(
+            random_lines,
+            catalog_lines(self.catalog_data, (100, 2000), count=5, seed=3),
+        )
+
+    def test_generate(self):
+        generator = SpectrumGenerator(
+            channels=4096, scaling_factor=2.0, horizontal_offset=10.0, channel_count=2
+        )
+        data, truth = generator.generate(self.lines, seed=1)
+
+        self.assertEqual(
+            data.columns.tolist(), ["pulseheight", "counts_ch_A", "counts_ch_B"]
+        )
+        self.assertEqual(len(data), 4096)
+        self.assertEqual(truth["energy"].tolist(), self.lines["energy"].tolist())
+        # the peaks widen with energy
+        self.assertGreater(truth.loc[2, "fwhm"], truth.loc[0, "fwhm"])
+        np.testing.assert_allclose(
+            truth["pulseheight"] * 2.0 - 10.0, truth["energy"], rtol=1e-12
+        )
+
+        # the channels have the same expected counts but their own noise
+        self.assertFalse(data["counts_ch_A"].equals(data["counts_ch_B"]))
+        expected = generator.expected_counts(self.lines).sum()
+        self.assertAlmostEqual(data["counts_ch_A"].sum() / expected, 1, delta=0.01)
+
+        # the same seed gives the same spectrum
+        pd.testing.assert_frame_equal(data, generator.generate(self.lines, seed=1)[0])
+
+        # the calibration turns the pulse heights back into the true energies
+        calibrated = ProcessData.apply_cal_to_data(data.copy(), 2.0, 10.0)
+        process_data = ProcessData(calibrated)
+        peaks = process_data.find_gamma_peaks(prominence=1000)
+        fitted_peaks = process_data.fit_peaks(peaks=peaks, domain_width=60)
+        for energy in truth["energy"]:
+            self.assertLess(np.min(np.abs(fitted_peaks["energy"] - energy)), 2)
+
+    def test_generate_files(self):
+        generator = SpectrumGenerator(channels=512)
+        with tempfile.TemporaryDirectory() as directory:
+            truth = generate_files(
+                directory, 3, generator, self.catalog_data, line_count=4
+            )
+            files = sorted(Path(directory).glob("*.csv"))
+
+            self.assertEqual(len(files), 3)
+            self.assertEqual(len(truth), 12)
+            self.assertEqual(
+                truth["file"].unique().tolist(), [file.name for file in files]
+            )
+            self.assertEqual(len(pd.read_csv(files[0])), 512)
+
+
+if __name__ == "__main__":
+    unittest.main()